@@ -1,44 +1,77 @@
 import streamlit as st
 from src.utils import (
     download_mp4_from_youtube, 
-    create_vector_store, 
     cleanup_temp_files,
-    process_video,
-    delete_from_pinecone,
-    cleanup_pinecone
+    generate_session_id,
+    end_session,
+    remove_video_from_session,
+    start_session_expiry,
+    content_hash
 )
+from src import sessions
+from src.corpus import empty_corpus, add_videos, remove_video
 from src.transcriber import transcribe_video
-from src.summarizer import summarize_text
+from src.summarizer import get_summary
+from src.transcript import format_timestamp
+from src import transcript_view
+from src import snapshot
+from src.ingest import ingest
 from src.chat import get_chatbot
+from src import metrics
 from dotenv import load_dotenv
 import pyperclip
-import concurrent.futures
+import asyncio
+import os
+import tempfile
 
 def reset_session_state():
     """Reset all session state variables"""
     st.session_state.summaries = {}
-    st.session_state.transcripts = {}
+    st.session_state.summary_trees = {}
+    st.session_state.corpus = empty_corpus()
+    st.session_state.content_hashes = {}
     st.session_state.messages = []
     st.session_state.chatbot = None
+    # Release this user's video references; videos other sessions use are kept
     if st.session_state.session_id:
-        delete_from_pinecone(session_id=st.session_state.session_id)
-    st.session_state.session_id = None
+        end_session(st.session_state.session_id)
+    st.session_state.session_id = generate_session_id()
     st.session_state.processed_urls = set()
     st.session_state.show_input = True
     st.session_state.current_tab = "📝 Summaries"
     st.session_state.video_titles = {}
+    st.session_state.private_videos = {}
 
 # Load environment variables
 load_dotenv()
 
-# Clean up Pinecone completely on every page load
-cleanup_pinecone()
+@st.cache_resource
+def start_metrics_endpoint():
+    """Start the metrics endpoint once per server process if configured"""
+    port = os.getenv("VIDEOMIND_METRICS_PORT")
+    if not port:
+        return None
+    metrics.enable()
+    return metrics.start_metrics_server(int(port))
+
+@st.cache_resource
+def start_expiring_sessions():
+    """Expire idle sessions periodically, from one thread per server process
+    Closed tabs never end their sessions, so this is what frees their vectors."""
+    return start_session_expiry()
+
+start_metrics_endpoint()
+start_expiring_sessions()
 
 # Initialize session state
 if 'summaries' not in st.session_state:
     st.session_state.summaries = {}
-if 'transcripts' not in st.session_state:
-    st.session_state.transcripts = {}
+if 'summary_trees' not in st.session_state:
+    st.session_state.summary_trees = {}
+if 'corpus' not in st.session_state:
+    st.session_state.corpus = empty_corpus()
+if 'content_hashes' not in st.session_state:
+    st.session_state.content_hashes = {}
 if 'show_copy_success' not in st.session_state:
     st.session_state.show_copy_success = False
 if 'messages' not in st.session_state:
@@ -46,7 +79,8 @@ if 'messages' not in st.session_state:
 if 'chatbot' not in st.session_state:
     st.session_state.chatbot = None
 if 'session_id' not in st.session_state:
-    st.session_state.session_id = None
+    st.session_state.session_id = generate_session_id()
+sessions.touch(st.session_state.session_id)
 if 'active_tab' not in st.session_state:
     st.session_state.active_tab = 0
 if 'processed_urls' not in st.session_state:
@@ -59,6 +93,9 @@ if 'tab_key' not in st.session_state:
     st.session_state.tab_key = 0
 if 'video_titles' not in st.session_state:
     st.session_state.video_titles = {}
+# Videos restored from an uploaded archive: URL -> (cache entry, Transcript), never cached
+if 'private_videos' not in st.session_state:
+    st.session_state.private_videos = {}
 if 'enter_url' not in st.session_state:
     st.session_state.enter_url = ""
 
@@ -427,38 +464,65 @@ def process_videos(urls):
         # Process videos in parallel
         status_text.info("🎥 Processing videos...")
         texts_dict = {}
+        new_videos = {}
         
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future_to_url = {
-                executor.submit(process_video, url, transcribe_video): url 
-                for url in urls
-            }
+        completed = 0
+        
+        def on_result(url, result):
+            nonlocal completed
+            try:
+                if result and 'transcript' in result:
+                    texts_dict[url] = result.get('timed_transcript') or result['transcript']
+                    # Summary tree is built once during ingest and cached with the artifact
+                    tree = result['summary_tree']
+                    st.session_state.summary_trees[url] = tree
+                    st.session_state.summaries[url] = tree['video']
+                    video_hash = result.get('content_hash') or content_hash(result['transcript'])
+                    # Transcript text stays in the artifact store; pages are read on demand
+                    st.session_state.content_hashes[url] = video_hash
+                    new_videos[video_hash] = {
+                        'title': result.get('title', 'Untitled Video'),
+                        'summary': tree['video']
+                    }
+                    st.session_state.processed_urls.add(url)
+                    st.session_state.video_titles[url] = result.get('title', 'Untitled Video')
+            except Exception as e:
+                st.error(f"Error processing {url}: {str(e)}")
             
-            completed = 0
-            for future in concurrent.futures.as_completed(future_to_url):
-                url = future_to_url[future]
-                try:
-                    url, result = future.result()
-                    if result and 'transcript' in result:
-                        texts_dict[url] = result['transcript']
-                        st.session_state.transcripts[url] = result['transcript']
-                        summary = summarize_text(result['transcript'])
-                        st.session_state.summaries[url] = summary
-                        st.session_state.processed_urls.add(url)
-                        st.session_state.video_titles[url] = result.get('title', 'Untitled Video')
-                except Exception as e:
-                    st.error(f"Error processing {url}: {str(e)}")
-                
-                completed += 1
-                progress = int((completed / len(urls)) * 90)
-                progress_bar.progress(progress)
-                status_text.info(f"✅ Processed {completed}/{len(urls)} videos...")
+            completed += 1
+            progress = int((completed / len(urls)) * 90)
+            progress_bar.progress(progress)
+            status_text.info(f"✅ Processed {completed}/{len(urls)} videos...")
+        
+        def on_queue(url, place, ahead):
+            # Transcriptions from every user share one budget and take turns
+            status_text.info(
+                f"⏳ Waiting for a transcription slot: #{place} in line "
+                f"({ahead / 60:.0f} min of audio ahead)"
+            )
+        
+        # Download, transcribe, summarize and embed with per-provider limits
+        outcome = asyncio.run(ingest(
+            urls,
+            transcribe_func=transcribe_video,
+            on_result=on_result,
+            session_id=st.session_state.session_id,
+            on_queue=on_queue
+        ))
+        
+        # Videos refused up front (too long, or too much already queued) and other failures
+        for url, error in outcome['errors'].items():
+            st.warning(f"⚠️ {url}: {error}")
         
         if texts_dict:
-            status_text.info("🧠 Creating vector store...")
-            vectorstore, session_id = create_vector_store(texts_dict)
-            st.session_state.session_id = session_id
-            st.session_state.chatbot = get_chatbot(session_id)
+            # Shown again after the rerun below
+            st.session_state.ingest_errors = outcome['errors']
+            status_text.info("🧠 Updating cross-video digest...")
+            st.session_state.corpus = add_videos(st.session_state.corpus, new_videos)
+            
+            # The session ID stays the same; retrieval picks up the new videos
+            if st.session_state.chatbot is None:
+                st.session_state.chatbot = get_chatbot(outcome['session_id'])
             
             progress_bar.progress(100)
             status_text.success("✅ Processing complete!")
@@ -483,6 +547,46 @@ def process_videos(urls):
         cleanup_temp_files(urls)
         return False
 
+def export_session():
+    """Write the session to an archive file and return its bytes"""
+    path = os.path.join(tempfile.gettempdir(), f"videomind_{st.session_state.session_id}.vmss")
+    snapshot.export_session(
+        st.session_state.session_id,
+        list(st.session_state.processed_urls),
+        path,
+        corpus=st.session_state.corpus,
+        private=st.session_state.private_videos
+    )
+    with open(path, 'rb') as f:
+        data = f.read()
+    os.remove(path)
+    return data
+
+def restore_session(uploaded):
+    """Load an exported session archive into session state"""
+    with tempfile.NamedTemporaryFile(suffix=".vmss", delete=False) as f:
+        f.write(uploaded.getvalue())
+        path = f.name
+    try:
+        # Vectors come from the archive; nothing is transcribed or embedded again
+        session_id, videos, private, corpus = snapshot.restore_session(path, st.session_state.session_id)
+    finally:
+        os.remove(path)
+    st.session_state.private_videos.update(private)
+    for url, entry in videos.items():
+        tree = entry.get('summary_tree') or {'video': entry.get('summary', '')}
+        st.session_state.summary_trees[url] = tree
+        st.session_state.summaries[url] = tree['video']
+        st.session_state.content_hashes[url] = entry.get('content_hash') or content_hash(entry['transcript'])
+        st.session_state.video_titles[url] = entry.get('title', 'Untitled Video')
+        st.session_state.processed_urls.add(url)
+    if corpus:
+        st.session_state.corpus = corpus
+    if videos and st.session_state.chatbot is None:
+        st.session_state.chatbot = get_chatbot(session_id)
+    st.session_state.show_input = False
+    return bool(videos)
+
 def show_video_management():
     """Show the video management interface in the sidebar"""
     st.markdown('<div style="color: white;">', unsafe_allow_html=True)
@@ -496,6 +600,20 @@ def show_video_management():
             reset_session_state()
             st.rerun()
         
+        # Archive with transcripts, summaries and vectors, restorable without re-embedding
+        if st.button("💾 Export session", type="secondary", help="Save this session to a file"):
+            st.session_state.session_archive = (frozenset(st.session_state.processed_urls), export_session())
+        archive = st.session_state.get('session_archive')
+        # Only offer an archive that still matches the session's videos
+        if archive and archive[0] == st.session_state.processed_urls:
+            st.download_button(
+                "⬇️ Download session",
+                archive[1],
+                file_name="videomind_session.vmss",
+                mime="application/octet-stream",
+                use_container_width=True
+            )
+        
         for url in st.session_state.processed_urls:
             title = st.session_state.video_titles.get(url, 'Untitled Video')
             
@@ -515,25 +633,24 @@ def show_video_management():
             
             with col2:
                 if st.button("🗑️", key=f"delete_{url}", help="Delete video", type="secondary"):
-                    # Delete from Pinecone if we have a session
-                    if st.session_state.session_id:
-                        delete_from_pinecone(session_id=st.session_state.session_id, url=url)
+                    # Drop only this video from the session; shared vectors stay for other sessions
+                    remove_video_from_session(st.session_state.session_id, url)
                     
                     # Remove from session state
+                    st.session_state.corpus = remove_video(
+                        st.session_state.corpus,
+                        st.session_state.content_hashes.get(url)
+                    )
                     st.session_state.processed_urls.remove(url)
                     st.session_state.summaries.pop(url, None)
-                    st.session_state.transcripts.pop(url, None)
+                    st.session_state.summary_trees.pop(url, None)
+                    st.session_state.content_hashes.pop(url, None)
                     st.session_state.video_titles.pop(url, None)
+                    st.session_state.private_videos.pop(url, None)
                     
                     # If no videos left, reset session
                     if not st.session_state.processed_urls:
                         reset_session_state()
-                    else:
-                        # Recreate vector store with remaining videos
-                        texts_dict = {url: st.session_state.transcripts[url] for url in st.session_state.processed_urls}
-                        vectorstore, session_id = create_vector_store(texts_dict)
-                        st.session_state.session_id = session_id
-                        st.session_state.chatbot = get_chatbot(session_id)
                     
                     st.rerun()
     else:
@@ -580,8 +697,9 @@ def display_chat():
         videos_info = {
             url: {
                 'title': st.session_state.video_titles.get(url, 'Untitled Video'),
-                'transcript': st.session_state.transcripts.get(url, ''),
-                'summary': st.session_state.summaries.get(url, '')
+                'content_hash': st.session_state.content_hashes.get(url),
+                'summary': st.session_state.summaries.get(url, ''),
+                'summary_tree': st.session_state.summary_trees.get(url)
             }
             for url in st.session_state.processed_urls
         }
@@ -589,7 +707,11 @@ def display_chat():
         # Show "AI is thinking" message
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
-                response = st.session_state.chatbot(prompt, videos_info)
+                response = st.session_state.chatbot(
+                    prompt,
+                    videos_info,
+                    digest=st.session_state.corpus.get('digest')
+                )
         
         # Add messages to session state
         st.session_state.messages.append({"role": "user", "content": prompt})
@@ -598,6 +720,55 @@ def display_chat():
         # Rerun to update the chat history
         st.rerun()
 
+def show_transcript(url):
+    """One page of a stored transcript, with search; full text is loaded only to copy or export"""
+    # Restored videos are held by the session rather than the cache
+    transcript = st.session_state.private_videos.get(url, (None, None))[1]
+    pages = transcript_view.page_count(url, transcript=transcript)
+    if not pages:
+        st.markdown("Transcript not available")
+        return
+    page_key = f"transcript_page_{url}"
+    
+    query = st.text_input("Search transcript", key=f"transcript_search_{url}", placeholder="Search this transcript...")
+    if query:
+        matches = transcript_view.search(url, query, transcript=transcript)
+        if matches:
+            labels = [
+                f"[{format_timestamp(m['start'])}] …{m['snippet']}…" if m['start'] is not None else f"…{m['snippet']}…"
+                for m in matches
+            ]
+            choice = st.selectbox(f"{len(matches)} matches", range(len(matches)),
+                                  format_func=labels.__getitem__, key=f"transcript_match_{url}")
+            # Jump to the page holding the selected match (once per selection)
+            jump_key = f"transcript_jump_{url}"
+            if st.session_state.get(jump_key) != (query, choice):
+                st.session_state[jump_key] = (query, choice)
+                st.session_state[page_key] = matches[choice]['page'] + 1
+        else:
+            st.markdown("No matches")
+    
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key=page_key)
+    st.markdown(transcript_view.get_page(url, page - 1, highlight=query or None, transcript=transcript))
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("📋 Copy", key=f"copy_transcript_{url}"):
+            copy_to_clipboard(transcript_view.full_text(url, transcript), f"transcript_{url}")
+    with col2:
+        if st.button("⬇️ Export", key=f"export_transcript_{url}"):
+            st.session_state[f'export_transcript_{url}_ready'] = True
+        if st.session_state.pop(f'export_transcript_{url}_ready', False):
+            st.download_button(
+                "Download .txt",
+                transcript_view.full_text(url, transcript),
+                file_name=f"transcript_{sessions.video_id(url)}.txt",
+                key=f"download_transcript_{url}"
+            )
+    if st.session_state.get(f'show_copy_success_transcript_{url}', False):
+        st.success("✅ Transcript copied to clipboard!")
+        st.session_state[f'show_copy_success_transcript_{url}'] = False
+
 def main():
     # Sidebar
     with st.sidebar:
@@ -648,8 +819,20 @@ def main():
         if youtube_urls and process_button:
             urls = [url.strip() for url in youtube_urls.split('\n') if url.strip()]
             process_videos(urls)
+        
+        uploaded = st.file_uploader("Or restore an exported session:", type=["vmss"])
+        if uploaded and st.button("📂 Restore Session"):
+            try:
+                if restore_session(uploaded):
+                    st.rerun()
+                st.error("❌ The archive contains no videos")
+            except ValueError as e:
+                st.error(f"⚠️ Could not restore the session: {str(e)}")
     
     else:
+        for url, error in st.session_state.pop('ingest_errors', {}).items():
+            st.warning(f"⚠️ {url}: {error}")
+        
         # Show only the tabs interface when videos are processed
         tab_options = ["📝 Summaries", "💬 Chat", "🎯 Transcripts"]
         current_tab_index = tab_options.index(st.session_state.current_tab)
@@ -671,9 +854,20 @@ def main():
         # Display content based on selected tab
         if st.session_state.current_tab == "📝 Summaries":
             st.markdown("### Video Summaries")
+            summary_levels = {"Overview": "video", "Chapters": "chapters", "Sections": "sections"}
             for url, summary in st.session_state.summaries.items():
                 title = st.session_state.video_titles.get(url, 'Untitled Video')
                 with st.expander(f"Summary for: {title}"):
+                    tree = st.session_state.summary_trees.get(url)
+                    if tree:
+                        level = st.radio(
+                            "Detail",
+                            list(summary_levels),
+                            horizontal=True,
+                            key=f"summary_level_{url}",
+                            label_visibility="collapsed"
+                        )
+                        summary = get_summary(tree, summary_levels[level])
                     st.markdown(summary)
                     if st.button("📋 Copy", key=f"copy_summary_{url}"):
                         copy_to_clipboard(summary, f"summary_{url}")
@@ -686,15 +880,15 @@ def main():
         
         else:  # Transcripts tab
             st.markdown("### Full Transcripts")
-            for url, transcript in st.session_state.transcripts.items():
-                title = st.session_state.video_titles.get(url, 'Untitled Video')
-                with st.expander(f"Transcript for: {title}"):
-                    st.markdown(transcript)
-                    if st.button("📋 Copy", key=f"copy_transcript_{url}"):
-                        copy_to_clipboard(transcript, f"transcript_{url}")
-                    if st.session_state.get(f'show_copy_success_transcript_{url}', False):
-                        st.success("✅ Transcript copied to clipboard!")
-                        st.session_state[f'show_copy_success_transcript_{url}'] = False
+            # Only the selected video's current page is rendered on each rerun
+            url = st.selectbox(
+                "Video",
+                list(st.session_state.content_hashes),
+                format_func=lambda u: st.session_state.video_titles.get(u, 'Untitled Video'),
+                key="transcript_video"
+            )
+            if url:
+                show_transcript(url)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
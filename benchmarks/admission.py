@@ -0,0 +1,205 @@
+"""Chat latency and fairness while many users ingest long videos at once.
+
+Several users paste lists of long videos at the same moment while another
+user chats about a video already loaded. Each user's ingest runs in its own
+thread and event loop, as Streamlit runs each click. Transcription is a
+CPU-bound fake that burns CPU time in proportion to the length reported in
+the video's metadata. By default the jobs burn CPU in parallel, as a backend
+without a shared model would; with --model-lock they "decode" their audio
+and then take turns on one lock, as one loaded Whisper model does. The run is
+done twice: without a budget (every transcription starts at once, as before)
+and through src.admission with its audio budget. It reports chat latency,
+peak transcriptions in progress and audio in flight, when each user's first
+video is ready, the queue positions users were shown, and how fast
+over-limit videos were refused.
+
+    python -m benchmarks.admission --users 8 --videos 6 --budget-minutes 90
+    python -m benchmarks.admission --model-lock
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+
+from benchmarks.fakes import install_fakes, FakeYoutubeDL
+from benchmarks.run import percentile
+
+
+class Burner:
+    """Fake Whisper that uses CPU in proportion to the audio length"""
+
+    def __init__(self, durations, realtime_factor, model_lock=False):
+        self.durations = durations
+        self.realtime_factor = realtime_factor
+        self.model_lock = threading.Lock() if model_lock else None
+        self.lock = threading.Lock()
+        self.running = 0
+        self.audio = 0.0
+        self.peak_running = 0
+        self.peak_audio = 0.0
+
+    def __call__(self, video_path):
+        from src.transcript import Transcript
+        from benchmarks.fakes import fake_whisper_result
+        seconds = self.durations[os.path.splitext(os.path.basename(video_path))[0]]
+        with self.lock:
+            self.running += 1
+            self.audio += seconds
+            self.peak_running = max(self.peak_running, self.running)
+            self.peak_audio = max(self.peak_audio, self.audio)
+        try:
+            # Audio is decoded (and held) before the model lock is taken
+            if self.model_lock:
+                self.model_lock.acquire()
+            try:
+                # CPU time, not wall time: contending threads stretch each other out
+                target = time.thread_time() + seconds / self.realtime_factor
+                x = 0
+                while time.thread_time() < target:
+                    for i in range(1000):
+                        x += i * i
+            finally:
+                if self.model_lock:
+                    self.model_lock.release()
+        finally:
+            with self.lock:
+                self.running -= 1
+                self.audio -= seconds
+        return Transcript.from_whisper(fake_whisper_result(video_path, 60))
+
+
+def run(args, limited):
+    from src import admission, sessions
+    from src.ingest import ingest
+    from src.chat import get_chatbot
+    from src.utils import create_vector_store
+    from benchmarks.sessions_load import make_videos
+
+    rng = random.Random(args.seed)
+    if limited:
+        controller = admission.AdmissionController(budget=args.budget_minutes * 60)
+    else:
+        controller = admission.AdmissionController(budget=float("inf"), max_video=float("inf"),
+                                                   user_limit=float("inf"))
+    users = {}
+    durations = {}
+    for u in range(args.users):
+        urls = []
+        for v in range(args.videos):
+            url = f"https://www.youtube.com/watch?v=u{u:02d}v{v:02d}"
+            durations[url] = rng.uniform(args.min_minutes, args.max_minutes) * 60
+            urls.append(url)
+        users[f"user{u:02d}"] = urls
+    # A few videos longer than the limit, and one user who arrives late with one short video
+    oversize = [f"https://www.youtube.com/watch?v=huge{i}" for i in range(args.oversize)]
+    for url in oversize:
+        durations[url] = admission.MAX_VIDEO_SECONDS + 3600
+    users["user00"] = users["user00"] + oversize
+    late = "https://www.youtube.com/watch?v=late"
+    durations[late] = 10 * 60
+
+    burner = Burner({sessions.video_id(url): s for url, s in durations.items()}, args.realtime_factor,
+                    args.model_lock)
+    with tempfile.TemporaryDirectory() as workdir, \
+            install_fakes(workdir, llm_latency=args.llm_latency, download_latency=0.05, audio_seconds=5):
+        FakeYoutubeDL.durations = durations
+        chat_session = sessions.new_session_id()
+        create_vector_store(make_videos(1, 600), chat_session)
+        respond = get_chatbot(chat_session)
+        videos_info = {"https://www.youtube.com/watch?v=video0000": {"title": "Loaded video", "summary": "A talk"}}
+
+        first_ready, places, rejected, lock = {}, {}, [], threading.Lock()
+        start = time.perf_counter()
+
+        def user(name, urls, delay=0.0):
+            time.sleep(delay)
+            submitted = time.perf_counter()
+
+            def on_result(url, result):
+                if result:
+                    with lock:
+                        first_ready.setdefault(name, time.perf_counter() - submitted)
+
+            def on_queue(url, place, ahead):
+                with lock:
+                    places[name] = max(places.get(name, 0), place)
+
+            outcome = asyncio.run(ingest(
+                urls, transcribe_func=burner, policy="whisper", session_id=name, create_store=False,
+                controller=controller, on_result=on_result, on_queue=on_queue
+            ))
+            with lock:
+                rejected.extend(url for url, error in outcome["errors"].items() if url in oversize)
+
+        threads = [threading.Thread(target=user, args=(name, urls)) for name, urls in users.items()]
+        threads.append(threading.Thread(target=user, args=("late", [late], args.late_after)))
+        for t in threads:
+            t.start()
+
+        latencies = []
+        while any(t.is_alive() for t in threads):
+            t0 = time.perf_counter()
+            respond("What are the key takeaways?", videos_info)
+            latencies.append(time.perf_counter() - t0)
+            time.sleep(args.chat_interval)
+        makespan = time.perf_counter() - start
+        for t in threads:
+            t.join()
+
+    waits = [first_ready[name] for name in users if name in first_ready]
+    return {
+        "chat": latencies,
+        "makespan": makespan,
+        "peak_running": burner.peak_running,
+        "peak_audio": burner.peak_audio,
+        "first_ready": waits,
+        "late": first_ready.get("late"),
+        "max_place": max(places.values()) if places else 0,
+        "rejected": len(rejected)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest admission control load test")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--videos", type=int, default=6, help="Videos each user submits")
+    parser.add_argument("--min-minutes", type=float, default=10)
+    parser.add_argument("--max-minutes", type=float, default=90)
+    parser.add_argument("--oversize", type=int, default=2, help="Videos over INGEST_MAX_VIDEO_MINUTES")
+    parser.add_argument("--budget-minutes", type=float, default=90)
+    parser.add_argument("--realtime-factor", type=float, default=3000,
+                        help="Audio seconds transcribed per CPU second")
+    parser.add_argument("--model-lock", action="store_true",
+                        help="Run one transcription at a time, as one loaded Whisper model does")
+    parser.add_argument("--late-after", type=float, default=1.0, help="Seconds before the late user arrives")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--chat-interval", type=float, default=0.1)
+    parser.add_argument("--max-chat-p95", type=float, default=0.5, help="Seconds allowed with admission control")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    results = {limited: run(args, limited) for limited in (False, True)}
+    print(f"{args.users} users x {args.videos} videos of {args.min_minutes:.0f}-{args.max_minutes:.0f} min, "
+          f"budget {args.budget_minutes:.0f} min of audio"
+          f"{', one transcription at a time' if args.model_lock else ''}")
+    print(f"{'mode':<11}{'chat p50':>9}{'p95':>8}{'max':>8}{'peak jobs':>11}{'peak audio':>12}"
+          f"{'first ready p50':>17}{'max':>8}{'late user':>11}{'makespan':>10}")
+    for name, limited in (("unbounded", False), ("admission", True)):
+        r = results[limited]
+        print(f"{name:<11}{percentile(r['chat'], 50) * 1000:>7.0f}ms{percentile(r['chat'], 95) * 1000:>6.0f}ms"
+              f"{max(r['chat']) * 1000:>6.0f}ms{r['peak_running']:>11}{r['peak_audio'] / 60:>9.0f}min"
+              f"{percentile(r['first_ready'], 50):>16.1f}s{max(r['first_ready']):>7.1f}s"
+              f"{r['late'] or float('nan'):>10.1f}s{r['makespan']:>9.1f}s")
+    limited = results[True]
+    print(f"over-limit videos rejected: {limited['rejected']}/{args.oversize}; "
+          f"longest queue position shown: #{limited['max_place']}")
+    ok = limited["rejected"] == args.oversize and percentile(limited["chat"], 95) <= args.max_chat_p95
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Semantic answer cache under repeated questions about popular videos.
+
+Many users load the same few videos and ask mostly the same questions, plus
+some of their own and some follow-ups that depend on the conversation. Runs
+the chat once with the answer cache off and once with it on, and reports hit
+rate, bypassed follow-ups, LLM calls and chat latency. Finally changes one
+video's transcript and checks that answers about it are no longer served.
+
+    python -m benchmarks.answer_cache --sessions 20 --questions 8
+"""
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+from benchmarks.fakes import install_fakes
+from benchmarks.run import percentile
+from benchmarks.sessions_load import make_videos
+
+COMMON = [
+    "What are the key takeaways?",
+    "what are the key takeaways?",
+    "What does the video say about latency?",
+    "What does the video say about the cache?",
+    "How is the model trained?",
+    "Summarize the main points",
+]
+
+FOLLOW_UPS = ["Why is that?", "Can you elaborate on it?", "What did you say before about the index?"]
+
+
+def run(args, pool, cache_answers):
+    from src.chat import get_chatbot
+    from src.utils import create_vector_store, finish_result
+    from src import sessions
+
+    urls = list(pool)
+    # Popularity falls off with rank, so most users load the same videos
+    weights = [1 / (rank + 1) ** 2 for rank in range(len(urls))]
+    lock = threading.Lock()
+    latencies = {"hit": [], "miss": [], "follow-up": []}
+
+    with tempfile.TemporaryDirectory() as workdir, \
+            install_fakes(workdir, llm_latency=args.llm_latency, embed_latency=args.embed_latency,
+                          cache_answers=cache_answers) as fakes:
+        cache = fakes["answer_cache"]
+        # Record per thread whether the last lookup hit
+        served = threading.local()
+        lookup = cache.lookup
+
+        def tracked_lookup(key, vector):
+            answer = lookup(key, vector)
+            served.hit = answer is not None
+            return answer
+        cache.lookup = tracked_lookup
+
+        def user(n):
+            rng = random.Random(args.seed * 1000 + n)
+            mine = []
+            while len(mine) < min(args.per_session, len(urls)):
+                url = rng.choices(urls, weights)[0]
+                if url not in mine:
+                    mine.append(url)
+            session_id = sessions.new_session_id()
+            create_vector_store({url: pool[url] for url in mine}, session_id)
+            videos_info = {url: {"title": url, "transcript": pool[url].text} for url in mine}
+            respond = get_chatbot(session_id)
+
+            for i in range(args.questions):
+                if i and rng.random() < args.follow_up_rate:
+                    question, kind = rng.choice(FOLLOW_UPS), "follow-up"
+                elif rng.random() < args.unique_rate:
+                    question, kind = f"What does the video say about topic {n}-{i}?", None
+                else:
+                    question, kind = rng.choice(COMMON), None
+                served.hit = False
+                start = time.perf_counter()
+                respond(question, videos_info)
+                elapsed = time.perf_counter() - start
+                kind = kind or ("hit" if served.hit else "miss")
+                with lock:
+                    latencies[kind].append(elapsed)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=user, args=(n,)) for n in range(args.sessions)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        # A video's transcript changes: nothing answered from it may be served again
+        stale = 0
+        if cache_answers:
+            url = urls[0]
+            changed = pool[url].text + " corrected"
+            finish_result(url, pool[url].text, url, "whisper")
+            finish_result(url, changed, url, "whisper")
+            respond = get_chatbot(sessions.new_session_id())
+            hits = cache.counters["hits"]
+            respond(COMMON[0], {url: {"title": url, "transcript": changed}})
+            stale = cache.counters["hits"] - hits
+
+        stats = cache.stats()
+        turns = sum(len(v) for v in latencies.values())
+        return {
+            "mode": "cache" if cache_answers else "no cache",
+            "seconds": elapsed,
+            "turns": turns,
+            "llm_calls": sum(llm.calls for llm in fakes["llms"]),
+            "latencies": latencies,
+            "stats": stats,
+            "stale": stale
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer cache benchmark")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--videos", type=int, default=6, help="Size of the video pool")
+    parser.add_argument("--per-session", type=int, default=1)
+    parser.add_argument("--questions", type=int, default=8)
+    parser.add_argument("--follow-up-rate", type=float, default=0.2)
+    parser.add_argument("--unique-rate", type=float, default=0.3)
+    parser.add_argument("--duration", type=float, default=600, help="Seconds of speech per video")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--embed-latency", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    pool = make_videos(args.videos, args.duration)
+    results = [run(args, pool, False), run(args, pool, True)]
+
+    print(f"{'mode':<10}{'turns':>7}{'LLM calls':>11}{'seconds':>9}{'p50 ms':>9}{'p95 ms':>9}")
+    for r in results:
+        every = [x for v in r["latencies"].values() for x in v]
+        print(f"{r['mode']:<10}{r['turns']:>7}{r['llm_calls']:>11}{r['seconds']:>9.2f}"
+              f"{percentile(every, 50) * 1000:>9.1f}{percentile(every, 95) * 1000:>9.1f}")
+
+    cached = results[1]
+    stats = cached["stats"]
+    print()
+    for kind, values in cached["latencies"].items():
+        print(f"{kind:<10} p50 {percentile(values, 50) * 1000:>7.1f} ms  n={len(values)}")
+    print(f"hit rate            {stats['hit_rate']:.0%} ({stats['hits']} hits, {stats['misses']} misses)")
+    print(f"bypassed follow-ups {stats['bypassed']}")
+    print(f"latency saved       {stats['seconds_saved']:.2f} s")
+    print(f"invalidated entries {stats['invalidated']} after a transcript change")
+    print(f"stale answers       {cached['stale']}")
+    return 1 if cached["stale"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
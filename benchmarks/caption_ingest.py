@@ -0,0 +1,172 @@
+"""Caption-first ingest against local subtitle fixtures.
+
+Runs process_video under each transcript policy while the fake yt-dlp serves
+the caption files in benchmarks/fixtures/captions, and reports which source
+was used, the caption quality score and the time spent. Each fixture is
+also parsed directly, and the run fails if any segment's text or timing, the
+chosen source, or the recorded caption fields differ from what the fixture
+should give.
+
+    python -m benchmarks.caption_ingest --realtime-factor 10
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import tempfile
+
+from benchmarks.fakes import FIXTURES_DIR, install_fakes, make_fake_transcriber
+
+CAPTIONS_DIR = os.path.join(FIXTURES_DIR, "captions")
+
+# (start, end, text) of the lines spoken in the full fixtures
+LINES = [
+    (0.0, 3.11, "Welcome back, everyone. Today we're talking"),
+    (3.12, 7.19, "about how vector search works under the hood."),
+    (7.2, 11.99, "First, we split the transcript into chunks."),
+    (12.0, 16.47, "Then each chunk is turned into an embedding,"),
+    (16.48, 21.03, "and similar questions land near similar answers."),
+    (21.04, 25.5, "That's the whole trick. Thanks for watching!")
+]
+
+
+def _plain(text):
+    """Auto-captions are lower case without punctuation"""
+    return re.sub(r"[^\w' ]", "", text.lower())
+
+
+AUTO_LINES = [(start, end, _plain(text)) for start, end, text in LINES]
+
+# (start, end, word) of the first auto-caption line's inline word timings
+AUTO_WORDS = [
+    (0.0, 0.48, "welcome"), (0.48, 0.9, "back"), (0.9, 1.5, "everyone"),
+    (1.5, 2.01, "today"), (2.01, 2.4, "we're"), (2.4, 3.11, "talking")
+]
+
+# Sources each policy should end up with
+GOOD_CAPTIONS = {"prefer_captions": "captions-{kind}", "whisper": "whisper", "compare": "whisper"}
+NO_CAPTIONS = {"prefer_captions": "whisper", "whisper": "whisper", "compare": "whisper"}
+
+CASES = {
+    "manual srv3": {
+        "tracks": {"subtitles": {"en": [("srv3", "manual.en.srv3")]}},
+        "segments": LINES, "kind": "manual", "sources": GOOD_CAPTIONS
+    },
+    "manual srv1": {
+        "tracks": {"subtitles": {"en": [("srv1", "manual.en.srv1")]}},
+        "segments": LINES, "kind": "manual", "sources": GOOD_CAPTIONS
+    },
+    "auto vtt": {
+        "tracks": {"automatic_captions": {"en": [("vtt", "auto.en.vtt")]}},
+        "segments": AUTO_LINES, "words": AUTO_WORDS, "kind": "auto", "sources": GOOD_CAPTIONS
+    },
+    # Only [Music] and [Applause] cues: too little speech to trust
+    "sparse auto vtt": {
+        "tracks": {"automatic_captions": {"en": [("vtt", "sparse.en.vtt")]}},
+        "segments": [(0.0, 2.0, "[Music]"), (24.0, 25.5, "[Applause]")], "kind": "auto", "sources": NO_CAPTIONS
+    },
+    "no captions": {"tracks": {}, "sources": NO_CAPTIONS},
+}
+
+# Caption timings are stored as float32
+TOLERANCE = 1e-3
+
+
+def resolve(tracks):
+    """Turn fixture file names into absolute paths"""
+    return {
+        key: {lang: [(ext, os.path.join(CAPTIONS_DIR, name)) for ext, name in files]
+              for lang, files in langs.items()}
+        for key, langs in tracks.items()
+    }
+
+
+def _close(a, b):
+    return abs(a - b) <= TOLERANCE
+
+
+def check_parse(case, spec):
+    """Problems with how a case's fixture parses (empty list if none)"""
+    from src import captions
+    problems = []
+    for langs in spec["tracks"].values():
+        for files in langs.values():
+            for ext, name in files:
+                with open(os.path.join(CAPTIONS_DIR, name), 'r') as f:
+                    transcript = captions.parse_captions(f.read(), ext)
+                segments = [(s, e, t.strip()) for s, e, t in transcript.segments()]
+                if len(segments) != len(spec["segments"]):
+                    problems.append(f"{name}: {len(segments)} segments, expected {len(spec['segments'])}")
+                for got, want in zip(segments, spec["segments"]):
+                    if got[2] != want[2] or not (_close(got[0], want[0]) and _close(got[1], want[1])):
+                        problems.append(f"{name}: segment {got} != {want}")
+                if "words" in spec:
+                    words = list(transcript.words())[:len(spec["words"])]
+                    for got, want in zip(words, spec["words"]):
+                        if got[2] != want[2] or not (_close(got[0], want[0]) and _close(got[1], want[1])):
+                            problems.append(f"{name}: word {got} != {want}")
+                    if len(words) < len(spec["words"]):
+                        problems.append(f"{name}: {len(words)} word timings, expected {len(spec['words'])}")
+    return problems
+
+
+def check_result(case, spec, policy, result):
+    """Problems with process_video's result for a case and policy"""
+    problems = []
+    has_captions = bool(spec["tracks"])
+    expected = spec["sources"][policy].format(kind=spec.get("kind"))
+    if result["transcript_source"] != expected:
+        problems.append(f"source {result['transcript_source']}, expected {expected}")
+    # Captions are fetched and scored unless the policy skips them
+    fetched = has_captions and policy != "whisper"
+    if fetched != ("caption_quality" in result):
+        problems.append(f"caption_quality {'missing' if fetched else 'recorded'}")
+    # Agreement is recorded whenever Whisper ran while captions were available
+    compared = fetched and result["transcript_source"] == "whisper"
+    if compared != ("caption_agreement" in result):
+        problems.append(f"caption_agreement {'missing' if compared else 'recorded'}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Caption-first ingest benchmark")
+    parser.add_argument("--realtime-factor", type=float, default=10.0,
+                        help="Fake Whisper speed in audio seconds per second")
+    parser.add_argument("--audio-seconds", type=float, default=25.5)
+    args = parser.parse_args(argv)
+
+    from src.utils import process_video
+
+    failures = []
+    for case, spec in CASES.items():
+        failures.extend(f"{case}: {problem}" for problem in check_parse(case, spec))
+
+    transcribe = make_fake_transcriber(realtime_factor=args.realtime_factor)
+    print(f"{'case':<18}{'policy':<17}{'source':<17}{'coverage':>9}{'wpm':>7}{'agree':>7}{'seconds':>9}")
+    for case, spec in CASES.items():
+        for policy in ("prefer_captions", "whisper", "compare"):
+            with tempfile.TemporaryDirectory() as workdir:
+                with install_fakes(workdir, audio_seconds=args.audio_seconds, caption_tracks=resolve(spec["tracks"])):
+                    start = time.perf_counter()
+                    _, result = process_video(f"https://www.youtube.com/watch?v={case}-{policy}", transcribe, policy=policy)
+                    elapsed = time.perf_counter() - start
+            if not result:
+                failures.append(f"{case} / {policy}: process_video failed")
+                print(f"{case:<18}{policy:<17}{'FAILED':<17}")
+                continue
+            failures.extend(f"{case} / {policy}: {problem}" for problem in check_result(case, spec, policy, result))
+            quality = result.get("caption_quality") or {}
+            agree = result.get("caption_agreement")
+            print(
+                f"{case:<18}{policy:<17}{result['transcript_source']:<17}"
+                f"{quality.get('coverage', 0):>9.2f}{quality.get('words_per_minute', 0):>7.0f}"
+                f"{agree if agree is not None else 0:>7.2f}{elapsed:>9.3f}"
+            )
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
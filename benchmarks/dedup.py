@@ -0,0 +1,166 @@
+"""Near-duplicate chunk collapsing on corpora with repeated passages.
+
+Builds fixture corpora of talks that repeat material the way real channels do:
+every talk opens with the same channel intro and carries a sponsor read, some
+talks are re-uploaded (transcribed again, with a few words differing), and a
+lecture series opens each lecture with a recap of the last one. The corpora
+are loaded with near-duplicate detection off and on, and the run reports
+stored vectors, embedded chunks, and how many of the 10 hits per query are
+distinct passages. It fails if any hit cites a video outside the session, or
+if ending every session leaves vectors or shared references behind.
+
+    python -m benchmarks.dedup --talks 20 --minutes 20
+"""
+import os
+import sys
+import random
+import argparse
+import tempfile
+
+from benchmarks.fakes import install_fakes, InMemoryVectorStore, VOCABULARY
+from benchmarks.sessions_load import sources
+
+# Larger vocabulary than fake_words, drawn at random so text does not repeat by itself
+WORDS = VOCABULARY + [f"{a}{b}" for a in ("pre", "re", "un", "co", "sub", "over") for b in VOCABULARY]
+WORDS_PER_MINUTE = 150
+
+
+def passage(rng, minutes):
+    return [rng.choice(WORDS) for _ in range(int(minutes * WORDS_PER_MINUTE))]
+
+
+def retranscribe(rng, words, error_rate):
+    """The same speech transcribed again: a few words come out differently"""
+    return [rng.choice(WORDS) if rng.random() < error_rate else w for w in words]
+
+
+def to_transcript(words, segment_words=10):
+    from src.transcript import Transcript
+    segments = []
+    for i in range(0, len(words), segment_words):
+        start = i / WORDS_PER_MINUTE * 60
+        seg = words[i:i + segment_words]
+        segments.append({"start": start, "end": start + len(seg) / WORDS_PER_MINUTE * 60, "text": " " + " ".join(seg)})
+    return Transcript.from_segments(segments)
+
+
+def make_corpus(args):
+    """URL -> word list"""
+    rng = random.Random(args.seed)
+    intro = passage(rng, 1.5)
+    sponsor = passage(rng, 2)
+    corpus = {}
+    for i in range(args.talks):
+        body = passage(rng, args.minutes)
+        cut = rng.randrange(len(body))
+        corpus[f"https://www.youtube.com/watch?v=talk{i:04d}"] = intro + body[:cut] + sponsor + body[cut:]
+    talks = list(corpus.items())
+    for i, (_, words) in enumerate(talks[:int(len(talks) * args.reupload_rate)]):
+        corpus[f"https://www.youtube.com/watch?v=reup{i:04d}"] = retranscribe(rng, words, args.error_rate)
+    previous = passage(rng, args.minutes)
+    for i in range(args.lectures):
+        recap = retranscribe(rng, previous[-int(3 * WORDS_PER_MINUTE):], args.error_rate)
+        previous = passage(rng, args.minutes)
+        corpus[f"https://www.youtube.com/watch?v=lect{i:04d}"] = recap + previous
+    return corpus
+
+
+def stored_vectors():
+    return sum(len(rows) for rows in InMemoryVectorStore.namespaces.values())
+
+
+def distinct(texts):
+    """Number of distinct passages among texts (near-duplicates count once)"""
+    from src import dedup
+    kept = []
+    for signature in dedup.minhash(texts):
+        if not any(dedup.similarity(signature, other) >= dedup.THRESHOLD for other in kept):
+            kept.append(signature)
+    return len(kept)
+
+
+def run(args, corpus, queries, dedup_chunks):
+    from src import utils, sessions, dedup
+    rng = random.Random(args.seed)
+    urls = list(corpus)
+    with tempfile.TemporaryDirectory() as workdir, \
+            install_fakes(workdir, dedup_chunks=dedup_chunks) as fakes:
+        # One session holds the whole corpus; the others load a random few videos
+        everything = sessions.new_session_id()
+        utils.create_vector_store({url: to_transcript(w) for url, w in corpus.items()}, everything)
+        session_ids = [everything]
+        picks = {}
+        for _ in range(args.sessions):
+            session_id = sessions.new_session_id()
+            picks[session_id] = set(rng.sample(urls, min(3, len(urls))))
+            utils.create_vector_store({url: to_transcript(corpus[url]) for url in picks[session_id]}, session_id)
+            session_ids.append(session_id)
+        result = {
+            "vectors": stored_vectors(),
+            "embedded": fakes["embeddings"].texts_embedded,
+            "ratio": dedup.stats()["ratio"] if dedup_chunks else 0.0
+        }
+
+        diversity, context_chars = [], 0
+        for query in queries:
+            context = utils.get_video_context(query, everything)
+            passages = [block.split(":\n", 1)[1] for block in context.split("\n\n") if ":\n" in block]
+            diversity.append(distinct(passages) / len(passages))
+            context_chars += len(context)
+        violations = 0
+        for session_id, mine in picks.items():
+            for query in queries[:5]:
+                violations += len(sources(utils.get_video_context(query, session_id)) - mine)
+        result.update(diversity=sum(diversity) / len(diversity), context=context_chars / len(queries),
+                      violations=violations)
+
+        for session_id in session_ids:
+            utils.end_session(session_id)
+        registry = sessions.snapshot()
+        signatures = dedup.signature_dir()
+        # Signature files are pruned when the index next syncs with the registry
+        dedup._sync(fakes["chunk_index"], registry)
+        result["leftover"] = (
+            stored_vectors() + len(registry.get("shared", {}))
+            + (len(os.listdir(signatures)) if os.path.isdir(signatures) else 0)
+        )
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Near-duplicate chunk benchmark")
+    parser.add_argument("--talks", type=int, default=20)
+    parser.add_argument("--lectures", type=int, default=8)
+    parser.add_argument("--minutes", type=float, default=20)
+    parser.add_argument("--reupload-rate", type=float, default=0.3, help="Share of talks uploaded twice")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Words differing between transcriptions")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    corpus = make_corpus(args)
+    rng = random.Random(args.seed + 1)
+    queries = []
+    for _ in range(args.queries):
+        words = corpus[rng.choice(list(corpus))]
+        start = rng.randrange(max(1, len(words) - 30))
+        queries.append(" ".join(words[start:start + 30]))
+
+    results = {flag: run(args, corpus, queries, flag) for flag in (False, True)}
+    off, on = results[False], results[True]
+    print(f"{len(corpus)} videos ({args.talks} talks, {int(args.talks * args.reupload_rate)} re-uploads, "
+          f"{args.lectures} lectures), {args.minutes:.0f} min each")
+    print(f"{'dedup':<8}{'vectors':>9}{'embedded':>10}{'distinct hits':>15}{'context chars':>15}"
+          f"{'violations':>12}{'leftover':>10}")
+    for name, r in (("off", off), ("on", on)):
+        print(f"{name:<8}{r['vectors']:>9}{r['embedded']:>10}{r['diversity']:>15.0%}{r['context']:>15.0f}"
+              f"{r['violations']:>12}{r['leftover']:>10}")
+    print(f"index size reduction {1 - on['vectors'] / off['vectors']:.1%}, "
+          f"{on['ratio']:.1%} of chunks reused a stored vector")
+    failed = any(r["violations"] or r["leftover"] for r in results.values())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
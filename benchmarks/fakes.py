@@ -0,0 +1,485 @@
+"""Local stand-ins for YouTube, OpenAI and Pinecone used by the benchmarks."""
+import os
+import math
+import time
+import wave
+import struct
+import hashlib
+import threading
+from types import SimpleNamespace
+from typing import Any
+from contextlib import ExitStack, contextmanager
+from unittest import mock
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+
+EMBEDDING_DIM = 1536
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+VOCABULARY = (
+    "the model video data learning system network training results example "
+    "people time question answer important research approach problem value "
+    "language speech audio transcript summary chapter section pipeline cache "
+    "memory performance latency throughput index vector search query context"
+).split()
+
+
+def make_fixture_audio(path, seconds=60, sample_rate=16000):
+    """Write a mono 16-bit sine-wave WAV file used as fixture audio"""
+    frames = bytearray()
+    for i in range(int(seconds * sample_rate)):
+        sample = int(8000 * math.sin(2 * math.pi * 440 * i / sample_rate))
+        frames += struct.pack("<h", sample)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(bytes(frames))
+    return path
+
+
+def audio_duration(path):
+    """Duration of a WAV file in seconds"""
+    with wave.open(path, "rb") as f:
+        return f.getnframes() / f.getframerate()
+
+
+def fake_words(seed, count):
+    """Deterministic pseudo-text for a seed"""
+    digest = hashlib.sha256(seed.encode()).digest()
+    words = []
+    for i in range(count):
+        words.append(VOCABULARY[(digest[i % len(digest)] + i * 7) % len(VOCABULARY)])
+    return " ".join(words)
+
+
+class FakeYoutubeDL:
+    """yt_dlp.YoutubeDL stand-in that serves local fixture audio"""
+
+    fixture_path = None
+    latency = 0.0
+    duration = 60
+    # Duration reported for particular URLs (others report `duration`)
+    durations = {}
+    # {"subtitles" | "automatic_captions": {lang: [(ext, local path), ...]}}
+    caption_tracks = {}
+    # Drop the connection after this many bytes per download (None: never)
+    interrupt_after = None
+    downloads = 0
+    bytes_sent = 0
+    _lock = threading.Lock()
+
+    def __init__(self, opts=None):
+        self.opts = opts or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url, download=False):
+        time.sleep(self.latency)
+        video_id = hashlib.md5(url.encode()).hexdigest()[:11]
+        if download:
+            self._download(self.opts["outtmpl"])
+        info = {
+            "id": video_id,
+            "title": f"Fixture video {video_id}",
+            "duration": self.durations.get(url, self.duration),
+            "filesize": os.path.getsize(self.fixture_path)
+        }
+        for key, tracks in self.caption_tracks.items():
+            info[key] = {
+                lang: [{"ext": ext, "url": path} for ext, path in files]
+                for lang, files in tracks.items()
+            }
+        return info
+
+    def _download(self, target):
+        """Write through target.part like yt-dlp, resuming it when continuedl is set"""
+        partial = target + ".part"
+        offset = os.path.getsize(partial) if self.opts.get("continuedl") and os.path.exists(partial) else 0
+        with open(self.fixture_path, "rb") as src, open(partial, "ab" if offset else "wb") as dst:
+            src.seek(offset)
+            data = src.read()
+            if self.interrupt_after is not None and len(data) > self.interrupt_after:
+                dst.write(data[:self.interrupt_after])
+                self._count(self.interrupt_after)
+                raise ConnectionResetError("connection reset by peer")
+            dst.write(data)
+            self._count(len(data))
+        os.replace(partial, target)
+
+    @classmethod
+    def _count(cls, sent):
+        with cls._lock:
+            cls.downloads += 1
+            cls.bytes_sent += sent
+
+    def urlopen(self, url):
+        time.sleep(self.latency)
+        return open(url, "rb")
+
+
+class FakeYtDlp:
+    """Module-shaped holder so code can keep calling yt_dlp.YoutubeDL"""
+    YoutubeDL = FakeYoutubeDL
+
+
+def fake_whisper_result(seed, duration, words_per_minute=150, segment_seconds=4.0, word_timestamps=False):
+    """Whisper-shaped result dict with deterministic text and timestamps"""
+    words = fake_words(seed, int(duration / 60 * words_per_minute)).split()
+    per_segment = max(1, int(segment_seconds / 60 * words_per_minute))
+    segments = []
+    for i in range(0, len(words), per_segment):
+        start = i / words_per_minute * 60
+        seg_words = words[i:i + per_segment]
+        seg = {
+            "start": start,
+            "end": min(duration, start + len(seg_words) / words_per_minute * 60),
+            "text": " " + " ".join(seg_words)
+        }
+        if word_timestamps:
+            step = (seg["end"] - seg["start"]) / len(seg_words)
+            seg["words"] = [
+                {"word": " " + w, "start": start + k * step, "end": start + (k + 1) * step}
+                for k, w in enumerate(seg_words)
+            ]
+        segments.append(seg)
+    return {"text": "".join(s["text"] for s in segments), "segments": segments}
+
+
+def make_fake_transcriber(realtime_factor=200.0, words_per_minute=150):
+    """Transcriber that sleeps in proportion to audio length and returns fixture text"""
+    from src.transcript import Transcript
+
+    def transcribe(video_path):
+        duration = audio_duration(video_path)
+        time.sleep(duration / realtime_factor)
+        return Transcript.from_whisper(fake_whisper_result(video_path, duration, words_per_minute))
+    return transcribe
+
+
+class FakeRateLimitError(Exception):
+    """429 from a fake provider"""
+
+    status_code = 429
+
+    def __init__(self, retry_after, limit="requests per min (RPM)"):
+        super().__init__(f"Rate limit reached on {limit}, retry after {retry_after:.2f}s")
+        self.retry_after = retry_after
+
+
+class ProviderLimits:
+    """Server-side request/token budget of a fake provider; raises a 429 when exceeded"""
+
+    def __init__(self, rpm=None, tpm=None, burst_seconds=1.0):
+        from src.ratelimit import RateLimiter, TokenBucket
+        self.limiter = RateLimiter(rpm, tpm) if rpm else None
+        if self.limiter:
+            # Providers enforce limits over short windows, not a whole minute's burst
+            self.limiter.requests = TokenBucket(rpm, max(1.0, rpm / 60 * burst_seconds))
+            if tpm:
+                self.limiter.tokens = TokenBucket(tpm, tpm / 60 * burst_seconds)
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def check(self, tokens):
+        if not self.limiter:
+            return
+        wait = self.limiter.requests.try_acquire(1)
+        limit = "requests per min (RPM)"
+        if not wait and self.limiter.tokens:
+            wait = self.limiter.tokens.try_acquire(tokens)
+            limit = "tokens per min (TPM)"
+            if wait:
+                self.limiter.requests.release(1)
+        if wait:
+            with self._lock:
+                self.rejected += 1
+            raise FakeRateLimitError(wait, limit)
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic hashed bag-of-words embeddings"""
+
+    def __init__(self, dim=EMBEDDING_DIM, latency=0.0, limits=None):
+        self.dim = dim
+        self.latency = latency
+        self.limits = limits or ProviderLimits()
+        self.calls = 0
+        self.texts_embedded = 0
+        self._lock = threading.Lock()
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            h = int.from_bytes(hashlib.md5(word.encode()).digest()[:8], "little")
+            vector[h % self.dim] += 1.0 if (h >> 63) == 0 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        self.limits.check(sum(len(t) for t in texts) // 4)
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            self.texts_embedded += len(texts)
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class FakeLLM(LLM):
+    """LLM with configurable latency that echoes the tail of its prompt"""
+
+    latency: float = 0.0
+    calls: int = 0
+    limits: Any = None
+
+    @property
+    def _llm_type(self):
+        return "fake"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        if self.limits:
+            self.limits.check(len(prompt) // 4)
+        time.sleep(self.latency)
+        self.calls += 1
+        return " ".join(prompt.split()[-40:])
+
+    def get_num_tokens(self, text):
+        return len(text) // 4
+
+
+class InMemoryVectorStore:
+    """Pinecone vector store stand-in keyed by namespace"""
+
+    namespaces = {}
+    _lock = threading.Lock()
+
+    def __init__(self, embedding, namespace=None):
+        self.embedding = embedding
+        self.namespace = namespace or ""
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, index_name=None,
+                   namespace=None, batch_size=32, **kwargs):
+        store = cls(embedding, namespace)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [None] * len(texts)
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i:i + batch_size]
+            vectors = embedding.embed_documents(batch)
+            store.add(batch, vectors, metadatas[i:i + batch_size], ids[i:i + batch_size])
+        return store
+
+    @classmethod
+    def from_existing_index(cls, index_name, embedding, namespace=None, **kwargs):
+        return cls(embedding, namespace)
+
+    def add(self, texts, vectors, metadatas, ids=None):
+        ids = ids or [None] * len(texts)
+        with self._lock:
+            rows = self.namespaces.setdefault(self.namespace, [])
+            # Upserts replace rows with the same ID, like Pinecone
+            replaced = {i for i in ids if i is not None}
+            if replaced:
+                rows[:] = [r for r in rows if r[3] not in replaced]
+            for text, vector, metadata, id_ in zip(texts, vectors, metadatas, ids):
+                rows.append((np.asarray(vector, dtype=np.float32), text, dict(metadata), id_))
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None, namespace=None):
+        rows = [
+            r for r in self.namespaces.get(namespace or self.namespace, [])
+            if _matches(r[2], filter)
+        ]
+        if not rows:
+            return []
+        q = np.asarray(embedding, dtype=np.float32)
+        scores = np.stack([r[0] for r in rows]) @ q
+        best = np.argsort(-scores)[:k]
+        return [(Document(page_content=rows[i][1], metadata=dict(rows[i][2])), float(scores[i])) for i in best]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)]
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k=k, filter=filter)
+
+
+def _matches(metadata, filter):
+    """Evaluate the subset of Pinecone metadata filters the app uses"""
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        value = metadata.get(key)
+        values = value if isinstance(value, list) else [value]
+        if isinstance(condition, dict):
+            if "$in" in condition and not set(values) & set(condition["$in"]):
+                return False
+            if "$eq" in condition and condition["$eq"] not in values:
+                return False
+        elif condition not in values:
+            return False
+    return True
+
+
+class FakeIndex:
+    """pinecone.Index stand-in backed by InMemoryVectorStore"""
+
+    upserts = 0
+    latency = 0.0
+
+    def __init__(self, name):
+        self.name = name
+
+    def delete(self, ids=None, delete_all=False, namespace=None, filter=None):
+        with InMemoryVectorStore._lock:
+            if delete_all and namespace is None:
+                InMemoryVectorStore.namespaces.clear()
+            elif delete_all:
+                InMemoryVectorStore.namespaces.pop(namespace, None)
+            elif filter:
+                rows = InMemoryVectorStore.namespaces.get(namespace or "", [])
+                rows[:] = [r for r in rows if not _matches(r[2], filter)]
+            elif ids:
+                rows = InMemoryVectorStore.namespaces.get(namespace or "", [])
+                drop = set(ids)
+                rows[:] = [r for r in rows if r[3] not in drop]
+
+    def fetch(self, ids, namespace=None):
+        wanted = set(ids)
+        with InMemoryVectorStore._lock:
+            rows = [r for r in InMemoryVectorStore.namespaces.get(namespace or "", []) if r[3] in wanted]
+        return SimpleNamespace(vectors={
+            r[3]: SimpleNamespace(id=r[3], values=r[0].tolist(), metadata={**r[2], "text": r[1]})
+            for r in rows
+        })
+
+    def update(self, id, set_metadata=None, namespace=None):
+        with InMemoryVectorStore._lock:
+            for row in InMemoryVectorStore.namespaces.get(namespace or "", []):
+                if row[3] == id:
+                    row[2].update(set_metadata or {})
+
+    def upsert(self, vectors, namespace=None):
+        time.sleep(FakeIndex.latency)
+        FakeIndex.upserts += 1
+        ids, values, texts, metadatas = [], [], [], []
+        for id_, vector, metadata in vectors:
+            metadata = dict(metadata)
+            texts.append(metadata.pop("text", ""))
+            ids.append(id_)
+            values.append(vector)
+            metadatas.append(metadata)
+        InMemoryVectorStore(None, namespace).add(texts, values, metadatas, ids)
+        return SimpleNamespace(upserted_count=len(ids))
+
+
+class FakePineconeClient:
+    """pinecone.Pinecone client stand-in"""
+
+    indexes = set()
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def list_indexes(self):
+        return [SimpleNamespace(name=name) for name in self.indexes]
+
+    def create_index(self, name, **kwargs):
+        self.indexes.add(name)
+
+    def Index(self, name):
+        return FakeIndex(name)
+
+
+@contextmanager
+def install_fakes(workdir, llm_latency=0.0, embed_latency=0.0,
+                  download_latency=0.0, audio_seconds=60, caption_tracks=None,
+                  embed_limits=None, llm_limits=None, scheduler_limiters=None, cache_answers=False,
+                  dedup_chunks=False):
+    """Route every external dependency of src.* to local fakes
+    Args:
+        workdir: Scratch directory for the cache and downloaded media
+        llm_latency: Seconds added to every LLM call
+        embed_latency: Seconds added to every embedding batch
+        download_latency: Seconds added to every yt-dlp call
+        audio_seconds: Length of the fixture audio served for each video
+        caption_tracks: Caption files served as subtitles/automatic_captions
+        embed_limits: ProviderLimits enforced by the embeddings provider
+        llm_limits: ProviderLimits enforced by the LLM provider (shared by every LLM)
+        scheduler_limiters: Client-side budgets for a fresh src.scheduler.Scheduler
+            (unlimited by default so other benchmarks are not throttled)
+        cache_answers: Use a fresh src.answer_cache.AnswerCache (off by default so
+            repeated chat questions still measure the full answer path)
+        dedup_chunks: Collapse near-duplicate chunks with a fresh src.dedup.ChunkIndex
+            (off by default: fake_words text repeats every 160 words, so nearly
+            every chunk of a fake transcript is a near-duplicate of another)
+    """
+    import src.utils
+    import src.captions
+    import src.summarizer
+    import src.chat
+    import src.scheduler
+    import src.answer_cache
+    import src.dedup
+    from src.ratelimit import RateLimiter
+
+    fixture = make_fixture_audio(os.path.join(workdir, "fixture.wav"), audio_seconds)
+    FakeYoutubeDL.fixture_path = fixture
+    FakeYoutubeDL.latency = download_latency
+    FakeYoutubeDL.duration = audio_seconds
+    FakeYoutubeDL.durations = {}
+    FakeYoutubeDL.caption_tracks = caption_tracks or {}
+    FakeYoutubeDL.interrupt_after = None
+    FakeYoutubeDL.downloads = 0
+    FakeYoutubeDL.bytes_sent = 0
+    InMemoryVectorStore.namespaces = {}
+    FakePineconeClient.indexes = set()
+    FakeIndex.upserts = 0
+    FakeIndex.latency = 0.0
+
+    embeddings = FakeEmbeddings(latency=embed_latency, limits=embed_limits)
+    scheduler = src.scheduler.Scheduler(limiters=scheduler_limiters or {
+        "llm": RateLimiter(10 ** 9, 10 ** 12),
+        "embeddings": RateLimiter(10 ** 9, 10 ** 12)
+    })
+    answer_cache = src.answer_cache.AnswerCache()
+    chunk_index = src.dedup.ChunkIndex()
+    llms = []
+
+    def make_llm(*args, **kwargs):
+        llm = FakeLLM(latency=llm_latency, limits=llm_limits)
+        llms.append(llm)
+        return llm
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        with ExitStack() as stack:
+            stack.enter_context(mock.patch.object(src.utils, "CACHE_DIR", os.path.join(workdir, "cache")))
+            stack.enter_context(mock.patch.object(src.utils, "yt_dlp", FakeYtDlp))
+            stack.enter_context(mock.patch.object(src.captions, "yt_dlp", FakeYtDlp))
+            stack.enter_context(mock.patch.object(src.utils, "Pinecone", InMemoryVectorStore))
+            stack.enter_context(mock.patch.object(src.utils, "PineconeClient", FakePineconeClient))
+            stack.enter_context(mock.patch.object(src.utils, "get_embeddings", lambda: embeddings))
+            stack.enter_context(mock.patch.object(src.summarizer, "OpenAI", make_llm))
+            stack.enter_context(mock.patch.object(src.chat, "ChatOpenAI", make_llm))
+            stack.enter_context(mock.patch.object(src.scheduler, "get_scheduler", lambda: scheduler))
+            stack.enter_context(mock.patch.object(src.answer_cache, "ENABLED", cache_answers))
+            stack.enter_context(mock.patch.object(src.answer_cache, "get_answer_cache", lambda: answer_cache))
+            stack.enter_context(mock.patch.object(src.dedup, "ENABLED", dedup_chunks))
+            stack.enter_context(mock.patch.object(src.dedup, "get_index", lambda: chunk_index))
+            os.makedirs(os.path.join(workdir, "cache"), exist_ok=True)
+            yield {"embeddings": embeddings, "llms": llms, "fixture": fixture, "scheduler": scheduler,
+                   "answer_cache": answer_cache, "chunk_index": chunk_index}
+    finally:
+        os.chdir(cwd)
@@ -0,0 +1,75 @@
+"""Import-time benchmark for the app's own modules.
+
+Runs `python -X importtime` in fresh interpreters (one discarded warm-up
+run, which compiles bytecode and fills the file cache, then several timed
+ones), reports the slowest imports of the median run and fails when the
+median total exceeds the budget.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --budget-ms 100 --modules src.utils,src.chat
+"""
+import sys
+import argparse
+import subprocess
+
+DEFAULT_MODULES = "src.utils,src.chat,src.summarizer,src.transcriber"
+
+# Importing the app's own modules must not pull in whisper, torch, yt-dlp,
+# LangChain, OpenAI or Pinecone. They currently take 110-175 ms depending on
+# machine load; yt-dlp alone adds ~240 ms and LangChain over a second, and
+# every heavy package fails the check by name whatever the time
+DEFAULT_BUDGET_MS = 250
+HEAVY_MODULES = ("whisper", "torch", "yt_dlp", "langchain", "langchain_openai",
+                 "langchain_community", "openai", "pinecone")
+
+
+def measure_imports(modules, runs=7):
+    """Return (median total ms, per-module rows of the median run, every run's total ms)"""
+    statement = "; ".join(f"import {m}" for m in modules)
+    samples = []
+    for i in range(runs + 1):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", statement],
+            capture_output=True, text=True, check=True
+        )
+        rows = []
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            rows.append((name.strip(), int(self_us), int(cumulative_us)))
+        if i:
+            samples.append((sum(self_us for _, self_us, _ in rows) / 1000, rows))
+    samples.sort(key=lambda sample: sample[0])
+    total, rows = samples[len(samples) // 2]
+    return total, rows, [t for t, _ in samples]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure import time of the app modules")
+    parser.add_argument("--modules", default=DEFAULT_MODULES)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=7, help="Timed runs after the warm-up")
+    args = parser.parse_args(argv)
+
+    modules = [m.strip() for m in args.modules.split(",") if m.strip()]
+    total, rows, totals = measure_imports(modules, args.runs)
+
+    print(f"{'module':<50}{'cumulative ms':>15}")
+    for name, _, cumulative_us in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"{name:<50}{cumulative_us / 1000:>15.1f}")
+
+    loaded = {name.split(".")[0] for name, _, _ in rows}
+    heavy = sorted(loaded & set(HEAVY_MODULES))
+    print()
+    print(f"Total import time: {total:.1f} ms median of {len(totals)} runs "
+          f"({totals[0]:.1f}-{totals[-1]:.1f} ms, budget {args.budget_ms:.0f} ms)")
+    if heavy:
+        print(f"Heavy dependencies imported eagerly: {', '.join(heavy)}")
+
+    return 0 if total <= args.budget_ms and not heavy else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
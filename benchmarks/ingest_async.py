@@ -0,0 +1,121 @@
+"""Threaded vs asyncio ingestion.
+
+Runs the original thread-pool path (process_video per video, then summary
+trees and one vector store build) and src.ingest.ingest over the same fake
+providers with fixed latencies, and reports wall time, throughput and how
+many calls each provider had in flight at once.
+
+    python -m benchmarks.ingest_async --videos 20 --download-latency 0.2 --llm-latency 0.2
+"""
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+import concurrent.futures
+
+from benchmarks.fakes import install_fakes, make_fake_transcriber
+
+
+def run_threaded(urls, transcribe):
+    """The pre-asyncio app.py path"""
+    from src.utils import process_video, create_vector_store, update_cache
+    from src.summarizer import build_summary_tree
+
+    texts = {}
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        futures = [executor.submit(process_video, url, transcribe) for url in urls]
+        for future in concurrent.futures.as_completed(futures):
+            url, result = future.result()
+            if result:
+                texts[url] = result["timed_transcript"]
+                update_cache(url, summary_tree=build_summary_tree(texts[url]))
+    create_vector_store(texts)
+    return len(texts)
+
+
+def run_async(urls, transcribe, concurrency):
+    from src.ingest import ingest, Providers
+
+    async def main():
+        providers = Providers(concurrency=concurrency)
+        try:
+            outcome = await ingest(urls, transcribe_func=transcribe, providers=providers)
+        finally:
+            providers.shutdown()
+        return sum(1 for r in outcome["results"].values() if r)
+
+    return asyncio.run(main())
+
+
+def track_in_flight(func, peak):
+    """Wrap func to record the peak number of concurrent calls"""
+    lock = threading.Lock()
+    state = {"now": 0}
+
+    def wrapper(*args, **kwargs):
+        with lock:
+            state["now"] += 1
+            peak[0] = max(peak[0], state["now"])
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with lock:
+                state["now"] -= 1
+    return wrapper
+
+
+def serialized(func):
+    """One transcription at a time, like the shared Whisper model in src.transcriber"""
+    lock = threading.Lock()
+
+    def wrapper(*args, **kwargs):
+        with lock:
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Threaded vs asyncio ingestion benchmark")
+    parser.add_argument("--videos", type=int, default=20)
+    parser.add_argument("--download-latency", type=float, default=0.2)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--realtime-factor", type=float, default=50.0,
+                        help="Fake Whisper speed in audio seconds per second")
+    parser.add_argument("--audio-seconds", type=float, default=30.0)
+    parser.add_argument("--youtube-concurrency", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    import src.utils
+
+    transcribe = serialized(make_fake_transcriber(realtime_factor=args.realtime_factor))
+    concurrency = {"youtube": args.youtube_concurrency}
+    runners = {
+        "threaded": lambda urls, t: run_threaded(urls, t),
+        "asyncio": lambda urls, t: run_async(urls, t, concurrency),
+    }
+
+    print(f"{'mode':<10}{'videos':>8}{'ok':>5}{'seconds':>9}{'videos/s':>10}{'peak yt-dlp':>13}")
+    for name, runner in runners.items():
+        urls = [f"https://www.youtube.com/watch?v={name}{i:04d}" for i in range(args.videos)]
+        with tempfile.TemporaryDirectory() as workdir:
+            with install_fakes(workdir, llm_latency=args.llm_latency, embed_latency=args.embed_latency,
+                               download_latency=args.download_latency, audio_seconds=args.audio_seconds):
+                peak = [0]
+                yt_dlp = src.utils.yt_dlp
+                original = yt_dlp.YoutubeDL.extract_info
+                yt_dlp.YoutubeDL.extract_info = track_in_flight(original, peak)
+                try:
+                    start = time.perf_counter()
+                    ok = runner(urls, transcribe)
+                    elapsed = time.perf_counter() - start
+                finally:
+                    yt_dlp.YoutubeDL.extract_info = original
+        print(f"{name:<10}{args.videos:>8}{ok:>5}{elapsed:>9.2f}{args.videos / elapsed:>10.1f}{peak[0]:>13}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Media cache: single-flight, resumable downloads, integrity checks and LRU eviction.
+
+Runs each scenario against the fake yt-dlp source and reports what it had to
+transfer:
+
+- several workers ask for the same video at once (one download expected)
+- the connection drops repeatedly mid-download (resume vs starting over)
+- a cached file is truncated on disk (detected and downloaded again)
+- more videos than the size cap allows (least recently used evicted)
+- a video is processed and then retranscribed (media still there)
+
+    python -m benchmarks.media_cache --workers 8 --audio-seconds 60
+"""
+import os
+import sys
+import argparse
+import tempfile
+import threading
+from unittest import mock
+
+from benchmarks.fakes import install_fakes, make_fake_transcriber, FakeYoutubeDL
+
+
+def url(i):
+    return f"https://www.youtube.com/watch?v=media{i:04d}"
+
+
+def concurrent_fetch(workers):
+    from src.utils import download_mp4_from_youtube
+    paths = []
+    barrier = threading.Barrier(workers)
+
+    def worker():
+        barrier.wait()
+        with download_mp4_from_youtube(url(0)) as path:
+            paths.append(path)
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {"workers": workers, "downloads": FakeYoutubeDL.downloads, "paths": len(set(paths))}
+
+
+def interrupted(size, resume):
+    from src import media_cache
+    from src.utils import download_mp4_from_youtube
+    FakeYoutubeDL.interrupt_after = size // 3 + 1
+    # Without resume every attempt starts from byte 0 and never gets further
+    continuedl = {} if resume else {"continuedl": False}
+    original = FakeYoutubeDL.__init__
+
+    def init(self, opts=None):
+        original(self, {**(opts or {}), **continuedl})
+    try:
+        with mock.patch.object(FakeYoutubeDL, "__init__", init), \
+                mock.patch.object(media_cache, "DOWNLOAD_ATTEMPTS", 5):
+            download_mp4_from_youtube(url(1)).release()
+        ok = True
+    except ConnectionResetError:
+        ok = False
+    finally:
+        FakeYoutubeDL.interrupt_after = None
+    return {"ok": ok, "bytes_sent": FakeYoutubeDL.bytes_sent, "attempts": FakeYoutubeDL.downloads}
+
+
+def corrupted():
+    from src import media_cache, sessions
+    from src.utils import download_mp4_from_youtube
+    with download_mp4_from_youtube(url(2)) as path:
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) // 2)
+    before = FakeYoutubeDL.downloads
+    download_mp4_from_youtube(url(2)).release()
+    return {"redownloaded": FakeYoutubeDL.downloads - before,
+            "valid": media_cache.validate(sessions.video_id(url(2))) == path}
+
+
+def capped(size, videos, keep):
+    from src import media_cache, sessions
+    from src.utils import download_mp4_from_youtube
+    cap = size * keep + size // 2
+    with mock.patch.object(media_cache, "MAX_BYTES", cap):
+        for i in range(videos):
+            download_mp4_from_youtube(url(100 + i)).release()
+            # The first video is used again after each download, so it stays recent
+            download_mp4_from_youtube(url(100)).release()
+    stats = media_cache.stats()
+    return {"cap": cap, "bytes": stats["bytes"], "files": stats["files"],
+            "first_kept": media_cache.validate(sessions.video_id(url(100))) is not None}
+
+
+def retranscribe():
+    from src.utils import process_video, download_mp4_from_youtube
+    transcribe = make_fake_transcriber()
+    _, result = process_video(url(200), transcribe, policy="whisper")
+    before = FakeYoutubeDL.downloads
+    with download_mp4_from_youtube(url(200)) as path:
+        transcribe(path)
+    return {"processed": result is not None, "downloads": FakeYoutubeDL.downloads - before}
+
+
+def fresh(workdir, name, args, func, *func_args):
+    with install_fakes(os.path.join(workdir, name), audio_seconds=args.audio_seconds,
+                       download_latency=args.download_latency):
+        return func(*func_args)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Media cache benchmark")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--audio-seconds", type=float, default=60)
+    parser.add_argument("--download-latency", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in ("concurrent", "resume", "restart", "corrupt", "capped", "retranscribe"):
+            os.makedirs(os.path.join(workdir, name))
+        size = int(args.audio_seconds * 16000 * 2) + 44
+        same = fresh(workdir, "concurrent", args, concurrent_fetch, args.workers)
+        resume = fresh(workdir, "resume", args, interrupted, size, True)
+        restart = fresh(workdir, "restart", args, interrupted, size, False)
+        corrupt = fresh(workdir, "corrupt", args, corrupted)
+        cap = fresh(workdir, "capped", args, capped, size, 6, 3)
+        again = fresh(workdir, "retranscribe", args, retranscribe)
+
+    print(f"same video, {same['workers']} workers    {same['downloads']} download(s), {same['paths']} path(s)")
+    print(f"interrupted, resume       {'ok' if resume['ok'] else 'failed'} after {resume['attempts']} attempts, "
+          f"{resume['bytes_sent'] / size:.2f}x file size transferred")
+    print(f"interrupted, restart      {'ok' if restart['ok'] else 'failed'} after {restart['attempts']} attempts, "
+          f"{restart['bytes_sent'] / size:.2f}x file size transferred")
+    print(f"truncated cache file      {corrupt['redownloaded']} re-download(s), valid afterwards: {corrupt['valid']}")
+    print(f"size cap {cap['cap'] / 1e6:.1f} MB         {cap['files']} files, {cap['bytes'] / 1e6:.1f} MB kept, "
+          f"recently used video kept: {cap['first_kept']}")
+    print(f"retranscribe after use    {again['downloads']} download(s)")
+    ok = (same["downloads"] == 1 and resume["ok"] and corrupt["valid"] and cap["bytes"] <= cap["cap"]
+          and cap["first_kept"] and again["downloads"] == 0)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""Offline pipeline benchmarks.
+
+Drives process_video, summarize_text, build_summary_tree, create_vector_store and the chatbot
+response function against the local fakes in benchmarks/fakes.py, so no
+YouTube, OpenAI or Pinecone access is needed.
+
+    python -m benchmarks.run                      # run and compare to baseline
+    python -m benchmarks.run --save-baseline      # record a new baseline
+    python -m benchmarks.run --scales 1,10 --chat-turns 200
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+import concurrent.futures
+
+from benchmarks.fakes import install_fakes, make_fake_transcriber
+from src import metrics
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+# Scenarios with fewer calls are compared on throughput only
+MIN_P95_SAMPLES = 20
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def measure(name, items, func, workers=1):
+    """Run func over items and report throughput, latency percentiles and peak memory"""
+    latencies = []
+
+    def timed(item):
+        start = time.perf_counter()
+        result = func(item)
+        latencies.append(time.perf_counter() - start)
+        return result
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    if workers > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(timed, items))
+    else:
+        results = [timed(item) for item in items]
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    report = {
+        "name": name,
+        "count": len(items),
+        "seconds": round(elapsed, 4),
+        "throughput": round(len(items) / elapsed, 3) if elapsed else 0.0,
+        "p50": round(percentile(latencies, 50), 5),
+        "p95": round(percentile(latencies, 95), 5),
+        "peak_mb": round(peak / 1e6, 2)
+    }
+    return report, results
+
+
+def run_benchmarks(args, workdir):
+    """Run every scenario and return their reports"""
+    from src.utils import process_video, create_vector_store
+    from src.summarizer import summarize_text, build_summary_tree
+    from src.chat import get_chatbot
+
+    reports = []
+    transcribe = make_fake_transcriber(realtime_factor=args.realtime_factor)
+
+    with install_fakes(
+        workdir,
+        llm_latency=args.llm_latency,
+        embed_latency=args.embed_latency,
+        download_latency=args.download_latency,
+        audio_seconds=args.audio_seconds
+    ) as fakes:
+        for scale in args.scales:
+            urls = [f"https://www.youtube.com/watch?v=bench{scale:04d}{i:04d}" for i in range(scale)]
+
+            report, results = measure(
+                f"process_video[{scale}]", urls,
+                lambda url: process_video(url, transcribe),
+                workers=min(scale, args.workers)
+            )
+            reports.append(report)
+            texts = {url: result["transcript"] for url, result in results if result}
+
+            report, _ = measure(
+                f"summarize_text[{scale}]", list(texts.values()),
+                summarize_text,
+                workers=min(scale, args.workers)
+            )
+            reports.append(report)
+
+            timed_texts = {url: result["timed_transcript"] for url, result in results if result}
+            report, trees = measure(
+                f"build_summary_tree[{scale}]", list(timed_texts.values()),
+                build_summary_tree,
+                workers=min(scale, args.workers)
+            )
+            reports.append(report)
+
+            report, stores = measure(
+                f"create_vector_store[{scale}]", [timed_texts],
+                create_vector_store
+            )
+            report["chunks_per_second"] = round(
+                fakes["embeddings"].texts_embedded / report["seconds"], 1
+            ) if report["seconds"] else 0.0
+            reports.append(report)
+
+        # Chat against the largest session
+        _, session_id = stores[0]
+        respond = get_chatbot(session_id)
+        videos_info = {url: {"title": url, "summary_tree": tree} for url, tree in zip(timed_texts, trees)}
+        questions = [f"What does the video say about {w}?" for w in ("cache", "latency", "vector", "speech")]
+        questions.append("What are the key takeaways?")
+        turns = [questions[i % len(questions)] for i in range(args.chat_turns)]
+        report, _ = measure(
+            f"chat[{args.chat_turns}]", turns,
+            lambda question: respond(question, videos_info)
+        )
+        reports.append(report)
+
+    return reports
+
+
+def compare(reports, baseline, tolerance, memory_tolerance):
+    """Return a list of human-readable regressions against the baseline"""
+    previous = {r["name"]: r for r in baseline.get("reports", [])}
+    regressions = []
+    for report in reports:
+        old = previous.get(report["name"])
+        if not old:
+            continue
+        # With few samples p95 is the slowest single call, which is noise
+        if old["p95"] and report["count"] >= MIN_P95_SAMPLES and report["p95"] > old["p95"] * (1 + tolerance):
+            regressions.append(f"{report['name']}: p95 {old['p95']}s -> {report['p95']}s")
+        if old["throughput"] and report["throughput"] < old["throughput"] * (1 - tolerance):
+            regressions.append(f"{report['name']}: throughput {old['throughput']}/s -> {report['throughput']}/s")
+        if old["peak_mb"] and report["peak_mb"] > old["peak_mb"] * (1 + memory_tolerance):
+            regressions.append(f"{report['name']}: peak {old['peak_mb']}MB -> {report['peak_mb']}MB")
+    return regressions
+
+
+def print_reports(reports):
+    """Print reports as an aligned table"""
+    print(f"{'scenario':<28}{'count':>7}{'total s':>10}{'ops/s':>10}{'p50 s':>10}{'p95 s':>10}{'peak MB':>10}")
+    for r in reports:
+        print(
+            f"{r['name']:<28}{r['count']:>7}{r['seconds']:>10.3f}{r['throughput']:>10.2f}"
+            f"{r['p50']:>10.4f}{r['p95']:>10.4f}{r['peak_mb']:>10.2f}"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline VideoMind pipeline benchmarks")
+    parser.add_argument("--scales", type=lambda s: [int(x) for x in s.split(",")], default=[1, 10, 100])
+    parser.add_argument("--chat-turns", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--audio-seconds", type=float, default=60)
+    parser.add_argument("--realtime-factor", type=float, default=200.0,
+                        help="Fake transcription speed in audio seconds per second")
+    parser.add_argument("--llm-latency", type=float, default=0.005)
+    parser.add_argument("--embed-latency", type=float, default=0.002)
+    parser.add_argument("--download-latency", type=float, default=0.01)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative slowdown before a result counts as a regression")
+    # Peak memory of the threaded scenarios depends on how the workers interleave
+    # and moves by a third between runs of an unchanged tree
+    parser.add_argument("--memory-tolerance", type=float, default=1.0,
+                        help="Allowed relative growth of peak memory before it counts as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    metrics.enable()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        reports = run_benchmarks(args, workdir)
+
+    print_reports(reports)
+    print()
+    print(f"{'stage':<28}{'calls':>7}{'total s':>10}{'cache hits':>12}")
+    for stage, stats in sorted(metrics.snapshot().items()):
+        print(f"{stage:<28}{stats['count']:>7}{stats['seconds']:>10.3f}{stats['cache_hits']:>12}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            # The settings that shape the numbers, not where they were saved
+            settings = {k: v for k, v in vars(args).items() if k not in ("baseline", "save_baseline")}
+            json.dump({"created": time.time(), "args": settings, "reports": reports}, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(reports, json.load(f), args.tolerance, args.memory_tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Request scheduler under provider rate limits.
+
+Several sessions embed transcripts at the same time while a chat user sends
+questions, against fake OpenAI providers that return 429 once their
+per-minute budget is spent. Runs once with calls going straight to the
+providers and once through src.scheduler, and reports failed ingests,
+throttles, retries, embedding batches and chat latency.
+
+    python -m benchmarks.scheduler_load --sessions 8 --chunks 300 --embed-rpm 600
+"""
+import sys
+import time
+import argparse
+import tempfile
+import threading
+from unittest import mock
+
+from benchmarks.fakes import install_fakes, fake_words, ProviderLimits
+from benchmarks.run import percentile
+
+
+def run(args, scheduled):
+    import src.scheduler
+    from src.ratelimit import RateLimiter
+    from src.utils import create_vector_store, get_video_context
+
+    embed_limits = ProviderLimits(rpm=args.embed_rpm, tpm=args.embed_tpm)
+    # Client-side budget slightly above the provider's, as when several
+    # processes share one API key: some 429s still get through
+    limiters = {
+        "llm": RateLimiter(10 ** 6),
+        "embeddings": RateLimiter(args.embed_rpm * 1.2, args.embed_tpm * 1.2)
+    }
+    with tempfile.TemporaryDirectory() as workdir, \
+            mock.patch.object(src.scheduler, "ENABLED", scheduled), \
+            install_fakes(workdir, embed_latency=args.embed_latency,
+                          embed_limits=embed_limits, scheduler_limiters=limiters) as fakes:
+        # A session the chat user already loaded
+        chat_store = {"https://www.youtube.com/watch?v=chat": fake_words("chat", 3000)}
+        _, chat_session = create_vector_store(chat_store)
+
+        failures = []
+        done = threading.Event()
+
+        def ingest(i):
+            texts = {f"https://www.youtube.com/watch?v=s{i:03d}": fake_words(f"s{i}", args.chunks * 150)}
+            try:
+                create_vector_store(texts)
+            except Exception as e:
+                failures.append(type(e).__name__)
+
+        latencies, chat_errors = [], []
+
+        def chat():
+            while not done.is_set():
+                start = time.perf_counter()
+                try:
+                    get_video_context("what is the model about", chat_session)
+                    latencies.append(time.perf_counter() - start)
+                except Exception as e:
+                    chat_errors.append(type(e).__name__)
+                time.sleep(args.chat_interval)
+
+        start = time.perf_counter()
+        chat_thread = threading.Thread(target=chat)
+        chat_thread.start()
+        workers = [threading.Thread(target=ingest, args=(i,)) for i in range(args.sessions)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        chat_thread.join()
+
+        stats = fakes["scheduler"].stats() if scheduled else {}
+        return {
+            "mode": "scheduler" if scheduled else "direct",
+            "seconds": elapsed,
+            "failed": len(failures),
+            "rejected": embed_limits.rejected,
+            "retries": stats.get("retries", 0),
+            "batches": stats.get("batches", fakes["embeddings"].calls),
+            "chat_p50": percentile(latencies, 50),
+            "chat_p95": percentile(latencies, 95),
+            "chat_errors": len(chat_errors)
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scheduler rate-limit benchmark")
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--chunks", type=int, default=300, help="Chunks per ingested transcript (approx.)")
+    parser.add_argument("--embed-rpm", type=int, default=600)
+    parser.add_argument("--embed-tpm", type=int, default=3000000)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--chat-interval", type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    print(f"{'mode':<11}{'seconds':>9}{'failed':>8}{'429s':>7}{'retries':>9}{'batches':>9}"
+          f"{'chat p50':>10}{'chat p95':>10}{'chat err':>10}")
+    for scheduled in (False, True):
+        r = run(args, scheduled)
+        print(f"{r['mode']:<11}{r['seconds']:>9.2f}{r['failed']:>8}{r['rejected']:>7}{r['retries']:>9}"
+              f"{r['batches']:>9}{r['chat_p50']:>10.3f}{r['chat_p95']:>10.3f}{r['chat_errors']:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
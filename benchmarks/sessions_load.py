@@ -0,0 +1,138 @@
+"""Concurrent multi-tenant sessions over shared per-video vectors.
+
+Simulates many users at once. Each one adds a few videos (popular videos are
+shared between users), asks questions, deletes one video and then either
+resets or keeps chatting. Checks that retrieval only ever returns the
+session's own videos and that one user's reset or deletion never removes
+another user's context. Reports embedding work, stored vectors and latencies.
+
+    python -m benchmarks.sessions_load --sessions 50 --videos 10
+"""
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+from benchmarks.fakes import install_fakes, fake_whisper_result, InMemoryVectorStore
+from benchmarks.run import percentile
+
+
+def make_videos(count, duration):
+    from src.transcript import Transcript
+    videos = {}
+    for i in range(count):
+        url = f"https://www.youtube.com/watch?v=video{i:04d}"
+        videos[url] = Transcript.from_whisper(fake_whisper_result(url, duration))
+    return videos
+
+
+def sources(context):
+    """Video URLs cited in a get_video_context result"""
+    return {line.split("(", 1)[1].split(")", 1)[0] for line in context.split("\n") if line.startswith("From video (")}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-tenant session benchmark")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--videos", type=int, default=10, help="Size of the video pool")
+    parser.add_argument("--per-session", type=int, default=3)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=600, help="Seconds of speech per video")
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    import src.utils
+    from src import sessions
+    from src.utils import create_vector_store, get_video_context, remove_video_from_session, end_session
+
+    pool = make_videos(args.videos, args.duration)
+    urls = list(pool)
+    # Popularity falls off with rank, so the first videos are shared by many users
+    weights = [1 / (rank + 1) for rank in range(len(urls))]
+
+    lock = threading.Lock()
+    add_new, add_known, queries = [], [], []
+    violations, missing = [], []
+    loaded = []
+    barrier = threading.Barrier(args.sessions)
+
+    def user(n):
+        rng = random.Random(args.seed * 1000 + n)
+        mine = []
+        while len(mine) < min(args.per_session, len(urls)):
+            url = rng.choices(urls, weights)[0]
+            if url not in mine:
+                mine.append(url)
+        session_id = src.utils.generate_session_id()
+
+        for url in mine:
+            known = sessions.is_embedded(sessions.video_id(url))
+            start = time.perf_counter()
+            create_vector_store({url: pool[url]}, session_id)
+            elapsed = time.perf_counter() - start
+            with lock:
+                (add_known if known else add_new).append(elapsed)
+                loaded.append(url)
+
+        def ask(expected):
+            for _ in range(args.questions):
+                start = time.perf_counter()
+                context = get_video_context("what is the model about", session_id)
+                elapsed = time.perf_counter() - start
+                found = sources(context)
+                with lock:
+                    queries.append(elapsed)
+                    if found - set(expected):
+                        violations.append((n, sorted(found - set(expected))))
+                    if not found:
+                        missing.append(n)
+
+        ask(mine)
+        # Everyone has loaded their videos before anyone deletes or resets
+        barrier.wait()
+        removed = mine.pop()
+        remove_video_from_session(session_id, removed)
+        ask(mine)
+        if n % 2:
+            end_session(session_id)
+        else:
+            ask(mine)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        with install_fakes(workdir, embed_latency=args.embed_latency) as fakes:
+            start = time.perf_counter()
+            threads = [threading.Thread(target=user, args=(n,)) for n in range(args.sessions)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            registry = sessions.snapshot()
+            stored = sum(len(rows) for rows in InMemoryVectorStore.namespaces.values())
+            referenced = sum(v["chunks"] for v in registry["videos"].values())
+            # Every query embeds one text; the rest are transcript chunks
+            embedded = fakes["embeddings"].texts_embedded - len(queries)
+            chunks = {url: len(pool[url].chunks(1000, 200)) for url in urls}
+
+    per_session_copies = sum(chunks[url] for url in loaded)
+    print(f"sessions                 {args.sessions}")
+    print(f"video loads              {len(loaded)} ({len(set(loaded))} distinct videos)")
+    print(f"chunks embedded          {embedded} (per-session copies would embed {per_session_copies})")
+    print(f"vectors stored at end    {stored} for {len(registry['videos'])} videos "
+          f"still referenced by {len(registry['sessions'])} sessions")
+    print(f"add video (new)          p50 {percentile(add_new, 50) * 1000:.1f} ms  p95 {percentile(add_new, 95) * 1000:.1f} ms  n={len(add_new)}")
+    print(f"add video (known)        p50 {percentile(add_known, 50) * 1000:.1f} ms  p95 {percentile(add_known, 95) * 1000:.1f} ms  n={len(add_known)}")
+    print(f"query                    p50 {percentile(queries, 50) * 1000:.1f} ms  p95 {percentile(queries, 95) * 1000:.1f} ms  n={len(queries)}")
+    print(f"orphaned vectors         {stored - referenced}")
+    print(f"isolation violations     {len(violations)}")
+    print(f"queries with no context  {len(missing)}")
+    print(f"wall time                {elapsed:.2f} s")
+    return 1 if violations or missing or stored != referenced else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
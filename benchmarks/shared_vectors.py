@@ -0,0 +1,116 @@
+"""Shared per-video vectors vs per-session copies.
+
+Loads the same pool of videos into many sessions twice: once the way
+create_vector_store used to work, embedding every session's videos into its
+own namespace, and once through the shared layout, where each video is
+embedded once and a session is a filter on video IDs. Reports embedding
+calls, embedded chunks, stored vectors, the time to add an already-known
+video to a new session, and query latency.
+
+    python -m benchmarks.shared_vectors --sessions 10 --videos 5
+"""
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+from benchmarks.fakes import install_fakes, InMemoryVectorStore
+from benchmarks.run import percentile
+from benchmarks.sessions_load import make_videos
+
+
+def per_session_copies(pool, session_videos):
+    """The previous layout: every session embeds its own copy of each video"""
+    import src.utils
+    from src.utils import _split_transcript, get_embeddings
+
+    for n, urls in enumerate(session_videos):
+        texts, metadatas = [], []
+        for url in urls:
+            t, m = _split_transcript(url, pool[url])
+            texts.extend(t)
+            metadatas.extend(m)
+        src.utils.Pinecone.from_texts(
+            texts=texts,
+            embedding=get_embeddings(),
+            metadatas=metadatas,
+            index_name="youtube-summarizer",
+            namespace=f"session-{n}",
+            batch_size=100
+        )
+
+
+def shared(pool, session_videos):
+    from src.utils import create_vector_store, generate_session_id
+
+    adds = []
+    session_ids = []
+    for urls in session_videos:
+        session_id = generate_session_id()
+        session_ids.append(session_id)
+        for url in urls:
+            start = time.perf_counter()
+            create_vector_store({url: pool[url]}, session_id)
+            adds.append(time.perf_counter() - start)
+    return adds, session_ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared vector storage benchmark")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--videos", type=int, default=5)
+    parser.add_argument("--per-session", type=int, default=3)
+    parser.add_argument("--duration", type=float, default=1200, help="Seconds of speech per video")
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    from src.utils import get_video_context
+
+    pool = make_videos(args.videos, args.duration)
+    rng = random.Random(0)
+    session_videos = [rng.sample(list(pool), min(args.per_session, len(pool))) for _ in range(args.sessions)]
+
+    rows = {}
+    for layout in ("per-session copies", "shared"):
+        with tempfile.TemporaryDirectory() as workdir:
+            with install_fakes(workdir, embed_latency=args.embed_latency) as fakes:
+                start = time.perf_counter()
+                if layout == "shared":
+                    adds, session_ids = shared(pool, session_videos)
+                else:
+                    per_session_copies(pool, session_videos)
+                    adds, session_ids = [], []
+                elapsed = time.perf_counter() - start
+                calls = fakes["embeddings"].calls
+                texts = fakes["embeddings"].texts_embedded
+                stored = sum(len(rows_) for rows_ in InMemoryVectorStore.namespaces.values())
+
+                latencies = []
+                for i in range(args.queries if session_ids else 0):
+                    q_start = time.perf_counter()
+                    get_video_context("what is the model about", session_ids[i % len(session_ids)])
+                    latencies.append(time.perf_counter() - q_start)
+        rows[layout] = {
+            "seconds": elapsed, "calls": calls, "texts": texts, "stored": stored,
+            "adds": adds, "queries": latencies
+        }
+
+    print(f"{'layout':<20}{'ingest s':>10}{'embed calls':>13}{'chunks embedded':>17}{'vectors stored':>16}")
+    for layout, r in rows.items():
+        print(f"{layout:<20}{r['seconds']:>10.2f}{r['calls']:>13}{r['texts']:>17}{r['stored']:>16}")
+
+    copies, shared_row = rows["per-session copies"], rows["shared"]
+    # The first add of each video embeds it; every later add is a reference
+    known = sorted(shared_row["adds"])[:len(shared_row["adds"]) - args.videos]
+    print()
+    print(f"storage saved            {1 - shared_row['stored'] / copies['stored']:.0%}")
+    print(f"embedding calls saved    {1 - shared_row['calls'] / copies['calls']:.0%}")
+    print(f"add known video          p50 {percentile(known, 50) * 1000:.2f} ms  p95 {percentile(known, 95) * 1000:.2f} ms")
+    print(f"query (one filtered search per question)  p50 {percentile(shared_row['queries'], 50) * 1000:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
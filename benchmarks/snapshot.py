@@ -0,0 +1,143 @@
+"""Session export and restore against re-ingesting.
+
+Builds a session of long videos, exports it to an archive, then wipes the
+vector index, vector registry and artifact cache to simulate a restart on a
+fresh machine. Restores the archive into a new session and reports export and
+restore time, archive size, embedding calls made by the restore (expected 0),
+whether the restored vectors and retrieval match those from before the wipe, and peak Python
+memory while restoring. For comparison the same videos are embedded again.
+
+    python -m benchmarks.snapshot --videos 10 --duration 3600
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+from benchmarks.fakes import install_fakes, FakeIndex
+from benchmarks.sessions_load import make_videos
+
+QUERIES = [
+    "What are the key takeaways?",
+    "What does the video say about latency?",
+    "How is the cache invalidated?",
+    "Summarize the main points about the index",
+]
+
+
+def stored(vids):
+    """Every chunk's vector for a set of videos, by (URL, chunk index)
+    (restored videos are stored under IDs of their own, so IDs are not compared)"""
+    from src import utils, sessions
+    registry = sessions.snapshot()["videos"]
+    vectors = {}
+    for vid in vids:
+        video = registry[vid]
+        duplicates = video.get("duplicates", {})
+        ids = [duplicates.get(str(i), id_) for i, id_ in enumerate(sessions.vector_ids(vid, video["chunks"]))]
+        found = utils.fetch_vectors(list(dict.fromkeys(ids)))
+        for i, id_ in enumerate(ids):
+            vectors[(video["url"], i)] = list(found[id_][0])
+    return vectors
+
+
+def ranking(query, session_id, k=10):
+    """Top-k scores and the chunks scoring above the k-th (the fake text repeats,
+    so chunks tied at the cut-off may come back in either order)"""
+    from src import utils, sessions
+    store = utils.Pinecone.from_existing_index("youtube-summarizer", None, namespace=sessions.VECTOR_NAMESPACE)
+    results = store.similarity_search_by_vector_with_score(
+        utils.embed_query(query), k=k, filter={"video_id": {"$in": sessions.session_videos(session_id)}}
+    )
+    scores = [round(score, 5) for _, score in results]
+    above = {(d.metadata["source"], d.metadata["chunk"]) for d, s in results if round(s, 5) > scores[-1]}
+    return scores, above
+
+
+def wipe(cache_dir):
+    """Drop every stored vector, the registry and the cached artifacts"""
+    from src.utils import cleanup_pinecone
+    cleanup_pinecone()
+    shutil.rmtree(cache_dir)
+    os.makedirs(cache_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Session snapshot benchmark")
+    parser.add_argument("--videos", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=3600, help="Seconds of speech per video")
+    parser.add_argument("--embed-latency", type=float, default=0.3, help="Seconds per embedding batch")
+    parser.add_argument("--upsert-latency", type=float, default=0.05, help="Seconds per upsert request")
+    args = parser.parse_args(argv)
+
+    from src import utils, sessions, snapshot
+    from src.corpus import empty_corpus
+
+    with tempfile.TemporaryDirectory() as workdir, \
+            install_fakes(workdir, embed_latency=args.embed_latency) as fakes:
+        FakeIndex.latency = args.upsert_latency
+        embeddings = fakes["embeddings"]
+        cache_dir = utils.CACHE_DIR
+        pool = make_videos(args.videos, args.duration)
+        for url, transcript in pool.items():
+            utils.finish_result(url, transcript, url, "whisper")
+            utils.update_cache(url, summary_tree={"video": f"Summary of {url}"})
+        session_id = sessions.new_session_id()
+        start = time.perf_counter()
+        utils.create_vector_store(pool, session_id)
+        ingest_seconds = time.perf_counter() - start
+        before = [ranking(q, session_id) for q in QUERIES]
+        vectors_before = stored(sessions.session_videos(session_id))
+        chunks = sum(v["chunks"] for v in sessions.snapshot()["videos"].values())
+
+        archive = os.path.join(workdir, "session.vmss")
+        start = time.perf_counter()
+        size = snapshot.export_session(session_id, list(pool), archive, corpus=empty_corpus())
+        export_seconds = time.perf_counter() - start
+
+        wipe(cache_dir)
+        calls = embeddings.calls
+        start = time.perf_counter()
+        restored_id, videos, _, _ = snapshot.restore_session(archive)
+        restore_seconds = time.perf_counter() - start
+        restore_calls = embeddings.calls - calls
+        after = [ranking(q, restored_id) for q in QUERIES]
+        same = sum(a == b for a, b in zip(before, after))
+        identical = stored(sessions.session_videos(restored_id)) == vectors_before
+
+        # Memory is measured on a second restore; tracing slows the first one down
+        wipe(cache_dir)
+        tracemalloc.start()
+        snapshot.restore_session(archive)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        with snapshot.SessionArchive(archive) as opened:
+            vectors = sum(len(opened.vectors(v)) for v in opened.videos)
+        open_seconds = time.perf_counter() - start
+
+        wipe(cache_dir)
+        calls = embeddings.calls
+        start = time.perf_counter()
+        utils.create_vector_store(pool, sessions.new_session_id())
+        reembed_seconds = time.perf_counter() - start
+        reembed_calls = embeddings.calls - calls
+
+    print(f"{len(videos)} videos of {args.duration / 60:.0f} min, {chunks} chunks")
+    print(f"export            {export_seconds * 1000:>9.0f} ms   archive {size / 1e6:.1f} MB")
+    print(f"open (mmap)       {open_seconds * 1000:>9.1f} ms   {vectors} vectors mapped")
+    print(f"restore           {restore_seconds * 1000:>9.0f} ms   {restore_calls} embedding calls, "
+          f"peak {peak / 1e6:.1f} MB Python memory")
+    print(f"re-embed          {reembed_seconds * 1000:>9.0f} ms   {reembed_calls} embedding calls "
+          f"(first ingest {ingest_seconds * 1000:.0f} ms)")
+    print(f"restored vectors identical: {identical}")
+    print(f"retrieval after restore matches before: {same}/{len(QUERIES)} queries")
+    return 0 if identical and same == len(QUERIES) and restore_calls == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
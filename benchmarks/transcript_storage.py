@@ -0,0 +1,66 @@
+"""Memory and on-disk size of the Transcript model versus Whisper JSON dicts.
+
+    python -m benchmarks.transcript_storage --minutes 120 --words
+"""
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+from benchmarks.fakes import fake_whisper_result
+from src.transcript import Transcript
+
+
+def traced_size(build):
+    """Return (object, bytes retained by the object built by build())"""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    obj = build()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, after - before
+
+
+def timed(func, repeat=5):
+    """Best wall time of func over a few runs"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare transcript storage formats")
+    parser.add_argument("--minutes", type=float, default=120)
+    parser.add_argument("--words", action="store_true", help="Include word timestamps")
+    args = parser.parse_args(argv)
+
+    result = fake_whisper_result("storage", args.minutes * 60, word_timestamps=args.words)
+    as_json = json.dumps(result)
+    transcript = Transcript.from_whisper(result)
+    as_bytes = transcript.to_bytes()
+
+    _, json_memory = traced_size(lambda: json.loads(as_json))
+    _, model_memory = traced_size(lambda: Transcript.from_bytes(as_bytes))
+
+    rows = [
+        ("JSON dicts", len(as_json.encode()), json_memory,
+         timed(lambda: json.loads(as_json)), timed(lambda: json.dumps(result))),
+        ("Transcript", len(as_bytes), model_memory,
+         timed(lambda: Transcript.from_bytes(as_bytes)), timed(transcript.to_bytes)),
+    ]
+
+    print(f"{len(transcript)} segments, {len(transcript.word_start)} words, {args.minutes:.0f} min")
+    print(f"{'format':<14}{'disk KB':>10}{'memory KB':>12}{'load ms':>10}{'save ms':>10}")
+    for name, disk, memory, load, save in rows:
+        print(f"{name:<14}{disk / 1024:>10.1f}{memory / 1024:>12.1f}{load * 1000:>10.2f}{save * 1000:>10.2f}")
+    print(f"disk ratio {rows[0][1] / rows[1][1]:.1f}x, memory ratio {rows[0][2] / rows[1][2]:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
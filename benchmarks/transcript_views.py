@@ -0,0 +1,135 @@
+"""Rerun payload and render time of the Transcripts tab.
+
+Loads long timestamped transcripts into the artifact store and runs app.py
+on the Transcripts tab with Streamlit's AppTest, once with the tab as it used
+to be (every video's full transcript as markdown inside its expander) and
+once with the paginated view of the selected video. Reports the serialized size of the elements
+sent per rerun, rerun time, and server-side search latency.
+
+    python -m benchmarks.transcript_views --videos 12 --minutes 120
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+from unittest import mock
+
+from benchmarks.fakes import fake_whisper_result
+from benchmarks.run import percentile
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+# The paginated Transcripts tab as it appears in app.py, measured as is
+PAGINATED_TAB = """            # Only the selected video's current page is rendered on each rerun
+            url = st.selectbox(
+                "Video",
+                list(st.session_state.content_hashes),
+                format_func=lambda u: st.session_state.video_titles.get(u, 'Untitled Video'),
+                key="transcript_video"
+            )
+            if url:
+                show_transcript(url)
+"""
+# The Transcripts tab before pagination, swapped in for PAGINATED_TAB to
+# measure the old full-transcript view
+FULL_TAB = """            for url in st.session_state.content_hashes:
+                title = st.session_state.video_titles.get(url, 'Untitled Video')
+                with st.expander(f"Transcript for: {title}"):
+                    transcript = transcript_view.full_text(url)
+                    st.markdown(transcript)
+                    if st.button("📋 Copy", key=f"copy_transcript_{url}"):
+                        copy_to_clipboard(transcript, f"transcript_{url}")
+"""
+
+
+def app_source(paginated):
+    with open(APP_PATH, "r") as f:
+        source = f.read()
+    if not paginated:
+        assert PAGINATED_TAB in source, "Transcripts tab changed; update FULL_TAB"
+        source = source.replace(PAGINATED_TAB, FULL_TAB)
+    return source
+
+
+def payload_bytes(app):
+    """Serialized size of every element the rerun produced"""
+    def walk(node):
+        proto = getattr(node, "proto", None)
+        size = len(proto.SerializeToString()) if proto is not None else 0
+        return size + sum(walk(child) for child in getattr(node, "children", {}).values())
+    return walk(app._tree)
+
+
+def measure(app, reruns):
+    times = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run(timeout=60)
+        times.append(time.perf_counter() - start)
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    return payload_bytes(app), times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcript view benchmark")
+    parser.add_argument("--videos", type=int, default=12)
+    parser.add_argument("--minutes", type=float, default=120)
+    parser.add_argument("--reruns", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    from streamlit.testing.v1 import AppTest
+    import src.utils
+    from src import transcript_view
+    from src.transcript import Transcript
+
+    urls = [f"https://www.youtube.com/watch?v=long{i:04d}" for i in range(args.videos)]
+    with tempfile.TemporaryDirectory() as workdir, \
+            mock.patch.object(src.utils, "CACHE_DIR", os.path.join(workdir, "cache")):
+        transcripts = {}
+        for url in urls:
+            transcript = Transcript.from_whisper(fake_whisper_result(url, args.minutes * 60))
+            src.utils.save_transcript(url, transcript)
+            transcripts[url] = transcript.text
+        text_bytes = sum(len(t.encode()) for t in transcripts.values())
+
+        state = {
+            "content_hashes": {url: src.utils.content_hash(t) for url, t in transcripts.items()},
+            "video_titles": {url: url for url in urls},
+            "summaries": {url: "summary" for url in urls},
+            "processed_urls": set(urls),
+            "current_tab": "🎯 Transcripts",
+            "show_input": False
+        }
+        results = {}
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            for paginated in (False, True):
+                app = AppTest.from_string(app_source(paginated))
+                for key, value in state.items():
+                    app.session_state[key] = value
+                results[paginated] = measure(app, args.reruns)
+        finally:
+            os.chdir(cwd)
+
+        searches = []
+        for url in urls:
+            start = time.perf_counter()
+            matches = transcript_view.search(url, "latency throughput")
+            transcript_view.get_page(url, matches[0]["page"] if matches else 0, highlight="latency throughput")
+            searches.append(time.perf_counter() - start)
+
+    print(f"{args.videos} transcripts of {args.minutes:.0f} min, {text_bytes / 1e6:.1f} MB of text")
+    print(f"{'view':<11}{'payload KB':>12}{'rerun p50 ms':>14}{'rerun p95 ms':>14}")
+    for name, paginated in (("full", False), ("paginated", True)):
+        size, times = results[paginated]
+        print(f"{name:<11}{size / 1024:>12.1f}{percentile(times, 50) * 1000:>14.1f}{percentile(times, 95) * 1000:>14.1f}")
+    print(f"search and jump to match   p50 {percentile(searches, 50) * 1000:.1f} ms per video")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
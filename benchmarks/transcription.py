@@ -0,0 +1,213 @@
+"""Word error rate and speed of the transcription backends on CPU.
+
+Transcribes speech with every installed backend and model size and reports
+word error rate against reference transcripts, real-time factor (compute
+seconds per audio second) and model load time. The fixtures are the audio
+files with a .txt reference of the same name in benchmarks/fixtures/speech/
+(talk.flac, synthesized English speech, ships with the repo), plus any passed
+with --audio and --reference.
+
+With --routing it instead measures language routing on English audio:
+the model detecting the language inside the full decode, against detecting
+it from a 30 s window first and transcribing with the English-only model and
+a fixed language (and again with the language already cached).
+
+Backends whose packages are missing (openai-whisper/torch, faster-whisper)
+are reported and skipped.
+
+    python -m benchmarks.transcription --sizes tiny,base,small
+    python -m benchmarks.transcription --backends faster-whisper --audio a.wav --reference a.txt
+    python -m benchmarks.transcription --routing --sizes base,small
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import importlib
+
+from benchmarks.fakes import FIXTURES_DIR
+
+SPEECH_DIR = os.path.join(FIXTURES_DIR, "speech")
+AUDIO_EXTENSIONS = (".wav", ".flac", ".mp3", ".m4a", ".mp4")
+
+# Packages each backend needs
+REQUIREMENTS = {
+    "openai-whisper": ("whisper", "torch"),
+    "whisper-int8": ("whisper", "torch"),
+    "faster-whisper": ("faster_whisper",)
+}
+
+
+def normalize(text):
+    """Lowercase words without punctuation, for scoring"""
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    """(substitutions + deletions + insertions) / reference words"""
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    row = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        prev, row[0] = row[0], i
+        for j, h in enumerate(hyp, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (r != h))
+    return row[-1] / len(ref)
+
+
+def load_fixtures(audio=(), references=()):
+    """[(name, audio path, reference text)]"""
+    pairs = list(zip(audio, references))
+    if os.path.isdir(SPEECH_DIR):
+        for name in sorted(os.listdir(SPEECH_DIR)):
+            base, ext = os.path.splitext(name)
+            reference = os.path.join(SPEECH_DIR, base + ".txt")
+            if ext in AUDIO_EXTENSIONS and os.path.exists(reference):
+                pairs.append((os.path.join(SPEECH_DIR, name), reference))
+    fixtures = []
+    for path, reference in pairs:
+        with open(reference, "r") as f:
+            fixtures.append((os.path.basename(path), path, f.read()))
+    return fixtures
+
+
+def missing(backend):
+    """Packages a backend needs that are not installed"""
+    absent = []
+    for module in REQUIREMENTS[backend]:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            absent.append(module)
+    return absent
+
+
+def run(backend_name, size, fixtures):
+    from src.transcriber import get_backend, SAMPLE_RATE
+    backend = get_backend(backend_name)
+    start = time.perf_counter()
+    backend.load(size)
+    load_seconds = time.perf_counter() - start
+
+    audio_seconds = compute_seconds = 0.0
+    errors, words = 0.0, 0
+    for _, path, reference in fixtures:
+        audio = backend.load_audio(path)
+        start = time.perf_counter()
+        result = backend.transcribe(audio, size)
+        compute_seconds += time.perf_counter() - start
+        audio_seconds += len(audio) / SAMPLE_RATE
+        # Weight each fixture by its length in words
+        n = len(normalize(reference))
+        errors += word_error_rate(reference, result["text"]) * n
+        words += n
+    return {
+        "backend": backend_name,
+        "size": size,
+        "wer": errors / words if words else 0.0,
+        "rtf": compute_seconds / audio_seconds if audio_seconds else 0.0,
+        "load": load_seconds
+    }
+
+
+def routing(backend_name, size, fixtures):
+    """Seconds and WER with in-decode detection, a detection pre-step, and a cached language
+    The pre-step routes English to the English-only model whether or not
+    WHISPER_ROUTE_ENGLISH is set, since that is what is being measured.
+    """
+    from src.transcriber import get_backend, ENGLISH_MODELS
+    backend = get_backend(backend_name)
+    routed = ENGLISH_MODELS.get(size, size)
+    backend.load(size)
+    backend.load(routed)
+
+    modes = {"in-decode": [0.0, 0.0], "pre-step": [0.0, 0.0], "cached": [0.0, 0.0]}
+    words = 0
+    for _, path, reference in fixtures:
+        audio = backend.load_audio(path)
+        n = len(normalize(reference))
+        words += n
+
+        start = time.perf_counter()
+        result = backend.transcribe(audio, size)
+        modes["in-decode"][0] += time.perf_counter() - start
+        modes["in-decode"][1] += word_error_rate(reference, result["text"]) * n
+
+        start = time.perf_counter()
+        language, _ = backend.detect_language(audio, size)
+        detected = time.perf_counter() - start
+        result = backend.transcribe(audio, routed if language == "en" else size, language=language)
+        elapsed = time.perf_counter() - start
+        modes["pre-step"][0] += elapsed
+        modes["pre-step"][1] += word_error_rate(reference, result["text"]) * n
+        modes["cached"][0] += elapsed - detected
+        modes["cached"][1] += word_error_rate(reference, result["text"]) * n
+    return {mode: (seconds, errors / words if words else 0.0) for mode, (seconds, errors) in modes.items()}
+
+
+def main(argv=None):
+    from src.transcriber import BACKENDS
+    parser = argparse.ArgumentParser(description="Transcription backend benchmark")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--sizes", default="tiny,base,small")
+    parser.add_argument("--audio", action="append", default=[], help="Extra fixture audio")
+    parser.add_argument("--reference", action="append", default=[], help="Reference text for each --audio")
+    parser.add_argument("--max-wer-increase", type=float, default=0.02,
+                        help="WER a faster choice may add over openai-whisper at the same size")
+    parser.add_argument("--routing", action="store_true", help="Measure language detection and English routing")
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures(args.audio, args.reference)
+    if not fixtures:
+        print("No speech to transcribe: pass --audio and --reference, "
+              f"or add <name>.wav (or .flac/.mp3) with <name>.txt to {SPEECH_DIR}")
+        return 1
+    print(f"{len(fixtures)} fixture(s): {', '.join(name for name, _, _ in fixtures)}")
+
+    if args.routing:
+        from src.transcriber import ENGLISH_MODELS
+        print(f"{'backend':<16}{'size':<8}{'mode':<11}{'model':<10}{'seconds':>9}{'speedup':>9}{'WER':>8}")
+        for backend in args.backends.split(","):
+            absent = missing(backend)
+            if absent:
+                print(f"{backend:<16}skipped, not installed: {', '.join(absent)}")
+                continue
+            for size in args.sizes.split(","):
+                r = routing(backend, size, fixtures)
+                base = r["in-decode"][0]
+                for mode, (seconds, wer) in r.items():
+                    model = size if mode == "in-decode" else ENGLISH_MODELS.get(size, size)
+                    print(f"{backend:<16}{size:<8}{mode:<11}{model:<10}{seconds:>9.2f}"
+                          f"{base / seconds if seconds else 0:>8.2f}x{wer:>8.1%}")
+        return 0
+
+    results = []
+    print(f"{'backend':<16}{'size':<8}{'WER':>8}{'RTF':>8}{'x realtime':>12}{'load s':>8}")
+    for backend in args.backends.split(","):
+        absent = missing(backend)
+        if absent:
+            print(f"{backend:<16}skipped, not installed: {', '.join(absent)}")
+            continue
+        for size in args.sizes.split(","):
+            r = run(backend, size, fixtures)
+            results.append(r)
+            speed = 1 / r["rtf"] if r["rtf"] else float("inf")
+            print(f"{backend:<16}{size:<8}{r['wer']:>8.1%}{r['rtf']:>8.3f}{speed:>12.1f}{r['load']:>8.1f}")
+
+    # Fastest configuration whose accuracy stays close to fp32 at the same size
+    baseline = {r["size"]: r["wer"] for r in results if r["backend"] == "openai-whisper"}
+    eligible = [
+        r for r in results
+        if r["size"] not in baseline or r["wer"] <= baseline[r["size"]] + args.max_wer_increase
+    ]
+    if eligible:
+        best = min(eligible, key=lambda r: r["rtf"])
+        print(f"\nsuggested default: WHISPER_BACKEND={best['backend']} WHISPER_MODEL={best['size']} "
+              f"(WER {best['wer']:.1%}, {1 / best['rtf']:.1f}x realtime)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
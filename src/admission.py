@@ -0,0 +1,244 @@
+import os
+import time
+import asyncio
+import threading
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from functools import lru_cache
+from src import metrics
+from src.metrics import annotate
+
+# Audio (estimated from video metadata) being downloaded, decoded and
+# transcribed at once across every user; more waits in the queue. Each loaded
+# Whisper model runs one transcription at a time, so with a single model size
+# this bounds downloads and decoded audio held in memory; with several (e.g.
+# WHISPER_MODEL=auto) it also bounds inference running side by side. A single
+# video larger than the budget runs when nothing else does
+AUDIO_BUDGET = float(os.getenv("INGEST_AUDIO_BUDGET_MINUTES", "90")) * 60
+
+# Longest video accepted for transcription; longer ones are rejected up front
+MAX_VIDEO_SECONDS = float(os.getenv("INGEST_MAX_VIDEO_MINUTES", "240")) * 60
+
+# Audio one user may have queued or running; more is rejected so a long URL
+# list cannot fill the queue
+USER_LIMIT = float(os.getenv("INGEST_USER_QUEUE_MINUTES", "600")) * 60
+
+# Assumed length of a video whose metadata has no duration (e.g. a live stream)
+UNKNOWN_DURATION = 30 * 60
+
+
+class Rejected(Exception):
+    """Work refused without queueing (over a size limit)"""
+
+
+def estimate(video_info):
+    """Seconds of audio a video will cost, from its metadata"""
+    duration = (video_info or {}).get('duration')
+    return float(duration) if duration else UNKNOWN_DURATION
+
+
+class Ticket:
+    """One queued or running unit of work"""
+
+    __slots__ = ("user", "seconds", "label", "created", "granted", "_event", "_futures")
+
+    def __init__(self, user, seconds, label):
+        self.user = user
+        self.seconds = seconds
+        self.label = label
+        self.created = time.monotonic()
+        self.granted = None
+        self._event = threading.Event()
+        self._futures = []
+
+
+class AdmissionController:
+    """Audio-seconds budget shared by every user's ingest
+
+    Waiting work is admitted fairly across users by audio: the next video comes
+    from the waiting user who has been admitted the fewest audio seconds (each
+    user's own videos in order). A user arriving while others work through
+    long lists starts level with the least-served of them, so their first
+    video goes next rather than after every queued one.
+    """
+
+    def __init__(self, budget=AUDIO_BUDGET, max_video=MAX_VIDEO_SECONDS, user_limit=USER_LIMIT):
+        self.budget = budget
+        self.max_video = max_video
+        self.user_limit = user_limit
+        self._lock = threading.Lock()
+        self._queues = OrderedDict()  # user -> deque of waiting tickets, by arrival
+        self._running = []
+        self._served = {}  # user -> audio seconds admitted while active
+        self.in_flight = 0.0
+        self.counters = Counter()
+        self.waited = deque(maxlen=1000)
+
+    def _user_seconds(self, user):
+        queued = sum(t.seconds for t in self._queues.get(user, ()))
+        return queued + sum(t.seconds for t in self._running if t.user == user)
+
+    def submit(self, user, seconds, label=None):
+        """Queue work, or raise Rejected if it can never be admitted
+        Returns:
+            Ticket (already granted if there was room)
+        """
+        if seconds > self.max_video:
+            with self._lock:
+                self.counters["rejected"] += 1
+            raise Rejected(
+                f"{label or 'Video'} is {seconds / 60:.0f} min long; "
+                f"the limit is {self.max_video / 60:.0f} min"
+            )
+        ticket = Ticket(user, seconds, label)
+        with self._lock:
+            if self._user_seconds(user) + seconds > self.user_limit:
+                self.counters["rejected"] += 1
+                raise Rejected(
+                    f"Too much queued: at most {self.user_limit / 60:.0f} min of audio "
+                    "per user can wait or run at once"
+                )
+            if user not in self._queues and not any(t.user == user for t in self._running):
+                # Returning users start level with the active ones, not with credit from idle time
+                active = [self._served[u] for u in self._served if u in self._queues]
+                self._served[user] = max(self._served.get(user, 0.0), min(active, default=0.0))
+            self._queues.setdefault(user, deque()).append(ticket)
+            self.counters["submitted"] += 1
+            self._grant()
+        return ticket
+
+    def _fits(self, ticket):
+        return not self._running or self.in_flight + ticket.seconds <= self.budget
+
+    def _grant(self):
+        """Admit waiting work while the budget allows (lock held)"""
+        while self._queues:
+            user = min(self._queues, key=lambda u: self._served[u])
+            queue = self._queues[user]
+            ticket = queue[0]
+            # Stop at the next ticket rather than skip it, so large videos are
+            # not starved by a stream of small ones
+            if not self._fits(ticket):
+                return
+            queue.popleft()
+            if not queue:
+                del self._queues[user]
+            self._served[user] += ticket.seconds
+            ticket.granted = time.monotonic()
+            self._running.append(ticket)
+            self.in_flight += ticket.seconds
+            self.counters["admitted"] += 1
+            self.waited.append(ticket.granted - ticket.created)
+            ticket._event.set()
+            for loop, future in ticket._futures:
+                loop.call_soon_threadsafe(_resolve, future)
+
+    def release(self, ticket):
+        """Finish (or withdraw) a ticket and admit whatever now fits"""
+        with self._lock:
+            if ticket in self._running:
+                self._running.remove(ticket)
+                self.in_flight -= ticket.seconds
+                if ticket.user not in self._queues and not any(t.user == ticket.user for t in self._running):
+                    self._served.pop(ticket.user, None)
+            else:
+                queue = self._queues.get(ticket.user)
+                if queue and ticket in queue:
+                    queue.remove(ticket)
+                    if not queue:
+                        del self._queues[ticket.user]
+                        if not any(t.user == ticket.user for t in self._running):
+                            self._served.pop(ticket.user, None)
+                    self.counters["withdrawn"] += 1
+            self._grant()
+
+    def position(self, ticket):
+        """(place in line, seconds of audio ahead) of a waiting ticket; (0, 0) once admitted"""
+        with self._lock:
+            if ticket.granted is not None:
+                return 0, 0.0
+            # Replay the admission order over everything currently waiting
+            served = dict(self._served)
+            queues = OrderedDict((user, list(queue)) for user, queue in self._queues.items())
+            place, ahead = 1, 0.0
+            while queues:
+                user = min(queues, key=lambda u: served[u])
+                waiting = queues[user].pop(0)
+                if waiting is ticket:
+                    return place, ahead
+                if not queues[user]:
+                    del queues[user]
+                served[user] += waiting.seconds
+                place += 1
+                ahead += waiting.seconds
+            return 0, 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": len(self._running),
+                "queued": sum(len(q) for q in self._queues.values()),
+                "in_flight_seconds": self.in_flight,
+                "users_waiting": len(self._queues)
+            }
+
+    @contextmanager
+    def admit(self, user, seconds, label=None):
+        """Block the calling thread until the work is admitted; release it on exit"""
+        ticket = self.submit(user, seconds, label)
+        try:
+            ticket._event.wait()
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    async def acquire_async(self, user, seconds, label=None, on_wait=None, poll=0.5):
+        """Wait on the event loop until the work is admitted
+        The caller releases the ticket when the work is done; it is withdrawn
+        from the queue if the wait is cancelled or fails.
+        Args:
+            on_wait: Called with (place in line, seconds of audio ahead) while waiting
+        Returns:
+            Granted Ticket
+        """
+        ticket = self.submit(user, seconds, label)
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            with self._lock:
+                if ticket.granted is None:
+                    ticket._futures.append((loop, future))
+                else:
+                    future.set_result(None)
+            last = None
+            while not future.done():
+                place = self.position(ticket)
+                if on_wait and place != last and place[0]:
+                    on_wait(*place)
+                    last = place
+                await asyncio.wait([future], timeout=poll)
+        except BaseException:
+            self.release(ticket)
+            raise
+        annotate(queued_seconds=round(ticket.granted - ticket.created, 3))
+        return ticket
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+@lru_cache(maxsize=1)
+def get_controller():
+    """Process-wide admission controller shared by every session"""
+    controller = AdmissionController()
+    metrics.register_gauge(
+        "videomind_ingest_admission", controller.stats, label="state",
+        help="Ingest work running and queued, and the audio seconds in flight"
+    )
+    metrics.register_gauge(
+        "videomind_ingest_admission_total", lambda: dict(controller.counters), label="event",
+        help="Ingest work submitted, admitted, withdrawn and rejected", kind="counter"
+    )
+    return controller
@@ -0,0 +1,186 @@
+import os
+import re
+import time
+import itertools
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from src import metrics
+from src.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+ENABLED = os.getenv("VIDEOMIND_ANSWER_CACHE", "1") != "0"
+
+# Cosine similarity at which a new question reuses a stored answer
+THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+
+# Least recently used answers are dropped past this many entries
+MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_SIZE", "2000"))
+
+# Answers older than this are never served
+TTL = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+# Words that only make sense given earlier turns ("why?", "tell me more about that").
+# "this video" / "these videos" name the loaded videos, not an earlier answer
+FOLLOW_UP = re.compile(
+    r"^\s*(and|but|so|also|what about|how about|why|more)\b|"
+    r"\b(it|its|that|this|these|those|they|them|their|he|she|him|her|his)\b(?!\s+videos?\b)|"
+    r"\b(above|previous(ly)?|earlier|before|again|elaborate|go on|continue|"
+    r"you (said|mentioned|told)|last (answer|question|one))\b",
+    re.IGNORECASE
+)
+
+
+def depends_on_history(question, has_history):
+    """Whether the answer to a question may depend on earlier chat turns"""
+    return has_history and bool(FOLLOW_UP.search(question))
+
+
+class _Entry:
+    __slots__ = ("key", "hashes", "question", "vector", "answer", "seconds", "created")
+
+    def __init__(self, key, hashes, question, vector, answer, seconds):
+        self.key = key
+        self.hashes = frozenset(hashes)
+        self.question = question
+        self.vector = vector
+        self.answer = answer
+        self.seconds = seconds
+        self.created = time.time()
+
+
+class AnswerCache:
+    """Chat answers keyed by video set and matched on query embedding"""
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL, threshold=THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries = OrderedDict()  # id -> entry, least recently used first
+        self._by_key = {}  # video-set key -> {id}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.counters = {
+            "hits": 0, "misses": 0, "bypassed": 0, "stored": 0,
+            "evicted": 0, "expired": 0, "invalidated": 0
+        }
+        self.seconds_saved = 0.0
+
+    def _normalize(self, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, entry_id, reason):
+        entry = self._entries.pop(entry_id)
+        ids = self._by_key.get(entry.key)
+        if ids is not None:
+            ids.discard(entry_id)
+            if not ids:
+                del self._by_key[entry.key]
+        self.counters[reason] += 1
+
+    def lookup(self, key, vector):
+        """Best stored answer for a question about a video set, or None
+        Args:
+            key: Video-set key (see video_set_key)
+            vector: Query embedding
+        """
+        start = time.perf_counter()
+        query = self._normalize(vector)
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for entry_id in [i for i in self._by_key.get(key, ()) if self._entries[i].created < cutoff]:
+                self._drop(entry_id, "expired")
+            ids = list(self._by_key.get(key, ()))
+            if ids:
+                scores = np.stack([self._entries[i].vector for i in ids]) @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    entry = self._entries[ids[best]]
+                    self._entries.move_to_end(ids[best])
+                    self.counters["hits"] += 1
+                    self.seconds_saved += max(0.0, entry.seconds - (time.perf_counter() - start))
+                    return entry.answer
+            self.counters["misses"] += 1
+        return None
+
+    def store(self, key, hashes, question, vector, answer, seconds):
+        """Remember an answer
+        Args:
+            hashes: Content hashes of the videos it was answered from
+            seconds: Time it took to answer (reported as saved on each hit)
+        """
+        entry = _Entry(key, hashes, question, self._normalize(vector), answer, seconds)
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = entry
+            self._by_key.setdefault(key, set()).add(entry_id)
+            self.counters["stored"] += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)), "evicted")
+
+    def bypass(self):
+        """Count a question that was not looked up (it depends on chat history)"""
+        with self._lock:
+            self.counters["bypassed"] += 1
+
+    def invalidate_video(self, content_hash):
+        """Forget every answer that used a video's transcript"""
+        with self._lock:
+            for entry_id in [i for i, e in self._entries.items() if content_hash in e.hashes]:
+                self._drop(entry_id, "invalidated")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_key.clear()
+
+    def hit_rate(self):
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return self.counters["hits"] / lookups if lookups else 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "entries": len(self._entries),
+                "hit_rate": self.hit_rate(),
+                "seconds_saved": self.seconds_saved
+            }
+
+
+def video_set_key(hashes):
+    """Cache key for the set of videos a question is asked about"""
+    from src.corpus import corpus_key
+    return corpus_key(hashes)
+
+
+@lru_cache(maxsize=1)
+def get_answer_cache():
+    """Process-wide answer cache shared by every session"""
+    cache = AnswerCache()
+    metrics.register_gauge(
+        "videomind_answer_cache_events_total", lambda: dict(cache.counters), label="event",
+        help="Answer cache hits, misses, bypasses, evictions and invalidations", kind="counter"
+    )
+    metrics.register_gauge(
+        "videomind_answer_cache_entries", lambda: len(cache._entries),
+        help="Stored answers"
+    )
+    metrics.register_gauge(
+        "videomind_answer_cache_hit_rate", cache.hit_rate,
+        help="Hits over lookups"
+    )
+    metrics.register_gauge(
+        "videomind_answer_cache_seconds_saved_total", lambda: cache.seconds_saved,
+        help="Answer latency avoided by cache hits", kind="counter"
+    )
+    return cache
+
+
+def invalidate_video(content_hash):
+    """Forget cached answers about a video whose transcript changed"""
+    if content_hash:
+        get_answer_cache().invalidate_video(content_hash)
@@ -0,0 +1,202 @@
+import os
+import re
+import html
+from collections import Counter
+import xml.etree.ElementTree as ET
+from src.metrics import traced, annotate
+from src.lazy import lazy_import
+from src.transcript import Transcript
+
+yt_dlp = lazy_import("yt_dlp")
+
+# Transcript source policy:
+#   prefer_captions - use YouTube captions when good enough, Whisper otherwise
+#   whisper         - always run Whisper
+#   compare         - run both, keep Whisper, record how well captions agreed
+POLICIES = ("prefer_captions", "whisper", "compare")
+
+
+def check_policy(policy):
+    """Return a transcript policy, or raise ValueError if it is not one of POLICIES"""
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown transcript policy {policy!r}; expected one of {', '.join(POLICIES)}")
+    return policy
+
+
+TRANSCRIPT_POLICY = check_policy(os.getenv("TRANSCRIPT_POLICY", "prefer_captions"))
+
+# Quality bar for captions: share of the video covered by cues and a
+# plausible speaking rate
+MIN_COVERAGE = float(os.getenv("CAPTION_MIN_COVERAGE", "0.5"))
+MIN_WORDS_PER_MINUTE = float(os.getenv("CAPTION_MIN_WPM", "40"))
+
+# Subtitle formats we can parse, best first
+FORMATS = ("vtt", "srv3", "srv1")
+
+_TIMESTAMP = r"(?:(\d+):)?(\d{2}):(\d{2})[.,](\d{3})"
+_CUE_TIMING = re.compile(_TIMESTAMP + r"\s*-->\s*" + _TIMESTAMP)
+_INLINE_TIME = re.compile(r"<" + _TIMESTAMP + r">")
+_TAG = re.compile(r"<[^>]+>")
+_WORD = re.compile(r"[\w']+")
+
+
+def _seconds(hours, minutes, seconds, millis):
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000
+
+
+def _clean(text):
+    """Strip markup and collapse whitespace"""
+    return " ".join(html.unescape(_TAG.sub("", text)).split())
+
+
+def _words_from_inline(line, start, end):
+    """Split a YouTube auto-caption line on its <hh:mm:ss.mmm> word timings"""
+    pieces = _INLINE_TIME.split(line)
+    # re.split with 4 groups yields: text, h, m, s, ms, text, h, m, s, ms, text...
+    words = []
+    times = [start]
+    texts = [pieces[0]]
+    for i in range(1, len(pieces), 5):
+        times.append(_seconds(*pieces[i:i + 4]))
+        texts.append(pieces[i + 4])
+    for i, text in enumerate(texts):
+        text = _clean(text)
+        if text:
+            word_end = times[i + 1] if i + 1 < len(times) else end
+            words.append({"word": " " + text, "start": times[i], "end": word_end})
+    return words
+
+
+def parse_vtt(text):
+    """Parse WebVTT (including YouTube's rolling auto-captions) into a Transcript"""
+    segments = []
+    last_line = None
+    # Cues are separated by empty lines; YouTube pads cues with lines holding a single space
+    blocks = re.split(r"\n\n+", text.replace("\r\n", "\n"))
+    for block in blocks:
+        lines = block.strip().split("\n")
+        for i, line in enumerate(lines):
+            match = _CUE_TIMING.search(line)
+            if match:
+                break
+        else:
+            continue
+        start = _seconds(*match.groups()[:4])
+        end = _seconds(*match.groups()[4:])
+
+        # Auto-captions repeat the previous line at the top of each cue;
+        # keep only lines we have not emitted yet
+        for line in lines[i + 1:]:
+            clean = _clean(line)
+            if not clean or clean == last_line:
+                continue
+            last_line = clean
+            segment = {"start": start, "end": end, "text": " " + clean}
+            if _INLINE_TIME.search(line):
+                segment["words"] = _words_from_inline(line, start, end)
+            segments.append(segment)
+    return Transcript.from_segments(segments)
+
+
+def parse_srv(text):
+    """Parse YouTube srv1 (<text start dur>) or srv3 (<p t d>) XML into a Transcript"""
+    root = ET.fromstring(text)
+    segments = []
+    for node in root.iter():
+        if node.tag == "text":
+            start = float(node.get("start", 0))
+            end = start + float(node.get("dur", 0))
+            words = None
+        elif node.tag == "p":
+            start = int(node.get("t", 0)) / 1000
+            end = start + int(node.get("d", 0)) / 1000
+            spans = node.findall("s")
+            words = []
+            for j, s in enumerate(spans):
+                word_start = start + int(s.get("t", 0)) / 1000
+                next_start = start + int(spans[j + 1].get("t", 0)) / 1000 if j + 1 < len(spans) else end
+                if _clean(s.text or ""):
+                    words.append({"word": " " + _clean(s.text or ""), "start": word_start, "end": next_start})
+        else:
+            continue
+        clean = _clean("".join(node.itertext()))
+        if not clean:
+            continue
+        segment = {"start": start, "end": end, "text": " " + clean}
+        if words:
+            segment["words"] = words
+        segments.append(segment)
+    return Transcript.from_segments(segments)
+
+
+def parse_captions(text, ext):
+    """Parse caption text of a given format"""
+    if ext == "vtt":
+        return parse_vtt(text)
+    if ext in ("srv1", "srv2", "srv3"):
+        return parse_srv(text)
+    raise ValueError(f"Unsupported caption format: {ext}")
+
+
+def _pick_track(tracks, languages):
+    """Choose (language, track) with the best parseable format"""
+    for lang in languages:
+        candidates = tracks.get(lang) or []
+        for ext in FORMATS:
+            for track in candidates:
+                if track.get("ext") == ext:
+                    return lang, track
+    return None, None
+
+
+@traced("fetch_captions")
+def fetch_captions(url, languages=("en", "en-US", "en-GB")):
+    """Fetch YouTube captions for a video
+    Returns:
+        (Transcript, kind, info) where kind is 'manual' or 'auto', or
+        (None, None, info) when no usable track exists
+    """
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'skip_download': True
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+        for kind, key in (("manual", "subtitles"), ("auto", "automatic_captions")):
+            lang, track = _pick_track(info.get(key) or {}, languages)
+            if not track:
+                continue
+            data = ydl.urlopen(track["url"]).read().decode("utf-8")
+            transcript = parse_captions(data, track["ext"])
+            annotate(bytes=len(data))
+            if len(transcript):
+                return transcript, kind, info
+    return None, None, info
+
+
+def caption_quality(transcript, duration=None):
+    """Score captions by coverage of the video and speaking rate"""
+    covered = sum(end - start for start, end, _ in transcript.segments())
+    duration = duration or transcript.duration
+    words = len(transcript.text.split())
+    minutes = (duration or 0) / 60
+    return {
+        "coverage": min(1.0, covered / duration) if duration else 0.0,
+        "words_per_minute": words / minutes if minutes else 0.0
+    }
+
+
+def is_good_enough(quality):
+    """Apply the caption quality bar"""
+    return quality["coverage"] >= MIN_COVERAGE and quality["words_per_minute"] >= MIN_WORDS_PER_MINUTE
+
+
+def agreement(a, b):
+    """Bag-of-words overlap between two transcripts (1.0 = same words)"""
+    words_a = Counter(_WORD.findall(_clean(a).lower()))
+    words_b = Counter(_WORD.findall(_clean(b).lower()))
+    total = max(sum(words_a.values()), sum(words_b.values()))
+    if not total:
+        return 1.0
+    return sum((words_a & words_b).values()) / total
@@ -1,8 +1,16 @@
-from langchain_openai import ChatOpenAI
-from langchain.memory import ConversationBufferMemory
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
-from src.utils import get_video_context
+import re
+import time
+from src.utils import get_video_context, embed_query, content_hash
+from src import answer_cache
+from src.summarizer import get_summary
+from src.metrics import span
+from src import scheduler
+from src.lazy import lazy_import
+
+ChatOpenAI = lazy_import("langchain_openai", "ChatOpenAI")
+ConversationBufferMemory = lazy_import("langchain.memory", "ConversationBufferMemory")
+LLMChain = lazy_import("langchain.chains", "LLMChain")
+PromptTemplate = lazy_import("langchain.prompts", "PromptTemplate")
 
 def create_chat_prompt():
     """Create the chat prompt template"""
@@ -20,6 +28,7 @@ def create_chat_prompt():
        - There are multiple videos loaded AND
        - The question could apply to more than one of them
     4. When multiple videos are loaded, try to combine information from them if relevant
+    5. When a piece of context has a timestamp like [12:34-13:05], cite it in your answer so the user can jump to that moment
     
     Context from videos:
     {context}
@@ -50,12 +59,40 @@ def format_video_list(videos_dict):
     prefix = "Currently loaded video:" if len(video_list) == 1 else "Currently loaded videos:"
     return prefix + "\n" + "\n".join(video_list)
 
+# Questions asking for a whole video (or all of them) at once are answered
+# from the cached chapter summaries instead of retrieving transcript chunks.
+# Only whole-video intents match: a question that merely says "briefly" or
+# "compare" still needs the exact transcript passages
+BROAD_QUESTION = re.compile(
+    r"\b(summar(y|ies|ize|ise)|overview|tl;?dr|gist|main (points?|ideas?|topics?|themes?)|"
+    r"key (points?|takeaways?)|what (is|are) (this|these|the) videos? about)\b",
+    re.IGNORECASE
+)
+
+def is_broad_question(question):
+    """Check whether a question is about whole videos rather than specific details"""
+    return bool(BROAD_QUESTION.search(question))
+
+def format_chapter_context(videos_info):
+    """Build prompt context from cached chapter summaries"""
+    contexts = []
+    for url, info in videos_info.items():
+        tree = info.get('summary_tree')
+        if not tree:
+            continue
+        contexts.append(
+            f"Chapter summaries of video ({url}):\n{get_summary(tree, 'chapters')}\n\n"
+            f"Overall summary: {tree.get('video', '')}"
+        )
+    return "\n\n".join(contexts)
+
 def get_chatbot(session_id):
     """Create a chatbot instance for the session"""
     # Create LLM
     llm = ChatOpenAI(
         model_name="gpt-3.5-turbo",
-        temperature=0.7
+        temperature=0.7,
+        max_retries=scheduler.CLIENT_RETRIES
     )
     
     # Create memory
@@ -75,21 +112,61 @@ def get_chatbot(session_id):
         verbose=False
     )
     
-    def get_response(user_input, videos_info=None):
+    def get_response(user_input, videos_info=None, digest=None):
+        start = time.perf_counter()
+        
+        # Questions that stand on their own can reuse an answer given about the
+        # same videos; follow-ups depend on this conversation and always go to the LLM
+        cache = answer_cache.get_answer_cache() if answer_cache.ENABLED and videos_info else None
+        query_vector = None
+        if cache and answer_cache.depends_on_history(user_input, bool(memory.chat_memory.messages)):
+            cache.bypass()
+            cache = None
+        if cache:
+            hashes = [
+                info.get('content_hash') or content_hash(info.get('transcript'))
+                for info in videos_info.values()
+            ]
+            key = answer_cache.video_set_key(hashes)
+            # Embedded once, for both the cache lookup and retrieval
+            query_vector = embed_query(user_input)
+            with span("answer_cache") as s:
+                cached = cache.lookup(key, query_vector)
+                s.set(cache_hits=int(cached is not None))
+            if cached is not None:
+                # Keep the exchange in memory so follow-ups still make sense
+                memory.save_context({"question": user_input}, {"text": cached})
+                return cached
         
-        # Get relevant context from vector store
-        context = get_video_context(user_input, session_id)
+        # Broad questions use the cached digest and chapter summaries; specific ones use retrieval
+        context = ""
+        if videos_info and is_broad_question(user_input):
+            context = format_chapter_context(videos_info)
+            if digest and len(videos_info) > 1:
+                context = f"Digest of all videos in the session:\n{digest}\n\n{context}"
+        if not context:
+            context = get_video_context(user_input, session_id, query_vector=query_vector)
         
         # Format video list if provided
         video_list = format_video_list(videos_info) if videos_info else "No videos loaded"
         
         # Get response
-        response = conversation.predict(
-            video_list=video_list,
-            context=context,
-            question=user_input
-        )
+        with span("conversation.predict") as s:
+            # Chat is interactive and is served ahead of background ingest
+            response = scheduler.call(
+                conversation.predict,
+                priority=scheduler.INTERACTIVE,
+                tokens=(len(context) + len(user_input)) // 4,
+                video_list=video_list,
+                context=context,
+                question=user_input
+            )
+            # Rough token estimate (~4 characters per token)
+            s.set(tokens=(len(context) + len(user_input) + len(response)) // 4)
+        
+        if cache:
+            cache.store(key, hashes, user_input, query_vector, response, time.perf_counter() - start)
         
         return response
     
-    return get_response 
\ No newline at end of file
+    return get_response
\ No newline at end of file
@@ -0,0 +1,152 @@
+import os
+import json
+import hashlib
+from src import summarizer
+from src import scheduler
+from src.metrics import traced, annotate
+from src import utils
+
+# How many video summaries go into one reduce call
+REDUCE_GROUP_SIZE = 8
+
+REDUCE_PROMPT = """Below are summaries of several videos. Write a digest of them as a group:
+the themes they share and the points they agree on, where they disagree, and what each video adds on its own.
+Refer to videos by their titles.
+
+{text}
+
+DIGEST:"""
+
+MERGE_PROMPT = """Here is a digest of a group of videos, followed by summaries of videos that were added to the group.
+Rewrite the digest so it also covers the new videos: shared themes and agreements, disagreements, and what each video adds.
+Refer to videos by their titles.
+
+Current digest:
+{digest}
+
+New videos:
+{text}
+
+UPDATED DIGEST:"""
+
+
+def empty_corpus():
+    """State for a session with no videos"""
+    return {"key": corpus_key([]), "videos": {}, "digest": ""}
+
+
+def corpus_key(hashes):
+    """Cache key for a set of video content hashes"""
+    return hashlib.sha256(",".join(sorted(hashes)).encode()).hexdigest()[:16]
+
+
+def _corpus_path(key):
+    return os.path.join(utils.CACHE_DIR, f"corpus_{key}.json")
+
+
+def load_corpus(hashes):
+    """Load a cached digest for exactly this set of videos"""
+    path = _corpus_path(corpus_key(hashes))
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return None
+
+
+def save_corpus(state):
+    """Cache a digest under the key of its video set"""
+    os.makedirs(utils.CACHE_DIR, exist_ok=True)
+    with open(_corpus_path(state["key"]), 'w') as f:
+        json.dump(state, f)
+
+
+def _keep(state, result):
+    """Cache a new digest, unless it was built on one restored from an uploaded archive"""
+    if state.get("private"):
+        result["private"] = True
+    else:
+        save_corpus(result)
+
+
+def _format_videos(videos):
+    return "\n\n".join(f"{v['title']}:\n{v['summary']}" for v in videos)
+
+
+def _reduce(llm, videos):
+    """Reduce video summaries to one digest, in groups if there are many"""
+    texts = [_format_videos([v]) for v in videos]
+    while len(texts) > 1:
+        prompts = [
+            REDUCE_PROMPT.format(text="\n\n".join(texts[i:i + REDUCE_GROUP_SIZE]))
+            for i in range(0, len(texts), REDUCE_GROUP_SIZE)
+        ]
+        texts = summarizer.generate(llm, prompts)
+    return texts[0] if texts else ""
+
+
+def _with_videos(videos):
+    """New state for a video dict, reusing the cache when this set was seen before"""
+    cached = load_corpus(videos.keys())
+    if cached:
+        annotate(cache_hits=1)
+        return cached, True
+    return {"key": corpus_key(videos.keys()), "videos": videos, "digest": ""}, False
+
+
+@traced("corpus_add_videos")
+def add_videos(state, new_videos):
+    """Fold new videos into the session digest
+    Args:
+        state: Current corpus state (see empty_corpus)
+        new_videos: Dict of content hash -> {"title", "summary"}
+    Returns:
+        Updated corpus state; only the new summaries are sent to the LLM
+    """
+    state = state or empty_corpus()
+    added = {h: v for h, v in new_videos.items() if h not in state["videos"]}
+    if not added:
+        return state
+
+    videos = {**state["videos"], **added}
+    result, cached = _with_videos(videos)
+    if cached:
+        return result
+
+    if len(videos) == 1:
+        # A single video's digest is its own summary
+        result["digest"] = next(iter(videos.values()))["summary"]
+    elif not state["digest"]:
+        result["digest"] = _reduce(summarizer.get_llm(), list(videos.values()))
+    else:
+        llm = summarizer.get_llm()
+        prompt = MERGE_PROMPT.format(
+            digest=state["digest"],
+            text=_format_videos(added.values())
+        )
+        result["digest"] = scheduler.call(llm.invoke, prompt, tokens=len(prompt) // 4).strip()
+
+    _keep(state, result)
+    return result
+
+
+@traced("corpus_remove_video")
+def remove_video(state, video_hash):
+    """Drop a video from the session digest
+    Re-reduces the remaining per-video summaries; transcripts are never re-read.
+    """
+    if not state or video_hash not in state["videos"]:
+        return state or empty_corpus()
+
+    videos = {h: v for h, v in state["videos"].items() if h != video_hash}
+    result, cached = _with_videos(videos)
+    if cached:
+        return result
+
+    if len(videos) == 1:
+        result["digest"] = next(iter(videos.values()))["summary"]
+    elif videos:
+        result["digest"] = _reduce(summarizer.get_llm(), list(videos.values()))
+
+    if videos:
+        _keep(state, result)
+    return result
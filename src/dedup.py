@@ -0,0 +1,237 @@
+import os
+import zlib
+import threading
+from functools import lru_cache
+from src import metrics, sessions
+from src.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Chunks whose word shingles overlap at least this much (estimated Jaccard
+# similarity) share one stored vector
+THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+
+# Set to 0 to store every chunk
+ENABLED = os.getenv("VIDEOMIND_DEDUP", "1") != "0"
+
+# MinHash signature length, split into LSH bands of BAND_ROWS values: chunks
+# at the threshold become candidates with probability ~1 - (1 - 0.8^4)^16
+NUM_PERM = 64
+BAND_ROWS = 4
+
+# Words per shingle
+SHINGLE_WORDS = 3
+
+counters = {"chunks": 0, "duplicates": 0}
+
+
+@lru_cache(maxsize=1)
+def _permutations():
+    """Fixed multiply-shift hash functions, so signatures agree across processes"""
+    rng = np.random.default_rng(0x5eed)
+    a = rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+    return a, b
+
+
+def minhash(texts):
+    """MinHash signatures of word shingles
+    Returns:
+        uint32 array of shape [len(texts), NUM_PERM]
+    """
+    a, b = _permutations()
+    signatures = np.full((len(texts), NUM_PERM), 0xFFFFFFFF, dtype=np.uint32)
+    for row, text in enumerate(texts):
+        words = text.lower().split()
+        shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+        shingles.discard("")
+        if not shingles:
+            continue
+        x = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # Unsigned overflow wraps, which is what multiply-shift hashing relies on
+        signatures[row] = ((np.outer(a, x) + b[:, None]) >> np.uint64(32)).min(axis=1)
+    return signatures
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.mean(a == b))
+
+
+def reference(vid, url, metadata):
+    """Compact 'vid|start|end|url' reference to one chunk of a video"""
+    start, end = metadata.get("start"), metadata.get("end")
+    return f"{vid}|{'' if start is None else start}|{'' if end is None else end}|{url}"
+
+
+def parse_reference(ref):
+    """(vid, url, start, end) of a reference; times are None for untimed chunks"""
+    vid, start, end, url = ref.split("|", 3)
+    return vid, url, float(start) if start else None, float(end) if end else None
+
+
+class ChunkIndex:
+    """LSH index over the MinHash signatures of stored chunk vectors"""
+
+    def __init__(self):
+        self.buckets = {}
+        self.signatures = {}
+        self.references = {}
+        self.loaded = set()
+        self.lock = threading.Lock()
+
+    def _bands(self, signature):
+        for band in range(0, NUM_PERM, BAND_ROWS):
+            yield band, signature[band:band + BAND_ROWS].tobytes()
+
+    def add(self, id_, signature, ref):
+        self.signatures[id_] = signature
+        self.references[id_] = ref
+        for key in self._bands(signature):
+            self.buckets.setdefault(key, set()).add(id_)
+
+    def discard(self, id_):
+        signature = self.signatures.pop(id_, None)
+        self.references.pop(id_, None)
+        if signature is None:
+            return
+        for key in self._bands(signature):
+            bucket = self.buckets.get(key)
+            if bucket:
+                bucket.discard(id_)
+                if not bucket:
+                    del self.buckets[key]
+
+    def find(self, signature):
+        """(vector ID, reference, similarity) of the closest stored chunk at or above THRESHOLD, or None"""
+        candidates = set()
+        for key in self._bands(signature):
+            candidates |= self.buckets.get(key, set())
+        best = None
+        for id_ in candidates:
+            score = similarity(signature, self.signatures[id_])
+            if score >= THRESHOLD and (best is None or score > best[2]):
+                best = (id_, self.references[id_], score)
+        return best
+
+    def __len__(self):
+        return len(self.signatures)
+
+
+def signature_dir():
+    # Read at call time so a patched CACHE_DIR is honoured
+    from src import utils
+    return os.path.join(utils.CACHE_DIR, "signatures")
+
+
+def _signature_path(vid):
+    return os.path.join(signature_dir(), f"{vid}.npz")
+
+
+def _live_ids(state):
+    """IDs of every vector currently stored, by owning video"""
+    live = {}
+    for vid, video in state["videos"].items():
+        duplicates = video.get("duplicates", {})
+        live[vid] = {
+            id_ for i, id_ in enumerate(sessions.vector_ids(vid, video.get("chunks", 0)))
+            if str(i) not in duplicates
+        }
+    for id_ in state.get("shared", {}):
+        live.setdefault(id_.rsplit("-", 1)[0], set()).add(id_)
+    return live
+
+
+def _sync(index, state):
+    """Bring the index in line with the registry (other processes embed too)"""
+    live = _live_ids(state)
+    for id_ in [id_ for id_ in index.signatures if id_ not in live.get(id_.rsplit("-", 1)[0], ())]:
+        index.discard(id_)
+    index.loaded &= set(live)
+    for vid, ids in live.items():
+        if vid in index.loaded or not ids:
+            continue
+        path = _signature_path(vid)
+        if not os.path.exists(path):
+            continue  # Written right after the video is registered
+        with np.load(path) as data:
+            signatures, refs = data["signatures"], data["references"]
+        for i, (signature, ref) in enumerate(zip(signatures, refs)):
+            id_ = f"{vid}-{i}"
+            if id_ in ids:
+                index.add(id_, signature, str(ref))
+        index.loaded.add(vid)
+    # Signatures of videos whose vectors are all gone
+    if os.path.isdir(signature_dir()):
+        for name in os.listdir(signature_dir()):
+            vid, ext = os.path.splitext(name)
+            if ext == ".npz" and not live.get(vid):
+                os.remove(os.path.join(signature_dir(), name))
+
+
+@lru_cache(maxsize=1)
+def get_index():
+    """Process-wide index of stored chunks"""
+    _register_gauges()
+    return ChunkIndex()
+
+
+def find_duplicates(vid, url, texts, metadatas):
+    """Match a new video's chunks against stored chunks and its own earlier chunks
+    Returns:
+        (signatures, references, matches) where matches maps chunk index ->
+        (vector ID, reference of the chunk that vector was stored for,
+        reference of the new chunk)
+    """
+    signatures = minhash(texts)
+    references = [reference(vid, url, m) for m in metadatas]
+    index = get_index()
+    own = ChunkIndex()
+    matches = {}
+    with index.lock:
+        _sync(index, sessions.snapshot())
+        for i, signature in enumerate(signatures):
+            match = index.find(signature)
+            if match is None:
+                match = own.find(signature)
+            if match is None:
+                own.add(f"{vid}-{i}", signature, references[i])
+            else:
+                matches[i] = (match[0], match[1], references[i])
+    counters["chunks"] += len(texts)
+    counters["duplicates"] += len(matches)
+    return signatures, references, matches
+
+
+def record(vid, signatures, references, stored):
+    """Save the signatures of a registered video's stored chunks
+    Args:
+        stored: Indexes of the chunks that got their own vector
+    """
+    os.makedirs(signature_dir(), exist_ok=True)
+    tmp = os.path.join(signature_dir(), f"{vid}.{os.getpid()}.tmp.npz")
+    np.savez(tmp, signatures=signatures, references=np.array(references))
+    os.replace(tmp, _signature_path(vid))
+    index = get_index()
+    with index.lock:
+        for i in stored:
+            index.add(f"{vid}-{i}", signatures[i], references[i])
+        index.loaded.add(vid)
+
+
+def stats():
+    """Chunks seen, duplicates collapsed and the share of chunks not stored"""
+    chunks = counters["chunks"]
+    return dict(counters, ratio=counters["duplicates"] / chunks if chunks else 0.0)
+
+
+@lru_cache(maxsize=1)
+def _register_gauges():
+    metrics.register_gauge(
+        "videomind_dedup_chunks_total", lambda: dict(counters), label="kind",
+        help="Chunks checked for near-duplicates and chunks collapsed onto a stored vector", kind="counter"
+    )
+    metrics.register_gauge(
+        "videomind_dedup_ratio", lambda: stats()["ratio"],
+        help="Share of chunks that reused a stored vector"
+    )
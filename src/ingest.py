@@ -0,0 +1,244 @@
+import os
+import time
+import asyncio
+import concurrent.futures
+from contextlib import ExitStack
+from src import captions
+from src import media_cache
+from src import admission
+from src.metrics import span
+from src.utils import (
+    load_cached_result,
+    get_video_info,
+    get_caption_transcript,
+    download_mp4_from_youtube,
+    finish_result,
+    update_cache,
+    create_vector_store
+)
+from src.summarizer import build_summary_tree
+from src.transcript import Transcript
+
+# Concurrent calls allowed per provider
+PROVIDER_CONCURRENCY = {
+    "youtube": int(os.getenv("YOUTUBE_CONCURRENCY", "4")),
+    "openai": int(os.getenv("OPENAI_CONCURRENCY", "8")),
+    "pinecone": int(os.getenv("PINECONE_CONCURRENCY", "4"))
+}
+
+# Whisper is CPU bound and shares one model, so transcriptions run one at a time
+WHISPER_WORKERS = int(os.getenv("WHISPER_WORKERS", "1"))
+
+# Timeouts in seconds for a single provider call and for all of a video's
+# provider calls together. Whisper is not timed: its thread cannot be stopped,
+# and a long video on CPU legitimately takes hours
+STAGE_TIMEOUT = float(os.getenv("INGEST_STAGE_TIMEOUT", "600"))
+VIDEO_TIMEOUT = float(os.getenv("INGEST_VIDEO_TIMEOUT", "3600"))
+
+
+class Providers:
+    """Per-provider semaphores, rate limits and executors for one event loop"""
+
+    def __init__(self, concurrency=None, limiters=None, whisper_workers=WHISPER_WORKERS):
+        concurrency = {**PROVIDER_CONCURRENCY, **(concurrency or {})}
+        self.semaphores = {name: asyncio.Semaphore(n) for name, n in concurrency.items()}
+        # OpenAI requests are budgeted per request by src.scheduler; extra
+        # provider-level limiters (name -> RateLimiter) can be passed here
+        self.limiters = limiters or {}
+        self.io_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=sum(concurrency.values()), thread_name_prefix="ingest-io"
+        )
+        self.cpu_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=whisper_workers, thread_name_prefix="ingest-whisper"
+        )
+
+    async def call(self, provider, func, *args, tokens=0, timeout=STAGE_TIMEOUT, release=None):
+        """Run a blocking provider call in the IO executor under its limits
+        Args:
+            release: Called with the result if the call finishes after the
+                caller stopped waiting (timed out or cancelled), so a result
+                holding a resource (e.g. a media_cache.Pin) is not leaked
+        """
+        async with self.semaphores[provider]:
+            limiter = self.limiters.get(provider)
+            if limiter:
+                await limiter.acquire_async(tokens)
+            future = self.io_executor.submit(func, *args)
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+            except BaseException:
+                if release:
+                    future.add_done_callback(
+                        lambda f: f.cancelled() or f.exception() is not None or release(f.result())
+                    )
+                raise
+
+    async def cpu(self, func, *args, hold=None):
+        """Run blocking CPU work (Whisper) in the dedicated executor
+        Args:
+            hold: Optional ExitStack of resources the work uses; it is closed
+                when the work finishes, even if the caller was cancelled first
+                (the thread cannot be stopped), or if the work never started
+        """
+        hold = hold or ExitStack()
+
+        def run():
+            with hold:
+                return func(*args)
+
+        future = self.cpu_executor.submit(run)
+        future.add_done_callback(lambda f: f.cancelled() and hold.close())
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        # Abandoned calls keep running in their threads; don't wait for them
+        self.io_executor.shutdown(wait=False, cancel_futures=True)
+        self.cpu_executor.shutdown(wait=False, cancel_futures=True)
+
+
+class Deadline:
+    """Time left for a video's provider calls; queueing and Whisper don't count"""
+
+    def __init__(self, seconds=None):
+        self.remaining = seconds
+
+    async def run(self, awaitable):
+        """Await under the time left, then charge the time it took"""
+        if self.remaining is None:
+            return await awaitable
+        start = time.monotonic()
+        try:
+            return await asyncio.wait_for(awaitable, max(0.0, self.remaining))
+        finally:
+            self.remaining -= time.monotonic() - start
+
+
+async def ingest_video(url, providers, transcribe_func, policy=None, summarize=True,
+                       controller=None, user=None, on_queue=None, deadline=None):
+    """Ingest one video: captions or download + Whisper, then the summary tree
+    Args:
+        controller: Admission controller budgeting downloads and Whisper
+            (defaults to the process-wide one)
+        user: Whose turn the work is queued under
+        on_queue: Optional callback(url, place in line, seconds of audio ahead)
+            while the video waits for a transcription slot
+        deadline: Deadline for the video's provider calls (untimed if omitted)
+    Returns:
+        (url, result) like process_video
+    """
+    policy = policy or captions.TRANSCRIPT_POLICY
+    deadline = deadline or Deadline()
+    result = load_cached_result(url)
+    if result is None:
+        video_info, (transcript, source, caption_transcript, extra) = await deadline.run(asyncio.gather(
+            providers.call("youtube", get_video_info, url),
+            providers.call("youtube", get_caption_transcript, url, policy)
+        ))
+        if transcript is None:
+            controller = controller or admission.get_controller()
+            on_wait = (lambda place, ahead: on_queue(url, place, ahead)) if on_queue else None
+            with ExitStack() as held:
+                # Nothing is downloaded until the audio fits in the shared budget;
+                # waiting in line does not count toward the deadline
+                ticket = await controller.acquire_async(
+                    user or url, admission.estimate(video_info), url, on_wait=on_wait
+                )
+                held.callback(controller.release, ticket)
+                # The file is pinned from inside the media cache's lock
+                pin = await deadline.run(providers.call(
+                    "youtube", download_mp4_from_youtube, url, release=media_cache.Pin.release
+                ))
+                video_path = held.enter_context(pin)
+                # The pin and the audio budget are held until the transcription
+                # thread is done, even if this video is cancelled first
+                transcript = await providers.cpu(transcribe_func, video_path, hold=held.pop_all())
+            language = media_cache.metadata(video_path).get('language')
+            if language:
+                extra['language'] = language
+            if isinstance(transcript, str):
+                transcript = Transcript.from_text(transcript)
+            source = "whisper"
+            if caption_transcript is not None:
+                extra['caption_agreement'] = captions.agreement(caption_transcript.text, transcript.text)
+        result = finish_result(url, transcript, video_info['title'], source, extra)
+    elif not result.get('title'):
+        video_info = await deadline.run(providers.call("youtube", get_video_info, url))
+        result['title'] = video_info['title']
+
+    if summarize and not result.get('summary_tree'):
+        tree = await deadline.run(providers.call(
+            "openai", build_summary_tree, result['timed_transcript'],
+            tokens=len(result['transcript']) // 4
+        ))
+        update_cache(url, summary_tree=tree)
+        result['summary_tree'] = tree
+    return url, result
+
+
+async def ingest(urls, transcribe_func=None, policy=None, summarize=True, create_store=True,
+                 providers=None, video_timeout=VIDEO_TIMEOUT, on_result=None, session_id=None,
+                 controller=None, on_queue=None):
+    """Ingest videos concurrently with per-provider limits
+    Args:
+        urls: YouTube URLs
+        transcribe_func: Whisper transcription function (defaults to transcribe_video)
+        policy: Transcript policy, see src.captions
+        summarize: Build the summary tree for each video
+        create_store: Embed all transcripts into the vector store afterwards
+        providers: Shared Providers instance (a new one is created if omitted)
+        video_timeout: Seconds allowed for each video's provider calls
+            (downloads, captions, summaries) before it is abandoned
+        on_result: Optional callback(url, result) run on the event loop as each video finishes
+        session_id: Session to add the videos to (a new one if omitted); its
+            transcriptions take turns with other sessions' in the admission queue
+        controller: Admission controller (defaults to the process-wide one)
+        on_queue: Optional callback(url, place in line, seconds of audio ahead)
+    Returns:
+        Dict with 'results' (url -> result or None), 'session_id', 'vectorstores'
+        (stores for videos embedded by this call) and 'errors' (url -> message
+        for videos that failed or were rejected)
+    """
+    policy = captions.check_policy(policy or captions.TRANSCRIPT_POLICY)
+    if transcribe_func is None:
+        from src.transcriber import transcribe_video
+        transcribe_func = transcribe_video
+    own_providers = providers is None
+    providers = providers or Providers()
+    # Without a session, the batch still takes turns as one user
+    user = session_id or object()
+    errors = {}
+
+    async def run_one(url):
+        try:
+            _, result = await ingest_video(
+                url, providers, transcribe_func, policy, summarize, controller, user, on_queue,
+                Deadline(video_timeout)
+            )
+        except asyncio.TimeoutError:
+            print(f"Timed out processing {url}")
+            errors[url] = "Timed out"
+            result = None
+        except Exception as e:
+            print(f"Error processing {url}: {str(e)}")
+            errors[url] = str(e)
+            result = None
+        if on_result:
+            on_result(url, result)
+        return url, result
+
+    try:
+        with span("ingest"):
+            pairs = await asyncio.gather(*(run_one(url) for url in urls))
+            results = dict(pairs)
+
+            vectorstores = {}
+            texts = {url: r['timed_transcript'] for url, r in results.items() if r}
+            if create_store and texts:
+                vectorstores, session_id = await providers.call(
+                    "openai", create_vector_store, texts, session_id,
+                    tokens=sum(len(r['transcript']) for r in results.values() if r) // 4
+                )
+        return {"results": results, "session_id": session_id, "vectorstores": vectorstores, "errors": errors}
+    finally:
+        if own_providers:
+            providers.shutdown()
@@ -0,0 +1,55 @@
+import importlib
+import threading
+
+_lock = threading.RLock()
+
+# Callbacks run after every lazy import (e.g. to re-apply warning filters)
+_after_import_hooks = []
+
+
+def after_import(func):
+    """Register a callback to run after each lazy import completes"""
+    _after_import_hooks.append(func)
+    return func
+
+
+class LazyImport:
+    """Stand-in for a module (or an attribute of one) that is imported on first use
+
+    Attribute access and calls are forwarded to the real object, so
+    `yt_dlp = LazyImport("yt_dlp")` followed by `yt_dlp.YoutubeDL(...)` behaves
+    exactly like a top-level import without paying for it at import time.
+    """
+
+    def __init__(self, module, attr=None):
+        self._module = module
+        self._attr = attr
+        self._target = None
+
+    def _load(self):
+        target = self._target
+        if target is None:
+            with _lock:
+                if self._target is None:
+                    obj = importlib.import_module(self._module)
+                    self._target = getattr(obj, self._attr) if self._attr else obj
+                    for hook in _after_import_hooks:
+                        hook()
+                target = self._target
+        return target
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __repr__(self):
+        name = f"{self._module}.{self._attr}" if self._attr else self._module
+        state = "loaded" if self._target is not None else "not loaded"
+        return f"<LazyImport {name} ({state})>"
+
+
+def lazy_import(module, attr=None):
+    """Return a LazyImport for a module or one of its attributes"""
+    return LazyImport(module, attr)
@@ -0,0 +1,285 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+from src import metrics, sessions
+from src.metrics import annotate
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+# Downloaded media is kept for retranscription until the cache outgrows this
+MAX_BYTES = int(float(os.getenv("MEDIA_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+
+# Attempts per download; each one resumes from the partial file of the last
+DOWNLOAD_ATTEMPTS = int(os.getenv("MEDIA_DOWNLOAD_ATTEMPTS", "3"))
+
+_lock = threading.Lock()
+_video_locks = {}
+_pinned = Counter()
+_verified = set()
+counters = Counter()
+
+
+def media_dir():
+    # Read at call time so a patched CACHE_DIR is honoured
+    from src import utils
+    return os.getenv("VIDEOMIND_MEDIA_DIR") or os.path.join(utils.CACHE_DIR, "media")
+
+
+def media_path(vid):
+    """Where a video's media file lives once downloaded"""
+    return os.path.join(media_dir(), f"{vid}.mp4")
+
+
+def _manifest_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+@contextmanager
+def _video_lock(vid):
+    """Single-flight guard across threads (and processes, via a lock file)"""
+    with _lock:
+        lock = _video_locks.setdefault(vid, threading.Lock())
+    with lock:
+        os.makedirs(media_dir(), exist_ok=True)
+        with open(os.path.join(media_dir(), f"{vid}.lock"), 'w') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _remove(path):
+    for p in (path, _manifest_path(path), path + ".part"):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def validate(vid):
+    """Path of a complete, intact cached download, or None
+    Size is checked on every use and the checksum once per process; a file that
+    fails either is deleted so the next fetch downloads it again.
+    """
+    path = media_path(vid)
+    manifest_path = _manifest_path(path)
+    if not os.path.exists(path) or not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        stat = os.stat(path)
+        ok = stat.st_size == manifest["size"] and stat.st_size > 0
+        key = (path, stat.st_ino, stat.st_size)
+        if ok and key not in _verified:
+            ok = _sha256(path) == manifest["sha256"]
+            if ok:
+                _verified.add(key)
+    except (OSError, ValueError, KeyError):
+        ok = False
+    if not ok:
+        print(f"Discarding corrupt cached media for {vid}")
+        counters["corrupt"] += 1
+        _remove(path)
+        return None
+    return path
+
+
+def fetch(url, download):
+    """Get a local media file for a video, downloading it at most once
+    The file is pinned before the video's lock is released, so eviction can't
+    delete it before the caller has read it.
+    Args:
+        download: Called as download(url, path); writes `path`, resuming from
+            `path + '.part'` when present, and returns the expected size in
+            bytes if the source reports one (else None)
+    Returns:
+        Pin of the file; use as `with fetch(...) as path:` or call release()
+    """
+    _register_gauges()
+    vid = sessions.video_id(url)
+    path = media_path(vid)
+    with _video_lock(vid):
+        if validate(vid):
+            os.utime(path)
+            counters["hits"] += 1
+            annotate(cache_hits=1)
+            return in_use(path)
+        counters["misses"] += 1
+        _download(url, path, download)
+        pin = in_use(path)
+    evict()
+    return pin
+
+
+def _download(url, path, download):
+    partial = path + ".part"
+    for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+        resumed = os.path.getsize(partial) if os.path.exists(partial) else 0
+        if resumed:
+            counters["resumed"] += 1
+        try:
+            expected = download(url, path)
+        except Exception as e:
+            # The partial file is kept; the next attempt continues from it
+            received = (os.path.getsize(partial) if os.path.exists(partial) else 0) - resumed
+            annotate(bytes=max(0, received))
+            if attempt == DOWNLOAD_ATTEMPTS:
+                counters["failed"] += 1
+                raise
+            print(f"Download of {url} interrupted ({str(e)}), resuming (attempt {attempt + 1})")
+            continue
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        annotate(bytes=max(0, size - resumed))
+        if not size or (expected and size != expected):
+            # Truncated or mismatched: start over rather than resume a bad file
+            _remove(path)
+            if attempt == DOWNLOAD_ATTEMPTS:
+                counters["failed"] += 1
+                raise IOError(f"Downloaded media for {url} is {size} bytes, expected {expected}")
+            continue
+        with open(_manifest_path(path), 'w') as f:
+            json.dump({"url": url, "size": size, "sha256": _sha256(path), "created": time.time()}, f)
+        _verified.add((path, os.stat(path).st_ino, size))
+        counters["downloads"] += 1
+        return
+
+
+def _is_cached(path):
+    return os.path.dirname(os.path.abspath(path)) == os.path.abspath(media_dir())
+
+
+def metadata(path):
+    """Fields recorded with a cached media file ({} for files outside the cache)"""
+    if not _is_cached(path):
+        return {}
+    try:
+        with open(_manifest_path(path), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def update_metadata(path, **fields):
+    """Record derived facts (e.g. the spoken language) with a cached media file"""
+    manifest_path = _manifest_path(path)
+    if not _is_cached(path) or not os.path.exists(manifest_path):
+        return
+    vid = os.path.splitext(os.path.basename(path))[0]
+    with _video_lock(vid):
+        manifest = metadata(path)
+        manifest.update(fields)
+        tmp = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, manifest_path)
+
+
+class Pin:
+    """Keeps a media file from being evicted until released
+    Entering it as a context manager gives the path and releases on exit;
+    releasing more than once has no effect.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._held = True
+        with _lock:
+            _pinned[path] += 1
+
+    def release(self):
+        with _lock:
+            if not self._held:
+                return
+            self._held = False
+            _pinned[self.path] -= 1
+            if not _pinned[self.path]:
+                del _pinned[self.path]
+
+    def __enter__(self):
+        return self.path
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def in_use(path):
+    """Pin a media file while it is being read"""
+    return Pin(path)
+
+
+def _entries():
+    """(last used, size, path) of every file in the media cache"""
+    entries = []
+    directory = media_dir()
+    if not os.path.isdir(directory):
+        return entries
+    for name in os.listdir(directory):
+        if not name.endswith((".mp4", ".part")):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def evict(max_bytes=None, keep=None):
+    """Delete least recently used media until the cache fits in max_bytes
+    Returns:
+        Number of bytes freed
+    """
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    entries = sorted(_entries())
+    total = sum(size for _, size, _ in entries)
+    freed = 0
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        media = path[:-len(".part")] if path.endswith(".part") else path
+        if media == keep or _pinned.get(media):
+            continue
+        vid = os.path.splitext(os.path.basename(media))[0]
+        with _video_lock(vid):
+            if _pinned.get(media) or not os.path.exists(path):
+                continue
+            os.remove(path)
+            if path == media and os.path.exists(_manifest_path(media)):
+                os.remove(_manifest_path(media))
+        total -= size
+        freed += size
+        counters["evicted"] += 1
+    return freed
+
+
+def stats():
+    """Files and bytes currently cached"""
+    entries = _entries()
+    return {"files": len(entries), "bytes": sum(size for _, size, _ in entries)}
+
+
+@lru_cache(maxsize=1)
+def _register_gauges():
+    metrics.register_gauge(
+        "videomind_media_cache_events_total", lambda: dict(counters), label="event",
+        help="Media cache hits, downloads, resumes, corrupt files and evictions", kind="counter"
+    )
+    metrics.register_gauge(
+        "videomind_media_cache_bytes", lambda: stats()["bytes"],
+        help="Bytes of downloaded media kept on disk"
+    )
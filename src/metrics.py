@@ -0,0 +1,309 @@
+import os
+import time
+import json
+import threading
+import functools
+from contextlib import contextmanager
+
+# Tracing is off unless explicitly enabled; when off every hook is a cheap no-op
+ENABLED = os.getenv("VIDEOMIND_METRICS", "").lower() in ("1", "true", "yes")
+
+# Optional JSON lines sink (one event per finished span)
+JSONL_PATH = os.getenv("VIDEOMIND_METRICS_JSONL")
+
+# Stage to run under cProfile, e.g. VIDEOMIND_PROFILE_STAGE=transcribe_video
+PROFILE_STAGE = os.getenv("VIDEOMIND_PROFILE_STAGE")
+PROFILE_DIR = os.getenv("VIDEOMIND_PROFILE_DIR", "profiles")
+
+# Histogram buckets (seconds) for stage durations
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Counters summed per stage from span attributes
+COUNTERS = ("bytes", "tokens", "cache_hits", "audio_seconds")
+
+_lock = threading.Lock()
+_stats = {}
+_local = threading.local()
+
+# Values computed at export time: name -> (func, label, help, type)
+_gauges = {}
+
+
+def enable(jsonl_path=None):
+    """Turn tracing on at runtime"""
+    global ENABLED, JSONL_PATH
+    ENABLED = True
+    if jsonl_path:
+        JSONL_PATH = jsonl_path
+
+
+def disable():
+    """Turn tracing off"""
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    """Drop all recorded stage statistics"""
+    with _lock:
+        _stats.clear()
+
+
+class Span:
+    """A single timed pipeline stage"""
+
+    __slots__ = ("stage", "attrs", "start", "duration", "error")
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.attrs = {}
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.error = None
+
+    def set(self, **attrs):
+        """Attach attributes (bytes, tokens, cache_hits, audio_seconds, ...)"""
+        self.attrs.update(attrs)
+
+
+class _NoopSpan:
+    """Span stand-in used when tracing is disabled"""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def current_span():
+    """Return the innermost active span on this thread (or a no-op span)"""
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else _NOOP
+
+
+def annotate(**attrs):
+    """Attach attributes to the innermost active span"""
+    if ENABLED:
+        current_span().set(**attrs)
+
+
+@contextmanager
+def _profiled(stage):
+    """Run the body under cProfile and dump stats next to other profiles"""
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(
+            PROFILE_DIR,
+            f"{stage}-{os.getpid()}-{threading.get_ident()}-{int(time.time() * 1000)}.prof"
+        )
+        profiler.dump_stats(path)
+
+
+@contextmanager
+def span(stage, **attrs):
+    """Time a pipeline stage
+    Args:
+        stage: Stage name, used as the metric label
+        attrs: Initial span attributes
+    """
+    if not ENABLED:
+        yield _NOOP
+        return
+
+    s = Span(stage)
+    s.attrs.update(attrs)
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(s)
+    try:
+        if stage == PROFILE_STAGE:
+            with _profiled(stage):
+                yield s
+        else:
+            yield s
+    except BaseException as e:
+        s.error = type(e).__name__
+        raise
+    finally:
+        s.duration = time.perf_counter() - s.start
+        stack.pop()
+        _record(s)
+
+
+def traced(stage=None):
+    """Decorator that wraps a function call in a span"""
+    def decorator(func):
+        name = stage or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _record(s):
+    """Fold a finished span into the per-stage aggregates"""
+    with _lock:
+        stats = _stats.get(s.stage)
+        if stats is None:
+            stats = _stats[s.stage] = {
+                "count": 0,
+                "errors": 0,
+                "seconds": 0.0,
+                "buckets": [0] * len(BUCKETS),
+                **{name: 0 for name in COUNTERS}
+            }
+        stats["count"] += 1
+        stats["seconds"] += s.duration
+        if s.error or s.attrs.get("error"):
+            stats["errors"] += 1
+        for i, bound in enumerate(BUCKETS):
+            if s.duration <= bound:
+                stats["buckets"][i] += 1
+        for name in COUNTERS:
+            value = s.attrs.get(name)
+            if value:
+                stats[name] += value
+
+    if JSONL_PATH:
+        event = {
+            "ts": time.time(),
+            "stage": s.stage,
+            "duration": round(s.duration, 6),
+            "error": s.error,
+            **s.attrs
+        }
+        try:
+            with _lock, open(JSONL_PATH, "a") as f:
+                f.write(json.dumps(event, default=str) + "\n")
+        except OSError as e:
+            print(f"Error writing metrics: {str(e)}")
+
+
+def snapshot():
+    """Return a copy of the per-stage aggregates"""
+    with _lock:
+        result = {}
+        for stage, stats in _stats.items():
+            result[stage] = {**stats, "buckets": list(stats["buckets"])}
+    for stats in result.values():
+        if stats["audio_seconds"] and stats["seconds"]:
+            stats["audio_seconds_per_second"] = stats["audio_seconds"] / stats["seconds"]
+    return result
+
+
+def register_gauge(name, func, label=None, help="", kind="gauge"):
+    """Export a value read at scrape time (queue depths, throttle counts, ...)
+    Args:
+        name: Metric name
+        func: Returns a number, or a dict of label value -> number when `label` is set
+        label: Label name for dict values
+        kind: Prometheus type, 'gauge' or 'counter'
+    """
+    with _lock:
+        _gauges[name] = (func, label, help, kind)
+
+
+def gauges():
+    """Read every registered gauge"""
+    with _lock:
+        registered = dict(_gauges)
+    values = {}
+    for name, (func, _, _, _) in registered.items():
+        try:
+            values[name] = func()
+        except Exception as e:
+            print(f"Error reading metric {name}: {str(e)}")
+    return values
+
+
+def export_prometheus():
+    """Render the aggregates in Prometheus text exposition format"""
+    stats = snapshot()
+    lines = [
+        "# HELP videomind_stage_duration_seconds Time spent per pipeline stage",
+        "# TYPE videomind_stage_duration_seconds histogram"
+    ]
+    for stage, s in sorted(stats.items()):
+        for bound, count in zip(BUCKETS, s["buckets"]):
+            lines.append(f'videomind_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+        lines.append(f'videomind_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {s["count"]}')
+        lines.append(f'videomind_stage_duration_seconds_sum{{stage="{stage}"}} {s["seconds"]:.6f}')
+        lines.append(f'videomind_stage_duration_seconds_count{{stage="{stage}"}} {s["count"]}')
+
+    for name in ("errors",) + COUNTERS:
+        lines.append(f"# TYPE videomind_stage_{name}_total counter")
+        for stage, s in sorted(stats.items()):
+            lines.append(f'videomind_stage_{name}_total{{stage="{stage}"}} {s[name]}')
+
+    lines.append("# TYPE videomind_audio_seconds_per_second gauge")
+    for stage, s in sorted(stats.items()):
+        if "audio_seconds_per_second" in s:
+            lines.append(f'videomind_audio_seconds_per_second{{stage="{stage}"}} {s["audio_seconds_per_second"]:.4f}')
+
+    values = gauges()
+    with _lock:
+        registered = dict(_gauges)
+    for name, value in sorted(values.items()):
+        _, label, help_text, kind = registered[name]
+        if help_text:
+            lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if label:
+            for key, v in sorted(value.items()):
+                lines.append(f'{name}{{{label}="{key}"}} {v}')
+        else:
+            lines.append(f"{name} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def export_jsonl(path):
+    """Write the current aggregates as JSON lines (one stage per line)"""
+    with open(path, "w") as f:
+        for stage, s in sorted(snapshot().items()):
+            f.write(json.dumps({"stage": stage, **s}) + "\n")
+
+
+def start_metrics_server(port=9464, host="127.0.0.1"):
+    """Serve /metrics (Prometheus) and /metrics.json from a daemon thread"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body = export_prometheus().encode()
+                content_type = "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body = json.dumps({**snapshot(), "gauges": gauges()}).encode()
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=server.serve_forever, name="videomind-metrics", daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,110 @@
+import time
+import asyncio
+import threading
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate
+
+    Usable from threads (acquire) and from asyncio code (acquire_async).
+    """
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(capacity or per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, amount=1):
+        """Take tokens if available
+        Returns:
+            0 when the tokens were taken, otherwise seconds to wait before retrying
+        """
+        # A request larger than the bucket would never fit; let it through when full
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate
+
+    def release(self, amount=1):
+        """Return tokens taken by try_acquire that ended up unused"""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+    def acquire(self, amount=1):
+        """Block the calling thread until tokens are available"""
+        while True:
+            wait = self.try_acquire(amount)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, amount=1):
+        """Wait without blocking the event loop until tokens are available"""
+        while True:
+            wait = self.try_acquire(amount)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def take(self, amount):
+        """Take tokens unconditionally; the bucket may go negative"""
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+
+    def penalize(self, seconds):
+        """Drain the bucket so nothing is sent for about `seconds` (e.g. after a 429)"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budget for one provider"""
+
+    def __init__(self, rpm, tpm=None):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm) if tpm else None
+
+    def try_acquire(self, tokens=0):
+        """Take one request and `tokens` tokens if both are available
+        Returns:
+            0 when taken, otherwise seconds to wait before retrying
+        """
+        wait = self.requests.try_acquire(1)
+        if wait:
+            return wait
+        if self.tokens and tokens:
+            wait = self.tokens.try_acquire(tokens)
+            if wait:
+                self.requests.release(1)
+                return wait
+        return 0.0
+
+    def acquire(self, tokens=0):
+        self.requests.acquire(1)
+        if self.tokens and tokens:
+            self.tokens.acquire(tokens)
+
+    async def acquire_async(self, tokens=0):
+        await self.requests.acquire_async(1)
+        if self.tokens and tokens:
+            await self.tokens.acquire_async(tokens)
+
+    def charge(self, tokens):
+        """Count tokens added to a request after its budget was taken"""
+        if self.tokens and tokens:
+            self.tokens.take(tokens)
+
+    def penalize(self, seconds):
+        self.requests.penalize(seconds)
@@ -0,0 +1,507 @@
+import os
+import time
+import heapq
+import random
+import itertools
+import threading
+import concurrent.futures
+from functools import lru_cache
+from src import metrics
+from src.metrics import span
+from src.ratelimit import RateLimiter
+
+# Interactive chat traffic is always served before background ingest
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# Route OpenAI calls through the scheduler (set to 0 to call providers directly)
+ENABLED = os.getenv("VIDEOMIND_SCHEDULER", "1").lower() not in ("0", "false", "no")
+
+# Worker threads sending requests
+WORKERS = int(os.getenv("SCHEDULER_WORKERS", "4"))
+
+# Per-minute budgets shared by every session in the process
+LLM_RPM = int(os.getenv("OPENAI_RPM", "3500"))
+LLM_TPM = int(os.getenv("OPENAI_TPM", "90000"))
+EMBEDDING_RPM = int(os.getenv("EMBEDDING_RPM", "3000"))
+EMBEDDING_TPM = int(os.getenv("EMBEDDING_TPM", "1000000"))
+
+# Embedding batches start at the maximum size, halve on every 429 for
+# tokens and grow back after a run of successful batches
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+EMBED_MIN_BATCH_SIZE = 8
+EMBED_MAX_BATCH_TOKENS = int(os.getenv("EMBED_MAX_BATCH_TOKENS", "100000"))
+GROW_AFTER = 10
+
+# Retries with full-jitter exponential backoff. The scheduler owns retries,
+# so OpenAI clients are created with CLIENT_RETRIES (their own retries would
+# hide 429s from it)
+MAX_RETRIES = int(os.getenv("SCHEDULER_MAX_RETRIES", "6"))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+CLIENT_RETRIES = 0 if ENABLED else 2
+
+# HTTP statuses and client exceptions worth retrying
+RETRY_STATUSES = (408, 409, 429, 500, 502, 503, 504)
+RETRY_ERRORS = ("RateLimitError", "APIConnectionError", "APITimeoutError", "InternalServerError", "Timeout")
+
+
+def _status(error):
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_rate_limited(error):
+    """Whether an exception is a provider 429"""
+    return _status(error) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def is_retryable(error):
+    """Whether an exception is a transient provider failure"""
+    return _status(error) in RETRY_STATUSES or type(error).__name__ in RETRY_ERRORS
+
+
+def is_token_limited(error):
+    """Whether a 429 was for tokens per minute rather than requests
+    (OpenAI names the exhausted limit in the message)"""
+    return is_rate_limited(error) and "token" in str(error).lower()
+
+
+def retry_after(error):
+    """Seconds the provider asked us to wait, if it said"""
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt, hint=None):
+    """Full-jitter exponential backoff, never shorter than the provider's hint"""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    return max(delay, hint or 0.0)
+
+
+def _estimate_tokens(text):
+    # Rough token estimate (~4 characters per token)
+    return len(text) // 4 + 1
+
+
+class _Call:
+    """A single LLM call"""
+
+    kind = "llm"
+
+    def __init__(self, priority, func, args, kwargs, tokens):
+        self.priority = priority
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.tokens = tokens
+        self.attempts = 0
+        self.future = concurrent.futures.Future()
+
+    def __len__(self):
+        return 1
+
+    def execute(self):
+        return self.func(*self.args, **self.kwargs)
+
+    def succeed(self, result):
+        self.future.set_result(result)
+
+    def fail(self, error):
+        self.future.set_exception(error)
+
+
+class _EmbedRequest:
+    """One caller's texts, possibly spread over several batches"""
+
+    def __init__(self, priority, model, texts):
+        self.priority = priority
+        self.model = model
+        self.texts = texts
+        self.cursor = 0
+        self.vectors = [None] * len(texts)
+        self.remaining = len(texts)
+        self.future = concurrent.futures.Future()
+
+
+class _Batch:
+    """Texts from one or more requests sent as one embedding call"""
+
+    kind = "embeddings"
+
+    def __init__(self, model, priority):
+        self.model = model
+        self.priority = priority
+        self.parts = []
+        self.texts = []
+        self.tokens = 0
+        self.attempts = 0
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, request, start, stop):
+        self.parts.append((request, start, stop))
+        texts = request.texts[start:stop]
+        self.texts.extend(texts)
+        self.tokens += sum(_estimate_tokens(t) for t in texts)
+        self.priority = min(self.priority, request.priority)
+
+    def split(self, size):
+        """Split into batches of at most `size` texts"""
+        batches = []
+        for request, start, stop in self.parts:
+            while start < stop:
+                if not batches or len(batches[-1]) >= size:
+                    batches.append(_Batch(self.model, self.priority))
+                    batches[-1].attempts = self.attempts
+                take = min(stop, start + size - len(batches[-1]))
+                batches[-1].add(request, start, take)
+                start = take
+        return batches
+
+    def execute(self):
+        return self.model.embed_documents(self.texts)
+
+    def succeed(self, vectors, lock):
+        offset = 0
+        for request, start, stop in self.parts:
+            count = stop - start
+            request.vectors[start:stop] = vectors[offset:offset + count]
+            offset += count
+            with lock:
+                request.remaining -= count
+                done = request.remaining == 0
+            if done and not request.future.done():
+                request.future.set_result(request.vectors)
+
+    def fail(self, error):
+        for request, _, _ in self.parts:
+            if not request.future.done():
+                request.future.set_exception(error)
+
+
+class Scheduler:
+    """Central queue for OpenAI embedding and LLM requests
+
+    Embedding requests from every session are merged into batches of the
+    current best size, every request passes the shared RPM/TPM budget, 429s
+    and transient errors are retried with jittered backoff, and interactive
+    requests are always dispatched before background ones.
+    """
+
+    def __init__(self, workers=WORKERS, limiters=None, batch_size=EMBED_BATCH_SIZE):
+        self.limiters = limiters or {
+            "llm": RateLimiter(LLM_RPM, LLM_TPM),
+            "embeddings": RateLimiter(EMBEDDING_RPM, EMBEDDING_TPM)
+        }
+        self.workers = workers
+        self.max_batch_size = batch_size
+        self.batch_size = batch_size
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._ready = []     # (priority, seq, _Call or _Batch)
+        self._embeds = []    # (priority, seq, _EmbedRequest) with texts not yet batched
+        self._delayed = []   # (ready_at, seq, item) waiting out a backoff
+        self._threads = []
+        self._successes = 0
+        self._acquiring = {kind: 0 for kind in self.limiters}
+        self.counters = {
+            "requests": 0, "batches": 0, "texts_embedded": 0,
+            "throttled": 0, "retries": 0, "failed": 0, "preempted": 0
+        }
+
+    def _start(self):
+        if len(self._threads) < self.workers:
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._work, name=f"scheduler-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, func, *args, priority=BACKGROUND, tokens=0, **kwargs):
+        """Queue an LLM call
+        Returns:
+            concurrent.futures.Future with the call's result
+        """
+        call = _Call(priority, func, args, kwargs, tokens)
+        with self._cond:
+            self._start()
+            heapq.heappush(self._ready, (priority, next(self._seq), call))
+            self.counters["requests"] += 1
+            self._cond.notify()
+        return call.future
+
+    def call(self, func, *args, priority=BACKGROUND, tokens=0, **kwargs):
+        """Run an LLM call through the queue and wait for its result"""
+        return self.submit(func, *args, priority=priority, tokens=tokens, **kwargs).result()
+
+    def submit_embeddings(self, model, texts, priority=BACKGROUND):
+        """Queue texts to embed with `model`
+        Returns:
+            concurrent.futures.Future with the list of vectors
+        """
+        request = _EmbedRequest(priority, model, list(texts))
+        if not request.texts:
+            request.future.set_result([])
+            return request.future
+        with self._cond:
+            self._start()
+            heapq.heappush(self._embeds, (priority, next(self._seq), request))
+            self.counters["requests"] += 1
+            self._cond.notify()
+        return request.future
+
+    def embed(self, model, texts, priority=BACKGROUND):
+        """Embed texts through the queue and wait for the vectors"""
+        return self.submit_embeddings(model, texts, priority).result()
+
+    def _next_batch(self, batch=None):
+        """Merge queued embedding requests for the top model into one batch
+        (or into `batch`, topping it up)"""
+        if batch is None:
+            first = self._embeds[0][2]
+            batch = _Batch(first.model, first.priority)
+        pending = []
+        while self._embeds and len(batch) < self.batch_size and batch.tokens < EMBED_MAX_BATCH_TOKENS:
+            entry = heapq.heappop(self._embeds)
+            request = entry[2]
+            # Interactive batches stay small; background texts never ride along
+            if request.model is not batch.model or request.priority != batch.priority:
+                pending.append(entry)
+                continue
+            stop = request.cursor
+            size, tokens = len(batch), batch.tokens
+            while stop < len(request.texts) and size < self.batch_size:
+                tokens += _estimate_tokens(request.texts[stop])
+                if size and tokens > EMBED_MAX_BATCH_TOKENS:
+                    break
+                stop += 1
+                size += 1
+            batch.add(request, request.cursor, stop)
+            request.cursor = stop
+            if stop < len(request.texts):
+                pending.append(entry)
+            if tokens > EMBED_MAX_BATCH_TOKENS:
+                break
+        for entry in pending:
+            heapq.heappush(self._embeds, entry)
+        return batch
+
+    def _take(self):
+        """Block until there is work, then return the highest-priority item"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, _, item = heapq.heappop(self._delayed)
+                    heapq.heappush(self._ready, (item.priority, next(self._seq), item))
+
+                ready = self._ready[0][:2] if self._ready else None
+                embeds = self._embeds[0][:2] if self._embeds else None
+                if ready and (not embeds or ready <= embeds):
+                    item = heapq.heappop(self._ready)[2]
+                    if isinstance(item, _Batch) and len(item) > self.batch_size:
+                        # The batch size shrank while this batch waited to be retried
+                        item, *rest = item.split(self.batch_size)
+                        for other in rest:
+                            heapq.heappush(self._ready, (other.priority, next(self._seq), other))
+                    return item
+                if embeds:
+                    return self._next_batch()
+
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                self._cond.wait(timeout)
+
+    def _interactive_waiting(self):
+        return bool(
+            (self._ready and self._ready[0][0] == INTERACTIVE) or
+            (self._embeds and self._embeds[0][0] == INTERACTIVE)
+        )
+
+    def _acquire(self, item):
+        """Wait for budget; background work steps aside for interactive work
+        Returns:
+            False if the item was put back in the queue
+        """
+        limiter = self.limiters[item.kind]
+        interactive = item.priority == INTERACTIVE
+        if interactive:
+            with self._cond:
+                self._acquiring[item.kind] += 1
+        try:
+            while True:
+                if not interactive:
+                    with self._cond:
+                        if self._interactive_waiting():
+                            heapq.heappush(self._ready, (item.priority, next(self._seq), item))
+                            self.counters["preempted"] += 1
+                            self._cond.notify()
+                            return False
+                        # Interactive work already waiting for this budget goes first
+                        yielding = self._acquiring[item.kind] > 0
+                    if yielding:
+                        time.sleep(0.01)
+                        continue
+                wait = limiter.try_acquire(item.tokens)
+                if not wait:
+                    return True
+                # Poll so newly queued interactive work is noticed
+                time.sleep(min(wait, 0.05))
+        finally:
+            if interactive:
+                with self._cond:
+                    self._acquiring[item.kind] -= 1
+
+    def _top_up(self, batch):
+        """Add texts queued while the batch waited for budget"""
+        with self._cond:
+            tokens = batch.tokens
+            self._next_batch(batch)
+            added = batch.tokens - tokens
+        self.limiters[batch.kind].charge(added)
+
+    def _work(self):
+        while True:
+            item = self._take()
+            if not self._acquire(item):
+                # Give the interactive item a worker before competing again
+                time.sleep(0.005)
+                continue
+            if isinstance(item, _Batch):
+                self._top_up(item)
+            self._run(item)
+
+    def _run(self, item):
+        try:
+            with span(f"scheduler_{item.kind}", tokens=item.tokens):
+                result = item.execute()
+        except Exception as e:
+            self._failed(item, e)
+            return
+
+        with self._cond:
+            if isinstance(item, _Batch):
+                self.counters["batches"] += 1
+                self.counters["texts_embedded"] += len(item)
+                self._successes += 1
+                if self._successes >= GROW_AFTER and self.batch_size < self.max_batch_size:
+                    self.batch_size = min(self.max_batch_size, self.batch_size * 2)
+                    self._successes = 0
+        if isinstance(item, _Batch):
+            item.succeed(result, self._cond)
+        else:
+            item.succeed(result)
+
+    def _failed(self, item, error):
+        if not is_retryable(error) or item.attempts >= MAX_RETRIES:
+            with self._cond:
+                self.counters["failed"] += 1
+            item.fail(error)
+            return
+
+        item.attempts += 1
+        hint = retry_after(error)
+        delay = backoff(item.attempts, hint)
+        with self._cond:
+            self.counters["retries"] += 1
+            if is_rate_limited(error):
+                self.counters["throttled"] += 1
+                # Everyone pauses for as long as the provider asked; the jitter
+                # on top only spreads this item's own retry
+                self.limiters[item.kind].penalize(hint if hint is not None else delay)
+                # Smaller batches only help against a token limit; against a
+                # request limit they would just mean more requests
+                if isinstance(item, _Batch) and is_token_limited(error):
+                    self.batch_size = max(EMBED_MIN_BATCH_SIZE, self.batch_size // 2)
+                    self._successes = 0
+            heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._seq), item))
+            self._cond.notify()
+
+    def queue_depth(self):
+        """Queued requests per priority (including ones waiting out a backoff)"""
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        with self._cond:
+            for queue in (self._ready, self._embeds, self._delayed):
+                for entry in queue:
+                    depth[PRIORITY_NAMES[entry[2].priority]] += 1
+        return depth
+
+    def stats(self):
+        """Queue depth, throttle and retry counts and the current batch size"""
+        depth = self.queue_depth()
+        with self._cond:
+            return {
+                "queue_depth": depth,
+                "delayed": len(self._delayed),
+                "batch_size": self.batch_size,
+                **self.counters
+            }
+
+
+@lru_cache(maxsize=1)
+def get_scheduler():
+    """Process-wide scheduler shared by every session"""
+    scheduler = Scheduler()
+    metrics.register_gauge(
+        "videomind_scheduler_queue_depth", scheduler.queue_depth, label="priority",
+        help="Queued OpenAI requests"
+    )
+    metrics.register_gauge(
+        "videomind_scheduler_events_total", lambda: dict(scheduler.counters), label="event",
+        help="Scheduler requests, batches, throttles, retries and failures", kind="counter"
+    )
+    metrics.register_gauge(
+        "videomind_scheduler_batch_size", lambda: scheduler.batch_size,
+        help="Current embedding batch size"
+    )
+    return scheduler
+
+
+def submit(func, *args, priority=BACKGROUND, tokens=0, **kwargs):
+    """Queue an LLM call on the shared scheduler (callers check ENABLED)
+    Returns:
+        concurrent.futures.Future with the call's result
+    """
+    return get_scheduler().submit(func, *args, priority=priority, tokens=tokens, **kwargs)
+
+
+def call(func, *args, priority=BACKGROUND, tokens=0, **kwargs):
+    """Run an LLM call through the shared scheduler"""
+    if not ENABLED:
+        return func(*args, **kwargs)
+    return get_scheduler().call(func, *args, priority=priority, tokens=tokens, **kwargs)
+
+
+@lru_cache(maxsize=1)
+def _embeddings_class():
+    # Built on first use so importing this module stays cheap
+    from langchain_core.embeddings import Embeddings
+
+    class ScheduledEmbeddings(Embeddings):
+        """Embeddings that go through the shared scheduler"""
+
+        def __init__(self, model, priority):
+            self.model = model
+            self.priority = priority
+
+        def embed_documents(self, texts):
+            return get_scheduler().embed(self.model, texts, self.priority)
+
+        def embed_query(self, text):
+            return get_scheduler().embed(self.model, [text], self.priority)[0]
+
+    return ScheduledEmbeddings
+
+
+def scheduled_embeddings(model, priority=BACKGROUND):
+    """Wrap an embeddings model so its requests are batched, budgeted and retried"""
+    if not ENABLED:
+        return model
+    return _embeddings_class()(model, priority)
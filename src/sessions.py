@@ -0,0 +1,334 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse, parse_qs
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+# Sessions not seen for this long are ended and their video references dropped
+SESSION_TTL = float(os.getenv("SESSION_TTL_SECONDS", str(24 * 3600)))
+
+# How often the server looks for idle sessions; a closed browser tab never
+# ends its own session
+EXPIRY_INTERVAL = float(os.getenv("SESSION_EXPIRY_INTERVAL_SECONDS", "900"))
+
+# How often an active session refreshes its last-seen time
+TOUCH_INTERVAL = 60
+
+# Every video's vectors live once in this namespace; a session is a filter
+# on their video_id metadata
+VECTOR_NAMESPACE = "videos"
+
+_lock = threading.RLock()
+_video_locks = {}
+_touched = {}
+# Last registry read or written by this process, keyed by the file's stat
+_cached = {"key": None, "state": None}
+
+
+def new_session_id():
+    """Random per-user session ID (never derived from the videos loaded)"""
+    return uuid.uuid4().hex
+
+
+def video_id(url):
+    """Canonical ID of a video, the same for every URL form of it"""
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+    if host.endswith("youtu.be"):
+        vid = parsed.path.strip("/").split("/")[0]
+    elif "youtube" in host:
+        vid = parse_qs(parsed.query).get("v", [""])[0]
+        if not vid and parsed.path.startswith(("/shorts/", "/embed/", "/live/")):
+            vid = parsed.path.split("/")[2]
+    else:
+        vid = ""
+    return vid or hashlib.md5(url.encode()).hexdigest()[:16]
+
+
+def private_video_id(vid, session_id):
+    """ID under which a video is stored for one session only (e.g. restored from an upload)"""
+    return f"{vid}~{session_id}"
+
+
+def vector_ids(vid, chunks):
+    """Deterministic Pinecone IDs of a video's chunk vectors"""
+    return [f"{vid}-{i}" for i in range(chunks)]
+
+
+def _registry_path():
+    # Read at call time so a patched CACHE_DIR is honoured
+    from src import utils
+    return os.path.join(utils.CACHE_DIR, "vector_registry.json")
+
+
+def _empty():
+    return {"videos": {}, "sessions": {}, "shared": {}}
+
+
+def _stat_key(path):
+    """Identifies one version of the registry file (it is replaced, never edited)"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (path, st.st_mtime_ns, st.st_ino, st.st_size)
+
+
+def _read(path):
+    if not os.path.exists(path):
+        return _empty()
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+@contextmanager
+def _registry():
+    """Read-modify-write the registry under the process and file locks"""
+    path = _registry_path()
+    with _lock:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".lock", 'w') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            state = _read(path)
+            yield state
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp, path)
+            _cached.update(key=_stat_key(path), state=state)
+
+
+def snapshot():
+    """Current registry contents (parsed again only when the file changed)
+    The result is shared between callers and must not be modified.
+    """
+    path = _registry_path()
+    with _lock:
+        key = _stat_key(path)
+        if key is None:
+            return _empty()
+        if key != _cached["key"]:
+            _cached.update(key=key, state=_read(path))
+        return _cached["state"]
+
+
+@contextmanager
+def video_lock(vid):
+    """Single-flight guard so concurrent sessions embed a video only once"""
+    with _lock:
+        lock = _video_locks.setdefault(vid, threading.Lock())
+    with lock:
+        yield
+
+
+def is_embedded(vid):
+    """Whether a video's vectors are already stored"""
+    return vid in snapshot()["videos"]
+
+
+def register_video(vid, url, chunks, duplicates=None):
+    """Record a video whose vectors were just stored
+    Args:
+        duplicates: Chunk index -> ID of the stored vector it shares
+    """
+    with _registry() as state:
+        video = state["videos"].setdefault(vid, {"sessions": []})
+        video.update({"url": url, "chunks": chunks, "created": time.time()})
+        if duplicates:
+            video["duplicates"] = {str(i): id_ for i, id_ in duplicates.items()}
+
+
+def _is_stored(state, id_):
+    """Whether a vector ID still exists: shared, or a registered video's own chunk"""
+    if id_ in state["shared"]:
+        return True
+    vid, i = id_.rsplit("-", 1)
+    video = state["videos"].get(vid)
+    return video is not None and int(i) < video.get("chunks", 0) and i not in video.get("duplicates", {})
+
+
+def share_vectors(vid, matches):
+    """Claim stored vectors for a new video's near-duplicate chunks
+    Args:
+        matches: Chunk index -> (vector ID, reference of the chunk that vector
+            was stored for, reference of the new chunk)
+    Returns:
+        (accepted, references) where accepted maps chunk index -> vector ID
+        for the vectors that still exist, and references maps each claimed
+        vector ID to every chunk reference it now stands for
+    """
+    with _registry() as state:
+        state.setdefault("shared", {})
+        accepted, references = {}, {}
+        for i, (id_, owner_ref, ref) in sorted(matches.items()):
+            # Within the same video the matched chunk is stored alongside this one
+            if not id_.startswith(f"{vid}-") and not _is_stored(state, id_):
+                continue
+            refs = state["shared"].setdefault(id_, [owner_ref])
+            refs.append(ref)
+            accepted[i] = id_
+            references[id_] = list(refs)
+        return accepted, references
+
+
+def shared_references(ids):
+    """Current chunk references of shared vectors"""
+    shared = snapshot().get("shared", {})
+    return {id_: list(shared[id_]) for id_ in ids if id_ in shared}
+
+
+def attach(session_id, vids):
+    """Reference videos from a session
+    Returns:
+        IDs of the videos that are not stored (and so were not attached)
+    """
+    missing = []
+    with _registry() as state:
+        session = state["sessions"].setdefault(session_id, {"videos": []})
+        session["seen"] = time.time()
+        for vid in vids:
+            video = state["videos"].get(vid)
+            if video is None:
+                missing.append(vid)
+                continue
+            if session_id not in video["sessions"]:
+                video["sessions"].append(session_id)
+            if vid not in session["videos"]:
+                session["videos"].append(vid)
+    return missing
+
+
+def _release(state, session_id, vid, orphans):
+    """Drop one reference; forget the video when no session uses it any more
+    Orphaned videos are appended to `orphans` as (video ID, vector IDs to
+    delete, IDs of shared vectors whose references changed).
+    """
+    video = state["videos"].get(vid)
+    if video is None:
+        return
+    if session_id in video["sessions"]:
+        video["sessions"].remove(session_id)
+    if not video["sessions"]:
+        delete, update = _unshare(state, vid, video)
+        orphans.append((vid, delete, list(update)))
+        del state["videos"][vid]
+
+
+def _delete_orphans(orphans, on_orphan):
+    """Hand orphaned videos to on_orphan once the registry lock is released
+    Deleting vectors takes network round trips, and holding the registry
+    meanwhile would stall every session's queries. Each video is handled under
+    its video_lock, so a session embedding it again waits for the delete, and
+    vectors stored again since the release are left alone.
+    """
+    if not on_orphan:
+        return
+    for vid, delete, update in orphans:
+        with video_lock(vid):
+            state = snapshot()
+            delete = [id_ for id_ in delete if not _is_stored(state, id_)]
+            on_orphan(vid, delete, shared_references(update))
+
+
+def _unshare(state, vid, video):
+    """Drop a video's references from the vectors it uses
+    Returns:
+        (IDs of vectors nothing references any more, remaining references of
+        shared vectors other videos still use)
+    """
+    shared = state.setdefault("shared", {})
+    duplicates = video.get("duplicates", {})
+    own = [id_ for i, id_ in enumerate(vector_ids(vid, video.get("chunks", 0))) if str(i) not in duplicates]
+    delete, update = [], {}
+    # A chunk may share a vector stored for the same video, so visit each ID once
+    for id_ in dict.fromkeys(own + sorted(set(duplicates.values()))):
+        if id_ not in shared:
+            delete.append(id_)
+            continue
+        refs = [ref for ref in shared[id_] if not ref.startswith(f"{vid}|")]
+        if refs:
+            shared[id_] = refs
+            update[id_] = refs
+        else:
+            del shared[id_]
+            delete.append(id_)
+    return delete, update
+
+
+def detach(session_id, vid, on_orphan=None):
+    """Remove one video from a session
+    Args:
+        on_orphan: Called with (video ID, vector IDs to delete, remaining
+            references of vectors other videos share) when its last reference is dropped
+    """
+    orphans = []
+    with _registry() as state:
+        session = state["sessions"].get(session_id)
+        if session and vid in session["videos"]:
+            session["videos"].remove(vid)
+        _release(state, session_id, vid, orphans)
+    _delete_orphans(orphans, on_orphan)
+
+
+def end_session(session_id, on_orphan=None):
+    """Drop every reference a session holds"""
+    orphans = []
+    with _registry() as state:
+        session = state["sessions"].pop(session_id, None)
+        for vid in (session or {}).get("videos", []):
+            _release(state, session_id, vid, orphans)
+    _touched.pop(session_id, None)
+    _delete_orphans(orphans, on_orphan)
+
+
+def expire_sessions(on_orphan=None, ttl=SESSION_TTL):
+    """End sessions that have not been seen for `ttl` seconds
+    Returns:
+        Number of sessions ended
+    """
+    cutoff = time.time() - ttl
+    orphans = []
+    with _registry() as state:
+        stale = [sid for sid, s in state["sessions"].items() if s.get("seen", 0) < cutoff]
+        for session_id in stale:
+            session = state["sessions"].pop(session_id)
+            for vid in session.get("videos", []):
+                _release(state, session_id, vid, orphans)
+    _delete_orphans(orphans, on_orphan)
+    return len(stale)
+
+
+def forget_videos():
+    """Drop every video record after the vector index was wiped
+    Sessions keep their IDs but lose their videos."""
+    with _registry() as state:
+        state["videos"] = {}
+        state["shared"] = {}
+        for session in state["sessions"].values():
+            session["videos"] = []
+
+
+def touch(session_id):
+    """Mark a session as active (written at most once per TOUCH_INTERVAL)"""
+    now = time.time()
+    if now - _touched.get(session_id, 0) < TOUCH_INTERVAL:
+        return
+    _touched[session_id] = now
+    with _registry() as state:
+        session = state["sessions"].get(session_id)
+        if session:
+            session["seen"] = now
+
+
+def session_videos(session_id):
+    """Video IDs a session can query"""
+    return list(snapshot()["sessions"].get(session_id, {}).get("videos", []))
@@ -0,0 +1,326 @@
+import os
+import json
+import mmap
+import struct
+from src import utils, sessions
+from src.metrics import traced, annotate
+from src.lazy import lazy_import
+from src.transcript import Transcript
+
+np = lazy_import("numpy")
+
+# Binary layout (little-endian):
+#   header    MAGIC, version, flags, manifest offset, manifest length
+#   sections  each starting on a 64-byte boundary:
+#             vectors f32[n_chunks, dim], chunk_start f32[n], chunk_end f32[n]
+#             (NaN for untimed chunks), chunk_offset u32[n+1] into chunk_text,
+#             chunk_text (UTF-8), transcripts (Transcript.to_bytes() blobs)
+#   manifest  JSON: section offsets, per-video cache entries and chunk ranges,
+#             the session's corpus digest
+MAGIC = b"VMSS"
+VERSION = 1
+ALIGN = 64
+_HEADER = struct.Struct("<4sHHQQ")
+
+
+def _pad(f):
+    f.write(b"\0" * (-f.tell() % ALIGN))
+
+
+def _chunk_rows(url, transcript, vid, video):
+    """(values, text, start, end) of a video's chunks, or None if any vector is missing
+    Chunks that share another chunk's vector (near-duplicates) get a copy of it.
+    """
+    texts, metadatas = utils._split_transcript(url, transcript)
+    if len(texts) != video.get("chunks"):
+        return None
+    duplicates = video.get("duplicates", {})
+    ids = [duplicates.get(str(i), id_) for i, id_ in enumerate(sessions.vector_ids(vid, len(texts)))]
+    found = utils.fetch_vectors(list(dict.fromkeys(ids)))
+    if not all(id_ in found for id_ in ids):
+        return None
+    nan = float("nan")
+    return [
+        (found[id_][0], text, metadata.get("start", nan), metadata.get("end", nan))
+        for id_, text, metadata in zip(ids, texts, metadatas)
+    ]
+
+
+@traced("export_session")
+def export_session(session_id, urls, path, corpus=None, private=None):
+    """Write a session's videos, summaries and vectors to one archive file
+    Args:
+        session_id: Session whose videos are exported
+        urls: The session's video URLs
+        path: Archive file to write
+        corpus: The session's cross-video digest state
+        private: URL -> (cache entry, Transcript) of videos the session
+            restored privately (see restore_session)
+    Returns:
+        Number of bytes written
+    """
+    registry = sessions.snapshot()["videos"]
+    private = private or {}
+    videos, vectors, texts, starts, ends = [], [], [], [], []
+    transcripts = []
+    for url in urls:
+        vid = sessions.video_id(url)
+        if url in private:
+            cached, transcript = private[url]
+            stored = sessions.private_video_id(vid, session_id)
+        else:
+            cached = utils.load_from_cache(url)
+            if not cached or not cached.get('transcript'):
+                print(f"Nothing cached for {url}, leaving it out of the export")
+                continue
+            transcript = utils.load_transcript(url) or Transcript.from_text(cached['transcript'])
+            stored = vid
+        rows = _chunk_rows(url, transcript, stored, registry[stored]) if stored in registry else None
+        if rows is None:
+            # Exported without vectors; restoring it embeds the transcript again
+            print(f"Vectors for {url} are not stored, exporting its transcript only")
+            rows = []
+        entry = {k: v for k, v in cached.items() if k != 'transcript'}
+        videos.append({"url": url, "vid": vid, "cache": entry, "first_chunk": len(texts), "chunks": len(rows)})
+        for values, text, start, end in rows:
+            vectors.append(values)
+            texts.append(text.encode("utf-8"))
+            starts.append(start)
+            ends.append(end)
+        transcripts.append(transcript.to_bytes())
+
+    dim = len(vectors[0]) if vectors else 0
+    offsets = np.zeros(len(texts) + 1, dtype="<u4")
+    np.cumsum([len(t) for t in texts], out=offsets[1:])
+    columns = [
+        ("vectors", np.asarray(vectors, dtype="<f4").reshape(len(vectors), dim).tobytes()),
+        ("chunk_start", np.asarray(starts, dtype="<f4").tobytes()),
+        ("chunk_end", np.asarray(ends, dtype="<f4").tobytes()),
+        ("chunk_offset", offsets.tobytes()),
+        ("chunk_text", b"".join(texts)),
+        ("transcripts", b"".join(transcripts))
+    ]
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(b"\0" * _HEADER.size)
+        sections = {}
+        for name, data in columns:
+            _pad(f)
+            sections[name] = [f.tell(), len(data)]
+            f.write(data)
+        position = sections["transcripts"][0]
+        for video, blob in zip(videos, transcripts):
+            video["transcript"] = [position, len(blob)]
+            position += len(blob)
+        manifest = json.dumps({
+            "session_id": session_id,
+            "dim": dim,
+            "chunks": len(texts),
+            "sections": sections,
+            "videos": videos,
+            "corpus": corpus
+        }).encode("utf-8")
+        manifest_offset = f.tell()
+        f.write(manifest)
+        size = f.tell()
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, manifest_offset, len(manifest)))
+    os.replace(tmp, path)
+    annotate(bytes=size, chunks=len(texts))
+    return size
+
+
+def _is_count(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+class SessionArchive:
+    """A session archive mapped into memory
+
+    Vectors and chunk text are read in place from the mapped file, so opening
+    an archive costs the manifest, not the size of the session.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, _, offset, length = _HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("Not a session archive or unsupported version")
+            self.manifest = json.loads(self._map[offset:offset + length])
+            self._check()
+        except (struct.error, KeyError, TypeError, IndexError) as e:
+            # Archives are uploaded, so any malformed one surfaces as ValueError
+            self.close()
+            raise ValueError(f"Malformed session archive ({type(e).__name__}: {e})") from e
+        except Exception:
+            self.close()
+            raise
+        self.videos = self.manifest["videos"]
+        self.dim = self.manifest["dim"]
+
+    def _span(self, span):
+        """(offset, length) of a byte range, checked against the file"""
+        offset, length = span
+        if not (_is_count(offset) and _is_count(length) and offset + length <= len(self._map)):
+            raise ValueError(f"Archive range {span} lies outside the file")
+        return offset, length
+
+    def _check(self):
+        """Check every section and video range before anything is read through them"""
+        manifest = self.manifest
+        dim, chunks = manifest["dim"], manifest["chunks"]
+        if not (_is_count(dim) and _is_count(chunks)):
+            raise ValueError("Archive dimension or chunk count is not a count")
+        sizes = {
+            "vectors": chunks * dim * 4,
+            "chunk_start": chunks * 4,
+            "chunk_end": chunks * 4,
+            "chunk_offset": (chunks + 1) * 4
+        }
+        sections = manifest["sections"]
+        for name in ("vectors", "chunk_start", "chunk_end", "chunk_offset", "chunk_text", "transcripts"):
+            _, length = self._span(sections[name])
+            if name in sizes and length != sizes[name]:
+                raise ValueError(f"Archive section {name} has {length} bytes, expected {sizes[name]}")
+        offsets = self._column("chunk_offset", "<u4")
+        if (np.diff(offsets.astype("i8")) < 0).any() or offsets[-1] > sections["chunk_text"][1]:
+            raise ValueError("Archive chunk offsets are out of order or out of range")
+        for video in manifest["videos"]:
+            first, count = video["first_chunk"], video["chunks"]
+            if not (isinstance(video["url"], str) and isinstance(video["cache"], dict)
+                    and _is_count(first) and _is_count(count) and first + count <= chunks):
+                raise ValueError(f"Archive entry for {video.get('url')} is malformed")
+            self._span(video["transcript"])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        try:
+            if hasattr(self, "_map"):
+                self._map.close()
+        except BufferError:
+            # Arrays handed out still view the map; it closes when they are freed
+            pass
+        self._file.close()
+
+    def _column(self, name, dtype):
+        offset, length = self.manifest["sections"][name]
+        dtype = np.dtype(dtype)
+        return np.frombuffer(self._map, dtype=dtype, count=length // dtype.itemsize, offset=offset)
+
+    def vectors(self, video):
+        """Float32 [chunks, dim] view of a video's vectors (not copied)"""
+        first, count = video["first_chunk"], video["chunks"]
+        offset = self.manifest["sections"]["vectors"][0] + first * self.dim * 4
+        return np.frombuffer(self._map, dtype="<f4", count=count * self.dim, offset=offset).reshape(count, self.dim)
+
+    def chunk_texts(self, video):
+        first, count = video["first_chunk"], video["chunks"]
+        offsets = self._column("chunk_offset", "<u4")[first:first + count + 1]
+        base = self.manifest["sections"]["chunk_text"][0]
+        return [
+            self._map[base + int(a):base + int(b)].decode("utf-8")
+            for a, b in zip(offsets[:-1], offsets[1:])
+        ]
+
+    def chunks(self, video):
+        """(texts, metadatas) of a video's chunks, as _split_transcript returns them"""
+        first, count = video["first_chunk"], video["chunks"]
+        starts = self._column("chunk_start", "<f4")[first:first + count]
+        ends = self._column("chunk_end", "<f4")[first:first + count]
+        metadatas = []
+        for i in range(count):
+            metadata = {"source": video["url"], "chunk": i}
+            if not np.isnan(starts[i]):
+                metadata["start"] = float(starts[i])
+                metadata["end"] = float(ends[i])
+            metadatas.append(metadata)
+        return self.chunk_texts(video), metadatas
+
+    def transcript(self, video):
+        offset, length = video["transcript"]
+        return Transcript.from_bytes(self._map[offset:offset + length])
+
+
+def _restore_private(archive, video, url, transcript, session_id):
+    """Store a video's archived vectors for one session only
+    Uploaded vectors can't be checked against their text without embedding
+    it again, so they are never shared with, or matched against, other
+    videos. Chunks are split from the transcript here; if they differ from
+    the archived ones (or none were exported) the transcript is embedded.
+    """
+    vid = sessions.private_video_id(sessions.video_id(url), session_id)
+    texts, metadatas = utils._split_transcript(url, transcript)
+    vectors = None
+    if video["chunks"] and archive.chunk_texts(video) == texts:
+        vectors = archive.vectors(video)
+    with sessions.video_lock(vid):
+        if sessions.attach(session_id, [vid]):
+            utils.store_chunks(vid, url, texts, metadatas, vectors=vectors, share=False)
+            sessions.attach(session_id, [vid])
+        else:
+            annotate(cache_hits=1)
+
+
+@traced("restore_session")
+def restore_session(path, session_id=None):
+    """Recreate a session from an archive without re-embedding its videos
+    An archive is an upload, so nothing in it replaces shared state. A video
+    already in the cache is restored from the cache, as if loaded again. Any
+    other video is restored into this session only: its transcript and cache
+    entry are returned instead of cached, and its stored vectors are upserted
+    as they are under an ID only this session references.
+    Args:
+        path: Archive written by export_session
+        session_id: Session to restore into (a new one if omitted)
+    Returns:
+        (session_id, videos, private, corpus) where videos maps each URL to its
+        cache entry (with transcript), private maps the URLs restored into
+        this session only to (cache entry, Transcript), and corpus is the
+        exported digest state (never cached) or None
+    Raises:
+        ValueError: The archive is malformed, its vectors don't fit the index,
+            or a transcript doesn't match its content hash
+    """
+    utils.initialize_pinecone()
+    session_id = session_id or utils.generate_session_id()
+    videos, private, cached = {}, {}, {}
+    with SessionArchive(path) as archive:
+        if archive.manifest["chunks"] and archive.dim != utils.EMBEDDING_DIM:
+            raise ValueError(f"Archive vectors have {archive.dim} dimensions, the index {utils.EMBEDDING_DIM}")
+        # Everything is checked before the first vector is stored
+        for video in archive.videos:
+            url = video["url"]
+            entry = utils.load_from_cache(url)
+            if entry and entry.get('transcript'):
+                videos[url] = entry
+                cached[url] = utils.load_transcript(url) or entry['transcript']
+                continue
+            transcript = archive.transcript(video)
+            entry = dict(video["cache"], transcript=transcript.text)
+            if entry.get('content_hash') != utils.content_hash(transcript.text):
+                raise ValueError(f"Transcript of {url} does not match its content hash")
+            videos[url] = entry
+            private[url] = (entry, transcript)
+        for video in archive.videos:
+            if video["url"] in private:
+                _restore_private(archive, video, video["url"], private[video["url"]][1], session_id)
+        corpus = archive.manifest.get("corpus")
+
+    if cached:
+        # Shared videos: attached, or embedded from the cached transcript
+        utils.create_vector_store(cached, session_id)
+    if isinstance(corpus, dict) and isinstance(corpus.get("videos"), dict) and isinstance(corpus.get("digest"), str):
+        # Held by the session; digests built on it are not cached either
+        corpus = dict(corpus, private=True)
+    else:
+        corpus = None
+    annotate(videos=len(videos))
+    return session_id, videos, private, corpus
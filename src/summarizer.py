@@ -1,16 +1,36 @@
-from langchain_openai import OpenAI
-from langchain.chains.summarize import load_summarize_chain
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.docstore.document import Document
 import os
+from src.metrics import traced, annotate
+from src.lazy import lazy_import
+from src.transcript import Transcript, format_timestamp
+from src import scheduler
 
+OpenAI = lazy_import("langchain_openai", "OpenAI")
+RecursiveCharacterTextSplitter = lazy_import("langchain.text_splitter", "RecursiveCharacterTextSplitter")
+
+def get_llm():
+    """Create the completion LLM used for summaries"""
+    return OpenAI(
+        model="gpt-3.5-turbo-instruct",
+        temperature=0,
+        max_retries=scheduler.CLIENT_RETRIES
+    )
+
+SUMMARY_PROMPT = """Write a concise summary of the following:
+
+
+"{text}"
+
+
+CONCISE SUMMARY:"""
+
+# Characters of chunk summaries combined into one reduce prompt
+REDUCE_MAX_CHARS = 12000
+
+@traced("summarize_text")
 def summarize_text(text):
     """Summarize text using LangChain and OpenAI."""
     # Initialize OpenAI LLM
-    llm = OpenAI(
-        model="gpt-3.5-turbo-instruct",
-        temperature=0
-    )
+    llm = get_llm()
 
     # Split text into chunks
     text_splitter = RecursiveCharacterTextSplitter(
@@ -18,13 +38,173 @@ def summarize_text(text):
         chunk_overlap=0,
         separators=[" ", ",", "\n"]
     )
-
-    # Convert text into documents
     texts = text_splitter.split_text(text)
-    docs = [Document(page_content=t) for t in texts]
 
-    # Create and run summarization chain (using map_reduce)
-    chain = load_summarize_chain(llm, chain_type="map_reduce")
-    summary = chain.run(docs)
+    # Map-reduce: summarize each chunk, then combine the summaries in groups
+    # until one is left. Every prompt is its own request, so a rate-limited
+    # one is retried without re-sending the rest
+    summaries = generate(llm, [SUMMARY_PROMPT.format(text=t) for t in texts])
+    while len(summaries) > 1:
+        groups, size = [[]], 0
+        for summary in summaries:
+            # At least two per group, so each round shrinks the list
+            if len(groups[-1]) > 1 and size + len(summary) > REDUCE_MAX_CHARS:
+                groups.append([])
+                size = 0
+            groups[-1].append(summary)
+            size += len(summary)
+        summaries = generate(llm, [SUMMARY_PROMPT.format(text="\n\n".join(g)) for g in groups])
+    summary = summaries[0] if summaries else ""
+
+    # Rough token estimate (~4 characters per token)
+    annotate(tokens=(len(text) + len(summary)) // 4)
+
+    return summary
+
+# Summary tree settings: sections are time windows of the transcript,
+# chapters group consecutive sections, the video summary covers the chapters
+SECTION_SECONDS = 180
+SECTION_MAX_CHARS = 6000
+SECTIONS_PER_CHAPTER = 5
+
+SECTION_PROMPT = """Summarize this part of a video transcript in 2-3 sentences:
+
+{text}
+
+SUMMARY:"""
+
+CHAPTER_PROMPT = """Below are summaries of consecutive sections of a video.
+Write a short chapter title on the first line, then summarize the chapter in 3-4 sentences on the following lines.
+
+{text}
+
+TITLE:"""
+
+VIDEO_PROMPT = """Below are chapter summaries of a video. Write a concise summary of the whole video.
+
+{text}
+
+CONCISE SUMMARY:"""
+
+LEVELS = ("video", "chapters", "sections")
+
+def _split_sections(transcript):
+    """Split a transcript into (text, start, end) sections"""
+    if isinstance(transcript, str):
+        transcript = Transcript.from_text(transcript)
+
+    if not transcript.is_timed:
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=SECTION_MAX_CHARS // 2,
+            chunk_overlap=0,
+            separators=[" ", ",", "\n"]
+        )
+        return [(t, None, None) for t in text_splitter.split_text(transcript.text)]
+
+    sections = []
+    parts, start, end, size = [], None, None, 0
+    for seg_start, seg_end, seg_text in transcript.segments():
+        if parts and (seg_end - start > SECTION_SECONDS or size + len(seg_text) > SECTION_MAX_CHARS):
+            sections.append(("".join(parts).strip(), start, end))
+            parts, size = [], 0
+        if not parts:
+            start = seg_start
+        parts.append(seg_text)
+        size += len(seg_text)
+        end = seg_end
+    if parts:
+        sections.append(("".join(parts).strip(), start, end))
+    return [s for s in sections if s[0]]
+
+def generate(llm, prompts):
+    """Run prompts through the LLM
+    Each prompt is its own background request on the shared scheduler, so it
+    is charged and retried on its own; without the scheduler they go in one
+    batched call.
+    """
+    if not prompts:
+        return []
+    if not scheduler.ENABLED:
+        result = llm.generate(prompts)
+        return [g[0].text.strip() for g in result.generations]
+    futures = [scheduler.submit(llm.invoke, prompt, tokens=len(prompt) // 4) for prompt in prompts]
+    return [future.result().strip() for future in futures]
+
+@traced("build_summary_tree")
+def build_summary_tree(transcript):
+    """Build section, chapter and video summaries once
+    Args:
+        transcript: Transcript (timed sections) or plain text
+    Returns:
+        JSON-serializable dict:
+        {"video": str, "chapters": [{"title", "start", "end", "summary",
+         "sections": [{"start", "end", "summary"}]}]}
+    """
+    llm = get_llm()
+
+    sections = _split_sections(transcript)
+    section_summaries = generate(llm, [SECTION_PROMPT.format(text=text) for text, _, _ in sections])
+
+    # Group consecutive sections into chapters
+    groups = [
+        list(range(i, min(i + SECTIONS_PER_CHAPTER, len(sections))))
+        for i in range(0, len(sections), SECTIONS_PER_CHAPTER)
+    ]
+    chapter_outputs = generate(llm, [
+        CHAPTER_PROMPT.format(text="\n\n".join(section_summaries[i] for i in group))
+        for group in groups
+    ])
+
+    chapters = []
+    for number, (group, output) in enumerate(zip(groups, chapter_outputs), start=1):
+        lines = output.split("\n", 1)
+        title = lines[0].strip().strip('"') if len(lines) > 1 else ""
+        summary = lines[1].strip() if len(lines) > 1 else output
+        chapters.append({
+            "title": title or f"Chapter {number}",
+            "start": sections[group[0]][1],
+            "end": sections[group[-1]][2],
+            "summary": summary,
+            "sections": [
+                {"start": sections[i][1], "end": sections[i][2], "summary": section_summaries[i]}
+                for i in group
+            ]
+        })
+
+    # A single chapter already summarizes the whole video
+    if len(chapters) > 1:
+        video = generate(llm, [VIDEO_PROMPT.format(
+            text="\n\n".join(f"{c['title']}: {c['summary']}" for c in chapters)
+        )])[0]
+    else:
+        video = chapters[0]["summary"] if chapters else ""
+
+    # Rough token estimate (~4 characters per token)
+    annotate(tokens=sum(len(text) for text, _, _ in sections) // 4)
+
+    return {"video": video, "chapters": chapters}
+
+def get_summary(tree, level="video"):
+    """Render a summary tree at a given level without any LLM calls
+    Args:
+        tree: Result of build_summary_tree
+        level: 'video', 'chapters' or 'sections'
+    """
+    def when(item):
+        if item.get("start") is None:
+            return ""
+        return f" [{format_timestamp(item['start'])}-{format_timestamp(item['end'])}]"
+
+    if level == "video":
+        return tree.get("video", "")
 
-    return summary 
\ No newline at end of file
+    lines = []
+    for chapter in tree.get("chapters", []):
+        lines.append(f"**{chapter['title']}**{when(chapter)}")
+        if level == "chapters":
+            lines.append(chapter["summary"])
+        else:
+            for section in chapter["sections"]:
+                lines.append(f"- {section['summary']}{when(section)}")
+        lines.append("")
+    return "\n".join(lines).strip()
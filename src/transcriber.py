@@ -1,8 +1,267 @@
-import whisper
-
-def transcribe_video(video_path):
-    
-    """Transcribe a video file using Whisper."""
-    model = whisper.load_model("base")
-    result = model.transcribe(video_path)
-    return result["text"] 
\ No newline at end of file
+import os
+import time
+import threading
+from functools import lru_cache
+from src import metrics, media_cache
+from src.metrics import traced, annotate
+from src.lazy import lazy_import
+from src.transcript import Transcript
+
+# Importing whisper pulls in torch, so defer it until the first transcription
+whisper = lazy_import("whisper")
+torch = lazy_import("torch")
+faster_whisper = lazy_import("faster_whisper")
+
+# openai-whisper (fp32 torch), whisper-int8 (torch dynamic int8 quantization)
+# or faster-whisper (CTranslate2 int8)
+BACKEND = os.getenv("WHISPER_BACKEND", "openai-whisper")
+
+# Model size, or 'auto' to pick one from the audio length
+MODEL_SIZE = os.getenv("WHISPER_MODEL", "base")
+
+# With 'auto', the first size whose limit covers the audio (longer audio gets
+# a smaller model so ingest time stays bounded)
+AUTO_SIZES = [(10 * 60, "small"), (60 * 60, "base"), (None, "tiny")]
+
+# Detect the spoken language from a short window before transcribing when
+# the result can change the model, unless WHISPER_LANGUAGE fixes it
+DETECT_LANGUAGE = os.getenv("WHISPER_DETECT_LANGUAGE", "1") != "0"
+LANGUAGE = os.getenv("WHISPER_LANGUAGE") or None
+DETECT_SECONDS = 30
+
+# Opt-in: English audio goes to the English-only variant of the same size
+# ("large" has none). It is no faster, and costs a separate detection pass and
+# a second loaded model, so it is off until WER numbers justify it
+ROUTE_ENGLISH = os.getenv("WHISPER_ROUTE_ENGLISH", "0") == "1"
+ENGLISH_MODELS = {"tiny": "tiny.en", "base": "base.en", "small": "small.en", "medium": "medium.en"}
+
+# CPU threads for quantized inference (0: library default)
+CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0"))
+
+SAMPLE_RATE = 16000
+
+# Whisper installs decoder hooks on the model during transcribe, so each loaded
+# model runs one transcription at a time; different models (sizes, backends)
+# run side by side
+_model_locks = {}
+_model_locks_lock = threading.Lock()
+
+# Audio and compute seconds per backend, for the real-time factor
+_usage = {}
+_usage_lock = threading.Lock()
+
+
+def model_lock(backend, size):
+    """Lock for inference on one loaded model, keyed like the model caches"""
+    with _model_locks_lock:
+        return _model_locks.setdefault((backend, size), threading.Lock())
+
+
+@lru_cache(maxsize=4)
+def get_whisper_model(name="base"):
+    """Load a Whisper model once per process"""
+    return whisper.load_model(name, device="cpu")
+
+
+def pick_model_size(duration, requested=None):
+    """Model size for a request: explicit, configured, or by audio length"""
+    size = requested or MODEL_SIZE
+    if size != "auto":
+        return size
+    for limit, auto_size in AUTO_SIZES:
+        if limit is None or duration <= limit:
+            return auto_size
+
+
+def routes(size):
+    """Whether knowing the language before decoding can change the model"""
+    return ROUTE_ENGLISH and size in ENGLISH_MODELS
+
+
+def route_model(size, language):
+    """Model to transcribe with once the language is known"""
+    if routes(size) and language == "en":
+        return ENGLISH_MODELS[size]
+    return size
+
+
+class OpenAIWhisperBackend:
+    """openai-whisper in fp32 on torch"""
+
+    name = "openai-whisper"
+
+    def load_audio(self, path):
+        return whisper.load_audio(path)
+
+    def load(self, size):
+        return get_whisper_model(size)
+
+    def detect_language(self, audio, size):
+        """(language, probability) from the first 30 s of audio"""
+        model = self.load(size)
+        if not model.is_multilingual:
+            return "en", 1.0
+        window = whisper.pad_or_trim(audio[:DETECT_SECONDS * SAMPLE_RATE])
+        mel = whisper.log_mel_spectrogram(window, model.dims.n_mels).to(model.device)
+        with model_lock(self.name, size):
+            _, probs = model.detect_language(mel)
+        language = max(probs, key=probs.get)
+        return language, float(probs[language])
+
+    def transcribe(self, audio, size, word_timestamps=False, language=None):
+        """Returns a whisper-style result dict"""
+        model = self.load(size)
+        with model_lock(self.name, size):
+            # fp16 is GPU-only; asking for it on CPU only produces a warning
+            return model.transcribe(audio, word_timestamps=word_timestamps, fp16=False, language=language)
+
+
+class QuantizedWhisperBackend(OpenAIWhisperBackend):
+    """openai-whisper with its Linear layers dynamically quantized to int8"""
+
+    name = "whisper-int8"
+
+    @lru_cache(maxsize=4)
+    def load(self, size):
+        model = whisper.load_model(size, device="cpu")
+        if CPU_THREADS:
+            torch.set_num_threads(CPU_THREADS)
+        # whisper subclasses nn.Linear, so its class has to be mapped explicitly
+        linear = whisper.model.Linear
+        return torch.quantization.quantize_dynamic(
+            model,
+            {linear: torch.quantization.default_dynamic_qconfig},
+            mapping={linear: torch.ao.nn.quantized.dynamic.Linear},
+            dtype=torch.qint8
+        )
+
+
+class FasterWhisperBackend:
+    """CTranslate2 Whisper (faster-whisper) with int8 weights on CPU"""
+
+    name = "faster-whisper"
+
+    def load_audio(self, path):
+        return faster_whisper.decode_audio(path, sampling_rate=SAMPLE_RATE)
+
+    @lru_cache(maxsize=4)
+    def load(self, size):
+        return faster_whisper.WhisperModel(size, device="cpu", compute_type="int8", cpu_threads=CPU_THREADS)
+
+    def detect_language(self, audio, size):
+        if size.endswith(".en"):
+            return "en", 1.0
+        model = self.load(size)
+        with model_lock(self.name, size):
+            language, probability, _ = model.detect_language(audio[:DETECT_SECONDS * SAMPLE_RATE])
+        return language, float(probability)
+
+    def transcribe(self, audio, size, word_timestamps=False, language=None):
+        model = self.load(size)
+        with model_lock(self.name, size):
+            segments, info = model.transcribe(audio, word_timestamps=word_timestamps, language=language)
+            # Segments are decoded lazily, so consume them under the lock
+            segments = [self._segment(s) for s in segments]
+        return {
+            "text": "".join(s["text"] for s in segments),
+            "segments": segments,
+            "language": info.language
+        }
+
+    def _segment(self, segment):
+        seg = {"start": segment.start, "end": segment.end, "text": segment.text}
+        if segment.words:
+            seg["words"] = [{"word": w.word, "start": w.start, "end": w.end} for w in segment.words]
+        return seg
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (OpenAIWhisperBackend(), QuantizedWhisperBackend(), FasterWhisperBackend())
+}
+
+
+def get_backend(name=None):
+    name = name or BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend {name!r}, expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name]
+
+
+def real_time_factors():
+    """Compute seconds per audio second for each backend used so far"""
+    with _usage_lock:
+        return {name: compute / audio for name, (audio, compute) in _usage.items() if audio}
+
+
+@lru_cache(maxsize=1)
+def _register_gauges():
+    metrics.register_gauge(
+        "videomind_transcription_real_time_factor", real_time_factors, label="backend",
+        help="Transcription compute seconds per second of audio"
+    )
+
+
+def detect_language(backend, audio, size, video_path=None):
+    """Spoken language of a video, cached with its media file
+    Returns:
+        Language code, or None to let the model detect it while decoding
+    """
+    if LANGUAGE:
+        return LANGUAGE
+    if video_path:
+        language = media_cache.metadata(video_path).get("language")
+        if language:
+            annotate(cache_hits=1)
+            return language
+    # Without routing a separate pass only repeats what the decoder does anyway
+    if not DETECT_LANGUAGE or not routes(size):
+        return None
+    language, probability = backend.detect_language(audio, size)
+    if video_path:
+        media_cache.update_metadata(video_path, language=language, language_probability=probability)
+    return language
+
+
+@traced("transcribe_video")
+def transcribe_video(video_path, word_timestamps=False, model_size=None, backend=None, language=None):
+    """Transcribe a video file using Whisper.
+    Args:
+        model_size: Whisper model size, or 'auto' (defaults to WHISPER_MODEL)
+        backend: Transcription backend name (defaults to WHISPER_BACKEND)
+        language: Spoken language if known (otherwise the one recorded with the
+            media, or detected)
+    Returns:
+        Transcript with segment (and optionally word) timestamps
+    """
+    _register_gauges()
+    backend = get_backend(backend)
+    audio = backend.load_audio(video_path)
+    duration = len(audio) / SAMPLE_RATE
+    size = pick_model_size(duration, model_size)
+
+    start = time.perf_counter()
+    language = language or detect_language(backend, audio, size, video_path)
+    size = route_model(size, language)
+    result = backend.transcribe(audio, size, word_timestamps=word_timestamps, language=language)
+    elapsed = time.perf_counter() - start
+    if not language and result.get("language"):
+        # Detected while decoding; recorded so a retranscription can pass it
+        language = result["language"]
+        media_cache.update_metadata(video_path, language=language)
+
+    with _usage_lock:
+        audio_total, compute_total = _usage.get(backend.name, (0.0, 0.0))
+        _usage[backend.name] = (audio_total + duration, compute_total + elapsed)
+
+    transcript = Transcript.from_whisper(result)
+
+    # Audio length covered by the transcript, for audio-seconds-per-second
+    annotate(
+        audio_seconds=transcript.duration,
+        backend=backend.name,
+        model=size,
+        language=language,
+        real_time_factor=round(elapsed / duration, 4) if duration else 0.0
+    )
+    return transcript
@@ -0,0 +1,267 @@
+import sys
+import struct
+from array import array
+from bisect import bisect_right
+
+# Binary layout (little-endian):
+#   header  MAGIC, version, flags, n_segments, n_words, text byte length
+#   text    UTF-8 buffer holding every segment's text back to back
+#   columns seg_start f32[n], seg_end f32[n], seg_offset u32[n+1],
+#           word_start f32[m], word_end f32[m], word_begin u32[m], word_stop u32[m]
+MAGIC = b"VMTR"
+VERSION = 1
+FLAG_WORDS = 1
+_HEADER = struct.Struct("<4sHHIII")
+
+
+def format_timestamp(seconds):
+    """Format seconds as M:SS or H:MM:SS"""
+    seconds = int(seconds or 0)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+
+def _to_le(column):
+    """Return column bytes in little-endian order"""
+    if sys.byteorder == "little":
+        return column.tobytes()
+    swapped = array(column.typecode, column)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def _from_le(typecode, data):
+    """Build an array from little-endian bytes"""
+    column = array(typecode)
+    column.frombytes(data)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column
+
+
+class Transcript:
+    """Timestamped transcript stored as compact columns
+
+    All segment text lives in one string buffer. Segments and (optional) words
+    point into it through offsets, and their start/end times are float32 arrays,
+    so a long video costs a few bytes per segment instead of a dict per segment.
+    """
+
+    __slots__ = ("text", "seg_start", "seg_end", "seg_offset",
+                 "word_start", "word_end", "word_begin", "word_stop")
+
+    def __init__(self, text="", seg_start=None, seg_end=None, seg_offset=None,
+                 word_start=None, word_end=None, word_begin=None, word_stop=None):
+        self.text = text
+        self.seg_start = seg_start if seg_start is not None else array("f")
+        self.seg_end = seg_end if seg_end is not None else array("f")
+        self.seg_offset = seg_offset if seg_offset is not None else array("I", [0])
+        self.word_start = word_start if word_start is not None else array("f")
+        self.word_end = word_end if word_end is not None else array("f")
+        self.word_begin = word_begin if word_begin is not None else array("I")
+        self.word_stop = word_stop if word_stop is not None else array("I")
+
+    @classmethod
+    def from_segments(cls, segments):
+        """Build from Whisper-style segment dicts (start, end, text, optional words)"""
+        parts = []
+        length = 0
+        t = cls()
+        for seg in segments:
+            seg_text = seg.get("text", "")
+            t.seg_start.append(seg.get("start", 0.0))
+            t.seg_end.append(seg.get("end", 0.0))
+
+            # Locate each word inside its segment's text
+            cursor = 0
+            for word in seg.get("words") or []:
+                token = word.get("word", "").strip()
+                pos = seg_text.find(token, cursor) if token else -1
+                if pos < 0:
+                    pos = cursor
+                cursor = pos + len(token)
+                t.word_start.append(word.get("start", 0.0))
+                t.word_end.append(word.get("end", 0.0))
+                t.word_begin.append(length + pos)
+                t.word_stop.append(length + min(cursor, len(seg_text)))
+
+            parts.append(seg_text)
+            length += len(seg_text)
+            t.seg_offset.append(length)
+        t.text = "".join(parts)
+        return t
+
+    @classmethod
+    def from_whisper(cls, result):
+        """Build from the dict returned by whisper's model.transcribe"""
+        segments = result.get("segments") or []
+        if not segments:
+            return cls.from_text(result.get("text", ""))
+        return cls.from_segments(segments)
+
+    @classmethod
+    def from_text(cls, text):
+        """Wrap plain text as a single untimed segment"""
+        return cls.from_segments([{"start": 0.0, "end": 0.0, "text": text or ""}])
+
+    def __len__(self):
+        return len(self.seg_start)
+
+    @property
+    def has_words(self):
+        return len(self.word_start) > 0
+
+    @property
+    def is_timed(self):
+        """True if segment times carry information"""
+        return len(self.seg_end) > 0 and max(self.seg_end) > 0
+
+    @property
+    def duration(self):
+        return float(self.seg_end[-1]) if len(self.seg_end) else 0.0
+
+    def segment(self, i):
+        """Return (start, end, text) for segment i"""
+        return (
+            float(self.seg_start[i]),
+            float(self.seg_end[i]),
+            self.text[self.seg_offset[i]:self.seg_offset[i + 1]]
+        )
+
+    def segments(self, start=0, stop=None):
+        """Iterate (start, end, text) over a range of segments"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for i in range(start, stop):
+            yield self.segment(i)
+
+    def words(self):
+        """Iterate (start, end, word) over word timestamps"""
+        for i in range(len(self.word_start)):
+            yield (
+                float(self.word_start[i]),
+                float(self.word_end[i]),
+                self.text[self.word_begin[i]:self.word_stop[i]]
+            )
+
+    def locate(self, offset):
+        """Index of the segment containing a character offset"""
+        return max(0, min(len(self) - 1, bisect_right(self.seg_offset, offset) - 1))
+
+    def chunks(self, chunk_size=1000, chunk_overlap=200):
+        """Group consecutive segments into chunks of about chunk_size characters
+        Returns:
+            List of (text, start, end) tuples; consecutive chunks share
+            roughly chunk_overlap characters of trailing segments.
+        """
+        chunks = []
+        n = len(self)
+        i = 0
+        while i < n:
+            j = i
+            size = 0
+            while j < n and (size == 0 or size + self.seg_offset[j + 1] - self.seg_offset[j] <= chunk_size):
+                size += self.seg_offset[j + 1] - self.seg_offset[j]
+                j += 1
+            text = self.text[self.seg_offset[i]:self.seg_offset[j]].strip()
+            if text:
+                chunks.append((text, float(self.seg_start[i]), float(self.seg_end[j - 1])))
+            if j >= n:
+                break
+
+            # Step back over trailing segments to build the overlap
+            back = j
+            overlap = 0
+            while back - 1 > i and overlap + self.seg_offset[back] - self.seg_offset[back - 1] <= chunk_overlap:
+                back -= 1
+                overlap += self.seg_offset[back + 1] - self.seg_offset[back]
+            i = back
+        return chunks
+
+    def to_dict(self):
+        """Whisper-style dict (for JSON export and comparisons)"""
+        segments = []
+        w = 0
+        for i in range(len(self)):
+            start, end, text = self.segment(i)
+            seg = {"start": start, "end": end, "text": text}
+            if self.has_words:
+                words = []
+                while w < len(self.word_start) and self.word_begin[w] < self.seg_offset[i + 1]:
+                    words.append({
+                        "word": self.text[self.word_begin[w]:self.word_stop[w]],
+                        "start": float(self.word_start[w]),
+                        "end": float(self.word_end[w])
+                    })
+                    w += 1
+                seg["words"] = words
+            segments.append(seg)
+        return {"text": self.text, "segments": segments}
+
+    def to_bytes(self):
+        """Serialize to the compact binary format"""
+        text = self.text.encode("utf-8")
+        flags = FLAG_WORDS if self.has_words else 0
+        parts = [
+            _HEADER.pack(MAGIC, VERSION, flags, len(self), len(self.word_start), len(text)),
+            text,
+            _to_le(self.seg_start),
+            _to_le(self.seg_end),
+            _to_le(self.seg_offset)
+        ]
+        if flags & FLAG_WORDS:
+            parts += [
+                _to_le(self.word_start),
+                _to_le(self.word_end),
+                _to_le(self.word_begin),
+                _to_le(self.word_stop)
+            ]
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Deserialize from the compact binary format
+        Raises:
+            ValueError: if data is not a complete transcript
+        """
+        if len(data) < _HEADER.size:
+            raise ValueError("Transcript file is truncated")
+        magic, version, flags, n, m, text_len = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a transcript file or unsupported version")
+        # Every column's length follows from the header, so a cut-off or padded
+        # file is caught here instead of yielding short arrays
+        expected = _HEADER.size + text_len + 4 * (3 * n + 1)
+        if flags & FLAG_WORDS:
+            expected += 4 * 4 * m
+        if len(data) != expected:
+            raise ValueError(f"Transcript file is {len(data)} bytes, expected {expected}")
+        pos = _HEADER.size
+
+        def take(typecode, count):
+            nonlocal pos
+            size = array(typecode).itemsize * count
+            column = _from_le(typecode, data[pos:pos + size])
+            pos += size
+            return column
+
+        text = bytes(data[pos:pos + text_len]).decode("utf-8")
+        pos += text_len
+        t = cls(text, take("f", n), take("f", n), take("I", n + 1))
+        if flags & FLAG_WORDS:
+            t.word_start = take("f", m)
+            t.word_end = take("f", m)
+            t.word_begin = take("I", m)
+            t.word_stop = take("I", m)
+        return t
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
@@ -0,0 +1,161 @@
+import os
+import re
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from src import utils
+from src.transcript import Transcript, format_timestamp
+
+# Characters of transcript shown per page
+PAGE_CHARS = int(os.getenv("TRANSCRIPT_PAGE_CHARS", "4000"))
+
+
+class _View:
+    """A stored transcript split into pages on segment boundaries"""
+
+    __slots__ = ("transcript", "page_starts")
+
+    def __init__(self, transcript, page_chars):
+        self.transcript = transcript
+        self.page_starts = _paginate(transcript, page_chars)
+
+
+def _paginate(transcript, page_chars):
+    """Character offsets where each page starts
+    Pages end on segment boundaries; a segment longer than a page (e.g. an
+    untimed transcript) is split on whitespace.
+    """
+    starts = array("I", [0])
+    text = transcript.text
+    offsets = transcript.seg_offset
+    page_start = 0
+    for i in range(len(transcript)):
+        seg_end = offsets[i + 1]
+        if seg_end - page_start <= page_chars:
+            continue
+        if offsets[i] > page_start:
+            page_start = offsets[i]
+            starts.append(page_start)
+        while seg_end - page_start > page_chars:
+            cut = text.rfind(" ", page_start + 1, page_start + page_chars)
+            page_start = cut if cut > page_start else page_start + page_chars
+            starts.append(page_start)
+    if len(starts) > 1 and starts[-1] >= len(text):
+        starts.pop()
+    return starts
+
+
+@lru_cache(maxsize=32)
+def _load(path, mtime, page_chars):
+    return _View(Transcript.load(path), page_chars)
+
+
+@lru_cache(maxsize=32)
+def _load_cached(url, mtime, page_chars):
+    """View of the plain transcript in a video's JSON cache entry, or None"""
+    cached = utils.load_from_cache(url)
+    if cached and cached.get('transcript'):
+        return _View(Transcript.from_text(cached['transcript']), page_chars)
+    return None
+
+
+@lru_cache(maxsize=32)
+def _wrap(transcript, page_chars):
+    # Keyed by identity: a held Transcript is never modified
+    return _View(transcript, page_chars)
+
+
+def _view(url, page_chars=None, transcript=None):
+    """Paginated view of a video's stored transcript, or None if it has none
+    Args:
+        transcript: Transcript held by the session instead of the cache
+            (videos restored from an archive are not written to it)
+    """
+    page_chars = page_chars or PAGE_CHARS
+    if transcript is not None:
+        return _wrap(transcript, page_chars)
+    path = utils.get_transcript_path(url)
+    if os.path.exists(path):
+        try:
+            # Keyed by mtime so a retranscribed video is reloaded
+            return _load(path, os.path.getmtime(path), page_chars)
+        except (OSError, ValueError) as e:
+            print(f"Error loading transcript for {url}: {str(e)}")
+    # Videos cached before .vmt files existed: the entry is only rewritten
+    # when its transcript changes, so its mtime stands for the content hash
+    path = utils.get_cache_path(url)
+    if os.path.exists(path):
+        return _load_cached(url, os.path.getmtime(path), page_chars)
+    return None
+
+
+def page_count(url, page_chars=None, transcript=None):
+    view = _view(url, page_chars, transcript)
+    return len(view.page_starts) if view else 0
+
+
+def page_of(url, offset, page_chars=None, transcript=None):
+    """Page (0-based) containing a character offset"""
+    view = _view(url, page_chars, transcript)
+    return max(0, bisect_right(view.page_starts, offset) - 1) if view else 0
+
+
+def get_page(url, page, highlight=None, page_chars=None, transcript=None):
+    """Markdown for one page of a transcript, with segment timestamps
+    Args:
+        page: 0-based page number (clamped to the available pages)
+        highlight: Search text to emphasise on the page
+    """
+    view = _view(url, page_chars, transcript)
+    if view is None:
+        return ""
+    t = view.transcript
+    page = max(0, min(page, len(view.page_starts) - 1))
+    start = view.page_starts[page]
+    stop = view.page_starts[page + 1] if page + 1 < len(view.page_starts) else len(t.text)
+
+    lines = []
+    i = t.locate(start)
+    while i < len(t) and t.seg_offset[i] < stop:
+        seg_start, _, _ = t.segment(i)
+        text = t.text[max(start, t.seg_offset[i]):min(stop, t.seg_offset[i + 1])].strip()
+        if text:
+            if highlight:
+                text = re.sub(f"({re.escape(highlight)})", r"**\1**", text, flags=re.IGNORECASE)
+            lines.append(f"`{format_timestamp(seg_start)}` {text}" if t.is_timed else text)
+        i += 1
+    return "\n\n".join(lines)
+
+
+def search(url, query, limit=50, context=60, page_chars=None, transcript=None):
+    """Find a phrase in a transcript
+    Returns:
+        List of dicts with offset, page, start (seconds) and a snippet
+    """
+    view = _view(url, page_chars, transcript)
+    if view is None or not query.strip():
+        return []
+    t = view.transcript
+    # Matched on the original text: lower() can change a string's length
+    # (e.g. "İ"), which would shift offsets taken from a lowered copy
+    pattern = re.compile(re.escape(query.strip()), re.IGNORECASE)
+    matches = []
+    for match in pattern.finditer(t.text):
+        if len(matches) >= limit:
+            break
+        pos = match.start()
+        segment = t.locate(pos)
+        snippet = t.text[max(0, pos - context):match.end() + context].replace("\n", " ").strip()
+        matches.append({
+            "offset": pos,
+            "page": max(0, bisect_right(view.page_starts, pos) - 1),
+            "start": float(t.seg_start[segment]) if t.is_timed else None,
+            "snippet": snippet
+        })
+    return matches
+
+
+def full_text(url, transcript=None):
+    """Whole transcript text, for copy and export"""
+    view = _view(url, transcript=transcript)
+    return view.transcript.text if view else ""
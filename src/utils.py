@@ -1,24 +1,65 @@
-import yt_dlp
 import warnings
-from langchain_community.vectorstores import Pinecone
-from langchain_openai import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from pinecone import Pinecone as PineconeClient
-from pinecone import ServerlessSpec
 import os
 import hashlib
 import json
+import time
+import threading
+import concurrent.futures
 from functools import lru_cache
+from src.metrics import traced, annotate
+from src.lazy import lazy_import, after_import
+from src.transcript import Transcript, format_timestamp
+from src import captions
+from src import scheduler
+from src import sessions
+from src import answer_cache
+from src import media_cache
+from src import dedup
+from src import admission
+from src.scheduler import scheduled_embeddings, INTERACTIVE, BACKGROUND
 
-warnings.filterwarnings("ignore")
+# Heavy dependencies are imported on first use to keep app startup fast
+yt_dlp = lazy_import("yt_dlp")
+Pinecone = lazy_import("langchain_community.vectorstores", "Pinecone")
+OpenAIEmbeddings = lazy_import("langchain_openai", "OpenAIEmbeddings")
+RecursiveCharacterTextSplitter = lazy_import("langchain.text_splitter", "RecursiveCharacterTextSplitter")
+PineconeClient = lazy_import("pinecone", "Pinecone")
+ServerlessSpec = lazy_import("pinecone", "ServerlessSpec")
 
-# Cache directory for processed videos
+@after_import
+def _ignore_warnings():
+    """Silence warnings; re-applied after lazy imports since LangChain resets its filters on import"""
+    warnings.filterwarnings("ignore")
+
+_ignore_warnings()
+
+# Cache directory for processed videos (created on first write)
 CACHE_DIR = "cache"
-os.makedirs(CACHE_DIR, exist_ok=True)
+
+# Dimension of OpenAI embeddings, and so of the index
+EMBEDDING_DIM = 1536
+
+# Upsert requests in flight when restoring precomputed vectors
+UPSERT_CONCURRENCY = int(os.getenv("PINECONE_CONCURRENCY", "4"))
+
+# Serializes metadata updates of shared vectors within this process
+_references_lock = threading.Lock()
+
+# Set once the Pinecone index is known to exist in this process
+_pinecone_ready = False
+_pinecone_lock = threading.Lock()
 
 
 def initialize_pinecone():
     """Initialize Pinecone index if it doesn't exist"""
+    if _pinecone_ready:
+        return
+    with _pinecone_lock:
+        if not _pinecone_ready:
+            _create_index()
+
+def _create_index():
+    global _pinecone_ready
     try:
         pc = PineconeClient()
         
@@ -29,7 +70,7 @@ def initialize_pinecone():
             # Create index with appropriate settings
             pc.create_index(
                 name="youtube-summarizer",
-                dimension=1536,  # OpenAI embeddings dimension
+                dimension=EMBEDDING_DIM,
                 metric="cosine",
                 spec=ServerlessSpec(
                     cloud="aws",  # AWS us-east-1 environment
@@ -37,6 +78,7 @@ def initialize_pinecone():
                 )
             )
             print("Created new Pinecone index: youtube-summarizer")
+        _pinecone_ready = True
     except Exception as e:
         print(f"Error initializing Pinecone: {str(e)}")
         raise e
@@ -50,12 +92,13 @@ def _safe_delete_operation(operation_func):
         if "404" not in str(e):
             print(f"Error deleting from Pinecone: {str(e)}")
 
-def delete_from_pinecone(session_id=None, url=None, delete_index=False):
+def delete_from_pinecone(namespace=None, url=None, delete_index=False, ids=None):
     """Delete vectors from Pinecone
     Args:
-        session_id: If provided, delete entire namespace
+        namespace: If provided, delete this namespace (only `url`'s or `ids`' vectors if given)
         url: If provided, delete vectors for specific URL
         delete_index: If True, delete all vectors from the index
+        ids: If provided, delete these vector IDs
     """
     try:
         # Initialize Pinecone client
@@ -70,17 +113,23 @@ def delete_from_pinecone(session_id=None, url=None, delete_index=False):
             _safe_delete_operation(
                 lambda: index.delete(delete_all=True)
             )
-        elif session_id:
-            _safe_delete_operation(
-                lambda: index.delete(delete_all=True, namespace=session_id)
-            )
+        elif ids:
+            # Pinecone deletes at most 1000 IDs per request
+            for i in range(0, len(ids), 1000):
+                _safe_delete_operation(
+                    lambda batch=ids[i:i + 1000]: index.delete(ids=batch, namespace=namespace)
+                )
         elif url:
             _safe_delete_operation(
                 lambda: index.delete(
                     filter={"source": url},
-                    namespace=session_id
+                    namespace=namespace
                 )
             )
+        elif namespace:
+            _safe_delete_operation(
+                lambda: index.delete(delete_all=True, namespace=namespace)
+            )
     except Exception as e:
         # Only print error if it's not a 404
         if "404" not in str(e):
@@ -89,24 +138,110 @@ def delete_from_pinecone(session_id=None, url=None, delete_index=False):
 def cleanup_pinecone():
     """Clean up the entire Pinecone index"""
     delete_from_pinecone(delete_index=True)
+    # Nothing is embedded any more; sessions re-add (or restore) their videos
+    sessions.forget_videos()
 
-def generate_session_id(urls):
-    """Generate a unique session ID from list of URLs"""
-    urls_str = "".join(sorted(urls))  # Sort to ensure same ID for same URLs regardless of order
-    return hashlib.md5(urls_str.encode()).hexdigest()
+def fetch_vectors(ids, namespace=sessions.VECTOR_NAMESPACE):
+    """Fetch stored vectors by ID
+    Returns:
+        Dict of ID -> (values, metadata) for the IDs that exist
+    """
+    initialize_pinecone()
+    index = PineconeClient().Index("youtube-summarizer")
+    found = {}
+    # IDs travel in the query string, so fetch a few hundred at a time
+    for i in range(0, len(ids), 200):
+        response = index.fetch(ids=ids[i:i + 200], namespace=namespace)
+        for id_, vector in response.vectors.items():
+            found[id_] = (vector.values, vector.metadata or {})
+    return found
 
-def cleanup_temp_files(urls, session_id=None):
-    """Clean up temporary video files and optionally Pinecone vectors"""
-    # Clean up temp files
-    for url in urls:
-        url_hash = hashlib.md5(url.encode()).hexdigest()
-        filename = f"temp_video_{url_hash}.mp4"
-        if os.path.exists(filename):
-            os.remove(filename)
+def upsert_vectors(vectors, namespace=sessions.VECTOR_NAMESPACE, batch_size=100):
+    """Bulk upsert precomputed (id, values, metadata) vectors, several requests in flight"""
+    initialize_pinecone()
+    index = PineconeClient().Index("youtube-summarizer")
+    batches = [vectors[i:i + batch_size] for i in range(0, len(vectors), batch_size)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=UPSERT_CONCURRENCY) as pool:
+        list(pool.map(lambda batch: index.upsert(vectors=batch, namespace=namespace), batches))
+
+def update_references(references):
+    """Point shared vectors at the chunks (and videos) that now use them
+    Args:
+        references: Vector ID -> list of dedup chunk references
+    """
+    initialize_pinecone()
+    index = PineconeClient().Index("youtube-summarizer")
     
-    # Clean up Pinecone vectors if session_id provided
+    def update(item):
+        id_, refs = item
+        vids = list(dict.fromkeys(ref.split("|", 1)[0] for ref in refs))
+        index.update(
+            id=id_,
+            set_metadata={"video_id": vids, "refs": refs},
+            namespace=sessions.VECTOR_NAMESPACE
+        )
+    with concurrent.futures.ThreadPoolExecutor(max_workers=UPSERT_CONCURRENCY) as pool:
+        list(pool.map(update, references.items()))
+
+def delete_video_vectors(vid, ids, shared=None):
+    """Delete an orphaned video's vectors by ID (serverless indexes can't delete by filter)
+    Args:
+        ids: Vectors no other video uses
+        shared: Vector ID -> remaining references, for vectors other videos still use
+    """
+    delete_from_pinecone(namespace=sessions.VECTOR_NAMESPACE, ids=ids)
+    if shared:
+        with _references_lock:
+            update_references(shared)
+
+def end_session(session_id):
+    """Drop a session's video references; videos no other session uses are deleted"""
+    sessions.end_session(session_id, on_orphan=delete_video_vectors)
+
+def remove_video_from_session(session_id, url):
+    """Remove one video from a session without touching its other videos"""
+    vid = sessions.video_id(url)
+    # A video restored from an archive is stored for this session only
+    for id_ in (vid, sessions.private_video_id(vid, session_id)):
+        sessions.detach(session_id, id_, on_orphan=delete_video_vectors)
+
+def expire_sessions():
+    """End sessions that have been idle longer than sessions.SESSION_TTL"""
+    return sessions.expire_sessions(on_orphan=delete_video_vectors)
+
+def start_session_expiry(interval=None):
+    """Expire idle sessions now and every `interval` seconds from a daemon thread
+    (defaults to sessions.EXPIRY_INTERVAL)"""
+    interval = interval or sessions.EXPIRY_INTERVAL
+
+    def run():
+        while True:
+            try:
+                expire_sessions()
+            except Exception as e:
+                print(f"Error expiring sessions: {str(e)}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="videomind-session-expiry", daemon=True)
+    thread.start()
+    return thread
+
+def generate_session_id():
+    """Generate a new per-user session ID
+    IDs are random: two users loading the same videos must not share a session.
+    """
+    return sessions.new_session_id()
+
+def content_hash(text):
+    """Stable hash of a transcript's content"""
+    return hashlib.sha256((text or "").encode()).hexdigest()[:16]
+
+def cleanup_temp_files(urls, session_id=None):
+    """Release a session's vectors; downloaded media stays in the media cache
+    (bounded by MEDIA_CACHE_MAX_MB) so videos can be retranscribed"""
+    # Release the session's vectors if session_id provided
     if session_id:
-        delete_from_pinecone(session_id=session_id)
+        end_session(session_id)
 
 def get_cache_path(url):
     """Get cache file path for a URL"""
@@ -115,6 +250,7 @@ def get_cache_path(url):
 
 def save_to_cache(url, data):
     """Save processed data to cache"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
     cache_path = get_cache_path(url)
     with open(cache_path, 'w') as f:
         json.dump(data, f)
@@ -127,36 +263,64 @@ def load_from_cache(url):
             return json.load(f)
     return None
 
-def download_mp4_from_youtube(url):
-    """Download a YouTube video as MP4."""
-    # Check cache first
-    cached_data = load_from_cache(url)
-    if cached_data:
-        return cached_data.get('filename')
+def update_cache(url, **fields):
+    """Merge fields into an existing cache entry"""
+    data = load_from_cache(url) or {}
+    data.update(fields)
+    save_to_cache(url, data)
 
-    # Create unique filename based on URL
+def get_transcript_path(url):
+    """Get path of the binary timestamped transcript for a URL"""
     url_hash = hashlib.md5(url.encode()).hexdigest()
-    filename = f"temp_video_{url_hash}.mp4"
-    
+    return os.path.join(CACHE_DIR, f"{url_hash}.vmt")
+
+def save_transcript(url, transcript):
+    """Save a timestamped transcript next to the JSON cache entry"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    transcript.save(get_transcript_path(url))
+
+def load_transcript(url):
+    """Load a timestamped transcript from cache, or None if missing or unreadable"""
+    path = get_transcript_path(url)
+    if not os.path.exists(path):
+        return None
+    try:
+        return Transcript.load(path)
+    except (OSError, ValueError) as e:
+        print(f"Error loading transcript for {url}: {str(e)}")
+        return None
+
+def _ytdlp_download(url, path):
+    """Download with yt-dlp, continuing a partial file left by an earlier attempt"""
     ydl_opts = {
         'format': 'worst[ext=mp4]', 
-        'outtmpl': filename,
+        'outtmpl': path,
         'quiet': True,
-        'nocheckcertificate': True
+        'nocheckcertificate': True,
+        'continuedl': True,
+        'retries': 10,
+        'fragment_retries': 10
     }
 
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         result = ydl.extract_info(url, download=True)
-    
-    # Cache the result
-    save_to_cache(url, {'filename': filename})
-    return filename
+    return result.get('filesize') if result else None
+
+@traced("download_mp4_from_youtube")
+def download_mp4_from_youtube(url):
+    """Download a YouTube video as MP4 into the media cache
+    Returns:
+        media_cache.Pin of the file; `with download_mp4_from_youtube(url) as path:`
+        keeps it from being evicted until the block ends
+    """
+    return media_cache.fetch(url, _ytdlp_download)
 
 @lru_cache(maxsize=100)
 def get_embeddings():
     """Cached embeddings instance"""
-    return OpenAIEmbeddings()
+    return OpenAIEmbeddings(max_retries=scheduler.CLIENT_RETRIES)
 
+@traced("get_video_info")
 def get_video_info(url):
     """Get video title and other info from YouTube URL"""
     ydl_opts = {
@@ -170,21 +334,86 @@ def get_video_info(url):
             info = ydl.extract_info(url, download=False)
             return {
                 'title': info.get('title', 'Untitled Video'),
-                'url': url
+                'url': url,
+                # Seconds; budgets transcription before anything is downloaded
+                'duration': info.get('duration')
             }
         except Exception as e:
+            annotate(error=type(e).__name__)
             print(f"Error getting video info: {str(e)}")
             return {
                 'title': 'Untitled Video',
                 'url': url
             }
 
-def process_video(url, transcribe_func):
-    """Process a single video - download and transcribe"""
+def load_cached_result(url):
+    """Return the cached processing result for a URL (without title refresh), or None"""
+    cached_data = load_from_cache(url)
+    if cached_data and 'transcript' in cached_data:
+        cached_data['timed_transcript'] = (
+            load_transcript(url) or Transcript.from_text(cached_data['transcript'])
+        )
+        return cached_data
+    return None
+
+def get_caption_transcript(url, policy):
+    """Try YouTube captions under a transcript policy
+    Returns:
+        (transcript or None, source or None, caption Transcript or None, extra cache fields)
+    """
+    extra = {}
+    if captions.check_policy(policy) == "whisper":
+        return None, None, None, extra
+    try:
+        caption_transcript, kind, info = captions.fetch_captions(url)
+    except Exception as e:
+        print(f"Error fetching captions for {url}: {str(e)}")
+        return None, None, None, extra
+    if caption_transcript is None:
+        return None, None, None, extra
+    quality = captions.caption_quality(caption_transcript, info.get('duration'))
+    extra['caption_quality'] = quality
+    if policy == "prefer_captions" and captions.is_good_enough(quality):
+        return caption_transcript, f"captions-{kind}", caption_transcript, extra
+    return None, None, caption_transcript, extra
+
+def finish_result(url, transcript, title, source, extra=None):
+    """Cache a finished transcript and return the processing result"""
+    if isinstance(transcript, str):
+        transcript = Transcript.from_text(transcript)
+    
+    # Cache the result with title; segments go to a compact binary file
+    result = dict(extra or {})
+    result.update({
+        'transcript': transcript.text,
+        'title': title,
+        'transcript_source': source,
+        'content_hash': content_hash(transcript.text)
+    })
+    # A changed transcript makes answers given from the old one stale
+    previous = load_from_cache(url)
+    if previous and previous.get('content_hash') != result['content_hash']:
+        answer_cache.invalidate_video(previous.get('content_hash'))
+    save_transcript(url, transcript)
+    save_to_cache(url, result)
+    result['timed_transcript'] = transcript
+    return result
+
+@traced("process_video")
+def process_video(url, transcribe_func, policy=None, session_id=None):
+    """Process a single video - fetch captions or download and transcribe
+    Args:
+        url: YouTube video URL
+        transcribe_func: Whisper transcription function (video path -> transcript)
+        policy: 'prefer_captions', 'whisper' or 'compare' (defaults to TRANSCRIPT_POLICY)
+        session_id: User the transcription is queued for (see src.admission)
+    """
+    policy = captions.check_policy(policy or captions.TRANSCRIPT_POLICY)
     try:
         # Check cache first
-        cached_data = load_from_cache(url)
-        if cached_data and 'transcript' in cached_data:
+        cached_data = load_cached_result(url)
+        if cached_data:
+            annotate(cache_hits=1)
             # Get video info even for cached videos
             video_info = get_video_info(url)
             cached_data['title'] = video_info['title']
@@ -193,97 +422,212 @@ def process_video(url, transcribe_func):
         # Get video info
         video_info = get_video_info(url)
         
-        # Download and transcribe
-        video_path = download_mp4_from_youtube(url)
-        transcript = transcribe_func(video_path)
+        # Try YouTube captions before paying for Whisper
+        transcript, source, caption_transcript, extra = get_caption_transcript(url, policy)
         
-        # Cache the result with title
-        result = {
-            'transcript': transcript,
-            'title': video_info['title']
-        }
-        save_to_cache(url, result)
+        if transcript is None:
+            # Download and transcribe (the media stays cached for retranscription)
+            # once the audio fits in the shared budget
+            with admission.get_controller().admit(session_id or "anonymous", admission.estimate(video_info), url):
+                with download_mp4_from_youtube(url) as video_path:
+                    transcript = transcribe_func(video_path)
+            # Language detected during transcription is recorded with the media
+            language = media_cache.metadata(video_path).get('language')
+            if language:
+                extra['language'] = language
+            if isinstance(transcript, str):
+                transcript = Transcript.from_text(transcript)
+            source = "whisper"
+            if caption_transcript is not None:
+                extra['caption_agreement'] = captions.agreement(caption_transcript.text, transcript.text)
         
-        # Cleanup
-        if os.path.exists(video_path):
-            os.remove(video_path)
-            
-        return url, result
+        return url, finish_result(url, transcript, video_info['title'], source, extra)
     except Exception as e:
+        annotate(error=type(e).__name__)
         print(f"Error processing {url}: {str(e)}")
         return url, None
 
-def create_vector_store(texts_dict):
-    """Create vector store from multiple video transcripts
+def _split_transcript(url, text):
+    """Chunk one transcript into (texts, metadatas)"""
+    if isinstance(text, Transcript) and text.is_timed:
+        timed_chunks = text.chunks(chunk_size=1000, chunk_overlap=200)
+        texts = [chunk for chunk, _, _ in timed_chunks]
+        metadatas = [
+            {"source": url, "chunk": i, "start": start, "end": end}
+            for i, (_, start, end) in enumerate(timed_chunks)
+        ]
+    else:
+        if isinstance(text, Transcript):
+            text = text.text
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1000,
+            chunk_overlap=200,
+            length_function=len
+        )
+        texts = text_splitter.split_text(text)
+        metadatas = [{"source": url, "chunk": i} for i in range(len(texts))]
+    return texts, metadatas
+
+def _embed_video(vid, url, text):
+    """Embed one video's chunks into the shared namespace"""
+    texts, metadatas = _split_transcript(url, text)
+    return store_chunks(vid, url, texts, metadatas)
+
+def store_chunks(vid, url, texts, metadatas, vectors=None, share=True):
+    """Store one video's chunks in the shared namespace and register the video
+    Near-duplicates of stored chunks (or of the video's own earlier chunks)
+    are not stored; the stored vector gains a reference to them instead.
     Args:
-        texts_dict: Dictionary mapping video URLs to their transcripts
+        vectors: Precomputed embeddings of the chunks (embedded here if omitted)
+        share: Match chunks against other videos' vectors and offer them for
+            matching in turn (off for vectors only one session may use)
     """
-    # Ensure Pinecone index exists
-    initialize_pinecone()
+    for metadata in metadatas:
+        metadata["video_id"] = vid
     
-    # Create text splitter
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len
-    )
+    share = share and dedup.ENABLED
+    duplicates, references = {}, {}
+    if share:
+        signatures, chunk_refs, matches = dedup.find_duplicates(vid, url, texts, metadatas)
+        duplicates, references = sessions.share_vectors(vid, matches)
+        # Vectors about to be stored for this video carry their references from the start
+        for i, metadata in enumerate(metadatas):
+            refs = references.get(f"{vid}-{i}")
+            if refs:
+                metadata.update({"video_id": [vid], "refs": refs})
+    keep = [i for i in range(len(texts)) if i not in duplicates]
+    ids = sessions.vector_ids(vid, len(texts))
     
-    # Process all texts
-    all_texts = []
-    all_metadatas = []
+    # Rough token estimate (~4 characters per token)
+    annotate(tokens=sum(len(texts[i]) for i in keep) // 4, duplicates=len(duplicates))
     
-    # Batch process texts
-    for url, text in texts_dict.items():
-        if text:  # Skip failed transcripts
-            chunks = text_splitter.split_text(text)
-            all_texts.extend(chunks)
-            metadatas = [{"source": url, "chunk": i} for i in range(len(chunks))]
-            all_metadatas.extend(metadatas)
+    # Background priority: batched with other sessions' ingest traffic
+    embeddings = scheduled_embeddings(get_embeddings(), BACKGROUND)
     
-    # Get cached embeddings
-    embeddings = get_embeddings()
+    vectorstore = None
+    if keep and vectors is not None:
+        upsert_vectors([(ids[i], list(map(float, vectors[i])), dict(metadatas[i], text=texts[i])) for i in keep])
+    elif keep:
+        # Deterministic IDs make a repeated embed (e.g. from another process) an overwrite
+        vectorstore = Pinecone.from_texts(
+            texts=[texts[i] for i in keep],
+            embedding=embeddings,
+            metadatas=[metadatas[i] for i in keep],
+            ids=[ids[i] for i in keep],
+            index_name="youtube-summarizer",
+            namespace=sessions.VECTOR_NAMESPACE,
+            batch_size=100  # Process in larger batches
+        )
+    if vectorstore is None:
+        # Nothing embedded here (precomputed vectors, or a re-upload whose every chunk is shared)
+        vectorstore = Pinecone.from_existing_index(
+            index_name="youtube-summarizer",
+            embedding=embeddings,
+            namespace=sessions.VECTOR_NAMESPACE
+        )
     
-    # Generate session ID from all URLs
-    session_id = generate_session_id(list(texts_dict.keys()))
+    # Other videos' vectors now also stand for chunks of this one
+    others = [id_ for id_ in references if not id_.startswith(f"{vid}-")]
+    if others:
+        with _references_lock:
+            update_references(sessions.shared_references(others))
+    sessions.register_video(vid, url, len(texts), duplicates)
+    if share:
+        dedup.record(vid, signatures, chunk_refs, keep)
+    return vectorstore
+
+@traced("create_vector_store")
+def create_vector_store(texts_dict, session_id=None):
+    """Add video transcripts to a session's vector set
+    Each video is embedded once and shared, reference-counted, by every
+    session that loads it; adding an already-known video only records a reference.
+    Args:
+        texts_dict: Dictionary mapping video URLs to their transcripts
+            (plain text or Transcript; timed transcripts add start/end
+            times to each chunk's metadata)
+        session_id: Session to add the videos to (a new one if omitted)
+    Returns:
+        (vectorstores, session_id) where vectorstores maps the IDs of videos
+        embedded by this call to their stores
+    """
+    # Ensure Pinecone index exists
+    initialize_pinecone()
     
-    # Create vector store with batched operations
-    vectorstore = Pinecone.from_texts(
-        texts=all_texts,
-        embedding=embeddings,
-        metadatas=all_metadatas,
-        index_name="youtube-summarizer",
-        namespace=session_id,
-        batch_size=100  # Process in larger batches
-    )
+    session_id = session_id or generate_session_id()
     
-    return vectorstore, session_id
+    vectorstores = {}
+    for url, text in texts_dict.items():
+        if not text:  # Skip failed transcripts
+            continue
+        vid = sessions.video_id(url)
+        with sessions.video_lock(vid):
+            # Checked and referenced in one registry update: between a separate
+            # check and attach, the last other session could drop the video
+            if sessions.attach(session_id, [vid]):
+                vectorstores[vid] = _embed_video(vid, url, text)
+                sessions.attach(session_id, [vid])
+            else:
+                annotate(cache_hits=1)
+    
+    return vectorstores, session_id
+
+def _chunk_sources(metadata, vids):
+    """(url, start, end) of each of the session's chunks a retrieved vector stands for"""
+    sources = []
+    for ref in metadata.get('refs', []):
+        vid, url, start, end = dedup.parse_reference(ref)
+        if vid in vids:
+            sources.append((url, start, end))
+    return sources or [(metadata.get('source', 'Unknown source'), metadata.get('start'), metadata.get('end'))]
 
-def get_video_context(query, session_id):
-    """Get relevant context from vector store for a query"""
+def _cite(url, start, end):
+    if start is None:
+        return f"({url})"
+    return f"({url}) at [{format_timestamp(start)}-{format_timestamp(end)}]"
+
+def embed_query(query):
+    """Embed a chat question (interactive, ahead of ingest batches)"""
+    return scheduled_embeddings(get_embeddings(), INTERACTIVE).embed_query(query)
+
+@traced("get_video_context")
+def get_video_context(query, session_id, k=10, query_vector=None):
+    """Get relevant context from the session's videos for a query
+    Args:
+        query_vector: Embedding of the query, if the caller already has one
+    """
     # Ensure Pinecone index exists
     initialize_pinecone()
     
-    # Use cached embeddings
-    embeddings = get_embeddings()
+    vids = sessions.session_videos(session_id)
+    if not vids:
+        return ""
+    
+    # Query embeddings are interactive and jump ahead of ingest batches
+    embeddings = scheduled_embeddings(get_embeddings(), INTERACTIVE)
     
     # Create vector store
     vectorstore = Pinecone.from_existing_index(
         index_name="youtube-summarizer",
         embedding=embeddings,
-        namespace=session_id
+        namespace=sessions.VECTOR_NAMESPACE
     )
     
-    # Search for relevant context
-    relevant_docs = vectorstore.similarity_search(
-        query,
-        k=10
+    # The session is a view: one search restricted to its videos
+    if query_vector is None:
+        query_vector = embeddings.embed_query(query)
+    relevant_docs = vectorstore.similarity_search_by_vector(
+        query_vector,
+        k=k,
+        filter={"video_id": {"$in": vids}}
     )
     
     # Combine relevant texts with source information
     contexts = []
     for doc in relevant_docs:
-        source_url = doc.metadata.get('source', 'Unknown source')
-        context = f"From video ({source_url}):\n{doc.page_content}"
-        contexts.append(context)
+        cited = [_cite(url, start, end) for url, start, end in _chunk_sources(doc.metadata, vids)]
+        context = f"From video {cited[0]}"
+        if len(cited) > 1:
+            context += ", also " + ", ".join(cited[1:])
+        contexts.append(f"{context}:\n{doc.page_content}")
     
     return "\n\n".join(contexts) 
\ No newline at end of file
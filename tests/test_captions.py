@@ -0,0 +1,99 @@
+"""Caption parsing and the caption-or-Whisper fallback, against benchmarks/fixtures/captions"""
+import os
+
+import pytest
+
+from benchmarks.caption_ingest import (
+    AUTO_LINES, AUTO_WORDS, CAPTIONS_DIR, CASES, LINES, check_parse, check_result, resolve
+)
+from benchmarks.fakes import install_fakes, make_fake_transcriber
+from src import captions
+
+# Length of the speech in the fixtures
+FIXTURE_SECONDS = 25.5
+
+
+def read(name):
+    with open(os.path.join(CAPTIONS_DIR, name), "r") as f:
+        return f.read()
+
+
+def assert_segments(transcript, expected):
+    segments = [(start, end, text.strip()) for start, end, text in transcript.segments()]
+    assert [text for _, _, text in segments] == [text for _, _, text in expected]
+    for (start, end, _), (want_start, want_end, _) in zip(segments, expected):
+        assert start == pytest.approx(want_start, abs=1e-3)
+        assert end == pytest.approx(want_end, abs=1e-3)
+
+
+@pytest.mark.parametrize("name, ext", [("manual.en.srv3", "srv3"), ("manual.en.srv1", "srv1")])
+def test_parse_srv(name, ext):
+    assert_segments(captions.parse_captions(read(name), ext), LINES)
+
+
+def test_parse_auto_vtt_drops_rolling_repeats():
+    assert_segments(captions.parse_captions(read("auto.en.vtt"), "vtt"), AUTO_LINES)
+
+
+def test_parse_auto_vtt_inline_word_timings():
+    transcript = captions.parse_captions(read("auto.en.vtt"), "vtt")
+    words = list(transcript.words())[:len(AUTO_WORDS)]
+    assert [word for _, _, word in words] == [word for _, _, word in AUTO_WORDS]
+    for (start, end, _), (want_start, want_end, _) in zip(words, AUTO_WORDS):
+        assert start == pytest.approx(want_start, abs=1e-3)
+        assert end == pytest.approx(want_end, abs=1e-3)
+
+
+@pytest.mark.parametrize("case", [case for case, spec in CASES.items() if spec["tracks"]])
+def test_fixtures_parse_as_expected(case):
+    assert check_parse(case, CASES[case]) == []
+
+
+def test_parse_unknown_format():
+    with pytest.raises(ValueError):
+        captions.parse_captions(read("auto.en.vtt"), "ttml")
+
+
+def test_pick_track_prefers_best_parseable_format():
+    tracks = {"en": [{"ext": "srv1"}, {"ext": "json3"}, {"ext": "srv3"}]}
+    assert captions._pick_track(tracks, ("en",)) == ("en", {"ext": "srv3"})
+    assert captions._pick_track({"en": [{"ext": "json3"}]}, ("en",)) == (None, None)
+    assert captions._pick_track({"en-GB": [{"ext": "vtt"}]}, ("en", "en-GB")) == ("en-GB", {"ext": "vtt"})
+
+
+@pytest.mark.parametrize("name, ext, good", [
+    ("manual.en.srv3", "srv3", True),
+    ("auto.en.vtt", "vtt", True),
+    ("sparse.en.vtt", "vtt", False)
+])
+def test_quality_bar(name, ext, good):
+    transcript = captions.parse_captions(read(name), ext)
+    assert captions.is_good_enough(captions.caption_quality(transcript, FIXTURE_SECONDS)) is good
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        captions.check_policy("captions_only")
+
+
+def test_fetch_falls_back_to_auto_captions(tmp_path):
+    tracks = resolve({
+        "subtitles": {"fr": [("vtt", "auto.en.vtt")]},
+        "automatic_captions": {"en": [("vtt", "auto.en.vtt")]}
+    })
+    with install_fakes(str(tmp_path), audio_seconds=FIXTURE_SECONDS, caption_tracks=tracks):
+        transcript, kind, _ = captions.fetch_captions("https://www.youtube.com/watch?v=fallback")
+    assert kind == "auto"
+    assert_segments(transcript, AUTO_LINES)
+
+
+@pytest.mark.parametrize("policy", captions.POLICIES)
+@pytest.mark.parametrize("case", list(CASES))
+def test_process_video_source(case, policy, tmp_path):
+    from src.utils import process_video
+    spec = CASES[case]
+    transcribe = make_fake_transcriber(realtime_factor=1000)
+    with install_fakes(str(tmp_path), audio_seconds=FIXTURE_SECONDS, caption_tracks=resolve(spec["tracks"])):
+        _, result = process_video(f"https://www.youtube.com/watch?v={case.replace(' ', '-')}", transcribe, policy=policy)
+    assert result is not None
+    assert check_result(case, spec, policy, result) == []
@@ -0,0 +1,126 @@
+"""Restoring uploaded session archives: checks, and isolation from shared state"""
+import json
+import struct
+
+import pytest
+
+from benchmarks.fakes import install_fakes
+from benchmarks.sessions_load import make_videos
+
+
+@pytest.fixture
+def exported(tmp_path):
+    """A two-video session exported to an archive, then the cache and index wiped"""
+    import shutil
+    from src import utils, sessions, snapshot
+    with install_fakes(str(tmp_path)):
+        pool = make_videos(2, 300)
+        for url, transcript in pool.items():
+            utils.finish_result(url, transcript, url, "whisper")
+        session_id = sessions.new_session_id()
+        utils.create_vector_store(pool, session_id)
+        path = str(tmp_path / "session.vmss")
+        snapshot.export_session(session_id, list(pool), path)
+        utils.cleanup_pinecone()
+        shutil.rmtree(utils.CACHE_DIR)
+        yield path, pool
+
+
+def rewrite_manifest(path, change):
+    """Edit an archive's manifest in place"""
+    from src.snapshot import _HEADER
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, flags, offset, length = _HEADER.unpack_from(data, 0)
+    manifest = json.loads(data[offset:offset + length])
+    change(manifest)
+    body = json.dumps(manifest).encode("utf-8")
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(magic, version, flags, offset, len(body)) + data[_HEADER.size:offset] + body)
+
+
+def test_restore_is_private(exported):
+    from src import utils, sessions, snapshot
+    path, pool = exported
+    session_id, videos, private, corpus = snapshot.restore_session(path)
+    assert set(videos) == set(private) == set(pool)
+    assert corpus is None
+    for url in pool:
+        vid = sessions.video_id(url)
+        assert utils.load_from_cache(url) is None
+        assert not sessions.is_embedded(vid)
+        assert sessions.private_video_id(vid, session_id) in sessions.session_videos(session_id)
+
+
+def test_restore_keeps_cached_entry(exported):
+    from src import utils, sessions, snapshot
+    path, pool = exported
+    url = next(iter(pool))
+    utils.finish_result(url, pool[url], "Cached title", "whisper")
+    before = utils.load_from_cache(url)
+    session_id, videos, private, _ = snapshot.restore_session(path)
+    assert url not in private
+    assert videos[url] == before
+    assert utils.load_from_cache(url) == before
+    assert sessions.video_id(url) in sessions.session_videos(session_id)
+
+
+def test_restore_detaches_private_video(exported):
+    from src import utils, sessions, snapshot
+    path, pool = exported
+    session_id, _, _, _ = snapshot.restore_session(path)
+    for url in pool:
+        utils.remove_video_from_session(session_id, url)
+    assert sessions.session_videos(session_id) == []
+    assert sessions.snapshot()["videos"] == {}
+
+
+def test_restore_ignores_archived_video_id(exported):
+    from src import sessions, snapshot
+    path, pool = exported
+
+    def point_elsewhere(manifest):
+        for video in manifest["videos"]:
+            video["vid"] = "../../elsewhere"
+    rewrite_manifest(path, point_elsewhere)
+    session_id, _, _, _ = snapshot.restore_session(path)
+    expected = {sessions.private_video_id(sessions.video_id(url), session_id) for url in pool}
+    assert set(sessions.session_videos(session_id)) == expected
+
+
+@pytest.mark.parametrize("change", [
+    lambda m: m["videos"][0]["cache"].update(content_hash="0" * 32),
+    lambda m: m.update(dim=768),
+    lambda m: m["sections"]["vectors"].__setitem__(1, 10 ** 12),
+    lambda m: m["videos"][0].update(chunks=10 ** 6),
+    lambda m: m["videos"][0].pop("transcript"),
+    lambda m: m.update(sections=None)
+], ids=["content hash", "dimension", "section range", "chunk range", "missing field", "wrong type"])
+def test_restore_rejects_bad_manifest(exported, change):
+    from src import utils, sessions, snapshot
+    path, pool = exported
+    rewrite_manifest(path, change)
+    with pytest.raises(ValueError):
+        snapshot.restore_session(path)
+    assert sessions.snapshot()["videos"] == {}
+    assert all(utils.load_from_cache(url) is None for url in pool)
+
+
+@pytest.mark.parametrize("size", [0, 8, 100])
+def test_restore_rejects_truncated_archive(exported, size):
+    from src import snapshot
+    path, _ = exported
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:size])
+    with pytest.raises(ValueError):
+        snapshot.restore_session(path)
+
+
+def test_truncated_header_is_value_error(tmp_path):
+    from src.snapshot import SessionArchive, MAGIC
+    path = tmp_path / "short.vmss"
+    path.write_bytes(struct.pack("<4sH", MAGIC, 1))
+    with pytest.raises(ValueError):
+        SessionArchive(str(path))